@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Compares the deformation of photos via edit-mode operators with the vectorized implementation (operators need a UI):
+    blender --factory-startup --python benchmarks/bench_deformation.py -- --photos 100
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import bpy
+import bmesh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from io_photostory import deformation
+from io_photostory.helpers_geometry import create_plane_meshdata, create_grid_meshdata
+from io_photostory.helpers_views import get_override, enter_editmode, leave_editmode
+
+
+def link(obj):
+    bpy.context.view_layer.active_layer_collection.collection.objects.link(obj)
+
+
+def deform_with_operators(num_photos, width, height, max_edge_transition=20, rotation_sigma=0.02):
+    """
+    Reference: Photo.add_deformation and Slide.add_randomization as implemented with operators
+    """
+    override = get_override('VIEW_3D')
+    for i in range(num_photos):
+        obj = bpy.data.objects.new("photo", create_plane_meshdata(width, height, 0.025))
+        link(obj)
+
+        enter_editmode(obj, override)
+        bpy.ops.mesh.select_all(override, action='SELECT')
+        bpy.ops.mesh.subdivide(override, number_cuts=20)
+        bpy.ops.mesh.select_all(override, action='DESELECT')
+        mesh = bmesh.from_edit_mesh(obj.data)
+        mesh.verts.ensure_lookup_table()
+        for c in range(4):
+            mesh.verts[c].select = True
+            bpy.ops.transform.translate(override, value=(0, 0, random.random() * max_edge_transition),
+                                        constraint_axis=(False, False, True), orient_type='GLOBAL',
+                                        mirror=False, use_proportional_edit=True, proportional_edit_falloff='SHARP',
+                                        proportional_size=200)
+            mesh.verts[c].select = False
+        leave_editmode(override)
+
+        enter_editmode(obj, override)
+        bpy.ops.mesh.select_all(override, action='SELECT')
+        bpy.ops.transform.rotate(override, value=random.normalvariate(0, rotation_sigma), orient_axis='Z',
+                                 constraint_axis=(False, False, True), orient_type='GLOBAL', mirror=False,
+                                 use_proportional_edit=False, proportional_edit_falloff='SMOOTH', proportional_size=1)
+        bpy.ops.mesh.select_all(override, action='DESELECT')
+        leave_editmode(override)
+
+
+def deform_vectorized(num_photos, width, height, max_edge_transition=20, rotation_sigma=0.02):
+    for i in range(num_photos):
+        lifts = [random.random() * max_edge_transition for c in range(4)]
+        coordinates = deformation.photo_coordinates(width, height, 20, lifts, 200,
+                                                    random.normalvariate(0, rotation_sigma))
+        link(bpy.data.objects.new("photo", create_grid_meshdata(width, height, 20, 0.025, coordinates)))
+
+
+def measure(name, func, num_photos):
+    start = time.perf_counter()
+    func(num_photos, 800, 600)
+    bpy.context.view_layer.update()
+    duration = time.perf_counter() - start
+    print("{:<12} {:8.3f} s total {:8.2f} ms per photo".format(name, duration, 1000 * duration / num_photos))
+    return duration
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Benchmark photo deformation")
+    parser.add_argument("--photos", type=int, default=100, help="Number of photos")
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    vectorized = measure("vectorized", deform_vectorized, args.photos)
+    try:
+        get_override('VIEW_3D')
+    except RuntimeError:
+        print("No 3D view available (background mode?), skipping operator path.")
+    else:
+        operators = measure("operators", deform_with_operators, args.photos)
+        print("Speed-up: {:.1f}x".format(operators / vectorized))
+
+    if not bpy.app.background:
+        bpy.ops.wm.quit_blender()
+
+
+main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Benchmarks of the import computations, which run without blender (mathutils is replaced by benchmarks/shim).
+Timings are compared with stored baselines, relative to a calibration run:
+    python3 benchmarks/bench_offline.py                    # Compare with benchmarks/baselines.json
+    python3 benchmarks/bench_offline.py --quick            # Smaller sizes only
+    python3 benchmarks/bench_offline.py --filter layout    # Benchmarks, whose name contains 'layout'
+    python3 benchmarks/bench_offline.py --save-baseline    # Store the results as new baselines
+    python3 benchmarks/bench_offline.py --strict           # Exit code 1, if there are regressions
+"""
+
+import argparse
+import bisect
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+try:
+    import mathutils
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "shim"))
+
+import numpy as np
+
+from io_photostory import frame_analysis
+from io_photostory import layout
+from io_photostory import render_farm
+from io_photostory import route
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+PHOTOS_PER_SLIDE = (1, 10, 50, 200)
+SLIDES_PER_STORY = (10, 100, 1000, 10000)
+
+# Sizes, which are skipped with --quick
+QUICK_MAX_PHOTOS = 50
+QUICK_MAX_SLIDES = 1000
+
+# Slow-downs below this many seconds are measurement noise, not regressions
+MIN_REGRESSION = 1e-4
+
+FPS = 25
+SLIDE_FRAMES = 112
+TRANSITION_FRAMES = 25
+
+
+def get_random_rectangles(num, rng):
+    """
+    Rectangles with the sizes of photos (landscape and portrait)
+    """
+    rectangles = []
+    for i in range(num):
+        w, h = rng.choice(((4000, 3000), (3000, 4000), (6000, 4000), (1920, 1080)))
+        s = rng.uniform(0.5, 1.5)
+        rectangles.append(layout.Rectangle(0, 0, s * w, s * h))
+    return rectangles
+
+
+def get_canvas():
+    return layout.Rectangle(0, 0, 1920, 1080)
+
+
+def setup_arrange_canvas(num_photos):
+    return get_random_rectangles(num_photos, random.Random(0)), get_canvas()
+
+
+def run_arrange_canvas(rectangles, canvas):
+    layout.arrange_rects_in_canvas_1(rectangles, canvas)
+
+
+def setup_arrange_background(num_photos):
+    rng = random.Random(0)
+    canvas = get_canvas()
+    foreground = get_random_rectangles(4, rng)
+    layout.arrange_rects_in_canvas_1(foreground, canvas)
+    layout.center_layout(foreground, canvas)
+    return get_random_rectangles(num_photos, rng), foreground, canvas, rng
+
+
+def run_arrange_background(rectangles, foreground, canvas, rng):
+    layout.arrange_rects_in_background_1(rectangles, foreground, canvas, rng)
+
+
+def setup_background_rectangles(num_photos):
+    rectangles, canvas = setup_arrange_canvas(num_photos)
+    layout.arrange_rects_in_canvas_1(rectangles, canvas)
+    layout.scale_layout(rectangles, 0.85)
+    layout.center_layout(rectangles, canvas)
+    return rectangles, canvas
+
+
+def run_background_rectangles(rectangles, canvas):
+    layout.get_background_rectangles(rectangles, canvas)
+
+
+class Keyframe:
+    def __init__(self, frame, value):
+        self.co = (frame, value)
+
+
+class FCurve:
+    """
+    Stand-in for bpy.types.FCurve with linear interpolation
+    """
+    def __init__(self, keys):
+        self.keyframe_points = [Keyframe(f, v) for f, v in keys]
+        self.frames = [f for f, _ in keys]
+        self.values = [v for _, v in keys]
+        self.modifiers = []
+        self.extrapolation = 'CONSTANT'
+        self.mute = False
+
+    def evaluate(self, frame):
+        i = bisect.bisect_right(self.frames, frame)
+        if i == 0:
+            return self.values[0]
+        if i == len(self.frames):
+            return self.values[-1]
+        f0, f1 = self.frames[i - 1], self.frames[i]
+        v0, v1 = self.values[i - 1], self.values[i]
+        return v0 + (v1 - v0) * (frame - f0) / (f1 - f0)
+
+
+class ImageUser:
+    def __init__(self, frame_start, frame_duration):
+        self.frame_start = frame_start
+        self.frame_duration = frame_duration
+        self.use_cyclic = False
+
+
+def setup_duplicate_frames(num_slides):
+    """
+    Camera animation of a story: the camera holds at each slide and moves to the next one during transitions, every
+    fifth slide shows a video
+    """
+    keys = []
+    videos = []
+    frame = 1
+    for i in range(num_slides):
+        keys += [(frame, 2000.0 * i), (frame + SLIDE_FRAMES, 2000.0 * i)]
+        if i % 5 == 0:
+            videos.append(ImageUser(frame, SLIDE_FRAMES // 2))
+        frame += SLIDE_FRAMES + TRANSITION_FRAMES
+    camera = [FCurve([(f, v) for f, v in keys]), FCurve([(f, 0.0) for f, _ in keys]),
+              FCurve([(f, 1000.0) for f, _ in keys])]
+    return camera, videos, 1, frame - TRANSITION_FRAMES
+
+
+def run_duplicate_frames(fcurves, videos, frame_start, frame_end):
+    changed = np.zeros(frame_end - frame_start + 1, dtype=bool)
+    changed[0] = True
+    for fcurve in fcurves:
+        changed |= frame_analysis.get_fcurve_changes(fcurve, float, frame_start, frame_end)
+    for image_user in videos:
+        changed |= frame_analysis.get_video_changes(image_user, frame_start, frame_end)
+    frame_analysis.get_duplicate_sources(changed, frame_start)
+
+
+def setup_route_sampling(num_slides):
+    """
+    One route of 20 locations per gps slide, every tenth slide is a gps slide
+    """
+    rng = np.random.RandomState(0)
+    return [np.cumsum(rng.normal(0, 10, (20, 3)), axis=0) + [0, 0, 1] for i in range(max(1, num_slides // 10))],
+
+
+def run_route_sampling(routes):
+    for points in routes:
+        route.get_route_length(points)
+
+
+def setup_shards(num_slides):
+    segments = []
+    frame = 1
+    for i in range(num_slides):
+        segments.append({"type": "video" if i % 5 == 0 else "photo", "start": frame, "end": frame + SLIDE_FRAMES,
+                         "slide": i})
+        frame += SLIDE_FRAMES + 1
+        segments.append({"type": "transition", "start": frame, "end": frame + TRANSITION_FRAMES - 2})
+        frame += TRANSITION_FRAMES - 1
+    manifest = {"frame_start": 1, "frame_end": frame - 1, "fps": FPS, "segments": segments}
+    return manifest,
+
+
+def run_shards(manifest):
+    costs = render_farm.get_frame_costs(manifest)
+    render_farm.plan_shards(list(costs), costs, 64)
+
+
+# Name -> (parameter, sizes, setup(size) -> arguments of run, run)
+BENCHMARKS = {
+    "layout_arrange_canvas": ("photos", PHOTOS_PER_SLIDE, setup_arrange_canvas, run_arrange_canvas),
+    "layout_arrange_background": ("photos", PHOTOS_PER_SLIDE, setup_arrange_background, run_arrange_background),
+    "layout_background_rectangles": ("photos", PHOTOS_PER_SLIDE, setup_background_rectangles,
+                                     run_background_rectangles),
+    "duplicate_frames": ("slides", SLIDES_PER_STORY, setup_duplicate_frames, run_duplicate_frames),
+    "route_sampling": ("slides", SLIDES_PER_STORY, setup_route_sampling, run_route_sampling),
+    "render_farm_shards": ("slides", SLIDES_PER_STORY, setup_shards, run_shards),
+}
+
+
+def setup_calibration(size):
+    rng = random.Random(0)
+    return [rng.random() for _ in range(size)], np.random.RandomState(0).rand(size, 4)
+
+
+def run_calibration(values, array):
+    """
+    Fixed mix of interpreted python and numpy, similar to the benchmarks. Its duration is the unit of comparisons.
+    """
+    sorted(values)
+    total = 0.0
+    for v in values:
+        total += v * v if v < 0.5 else v
+    np.sort(array, axis=0)
+    np.cumsum(array, axis=0)
+
+
+CALIBRATION_SIZE = 20000
+
+
+def calibrate(repeat):
+    return measure(setup_calibration, run_calibration, CALIBRATION_SIZE, repeat)
+
+
+def measure(setup, run, size, repeat, min_time=0.2, max_repeat=200):
+    """
+    Run at least 'repeat' times and until the runs took 'min_time' seconds in total. Each run gets fresh arguments
+    (runs edit them in place).
+    :return: Shortest duration in seconds, which is the least affected by other processes
+    """
+    durations = []
+    while len(durations) < repeat or (sum(durations) < min_time and len(durations) < max_repeat):
+        arguments = setup(size)
+        start = time.perf_counter()
+        run(*arguments)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def load_baselines(path):
+    """
+    :return: Tuple (dict key -> seconds, seconds of calibration run) or ({}, None)
+    """
+    if not os.path.isfile(path):
+        return {}, None
+    with open(path) as f:
+        data = json.load(f)
+    return data["results"], data.get("calibration")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark layout and timeline computations without blender.")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest sizes")
+    parser.add_argument("--filter", default="", help="Only run benchmarks, whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=3, help="Minimal number of runs per benchmark and size (the fastest is reported)")
+    parser.add_argument("--baselines", default=BASELINES, help="Path of baselines (json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as baselines")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Relative slow-down, which is reported as regression (default: 0.5)")
+    parser.add_argument("--strict", action="store_true", help="Exit with code 1, if there are regressions")
+    args = parser.parse_args(argv)
+
+    baselines, baseline_calibration = load_baselines(args.baselines)
+    calibration = calibrate(args.repeat)
+    print("Calibration: {:.3f} ms (baselines: {})".format(
+        1000 * calibration, "-" if baseline_calibration is None else "{:.3f} ms".format(1000 * baseline_calibration)))
+    # Baselines are scaled to the speed of this machine
+    machine_factor = 1.0 if baseline_calibration is None else calibration / baseline_calibration
+
+    results = {}
+    regressions = []
+    print("{:<45} {:>10} {:>10} {:>8}".format("benchmark", "ms", "baseline", "ratio"))
+    for name, (parameter, sizes, setup, run) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        limit = QUICK_MAX_PHOTOS if parameter == "photos" else QUICK_MAX_SLIDES
+        for size in sizes:
+            if args.quick and size > limit:
+                continue
+            key = "{}[{}={}]".format(name, parameter, size)
+            results[key] = measure(setup, run, size, args.repeat)
+            if key not in baselines:
+                print("{:<45} {:10.3f} {:>10} {:>8}".format(key, 1000 * results[key], "-", "-"))
+                continue
+            baseline = machine_factor * baselines[key]
+
+            def is_regression():
+                return results[key] / baseline > 1 + args.tolerance and results[key] - baseline > MIN_REGRESSION
+            if is_regression():
+                # Confirm with a longer measurement, to rule out interference of other processes
+                results[key] = min(results[key], measure(setup, run, size, 3 * args.repeat))
+            regression = is_regression()
+            print("{:<45} {:10.3f} {:10.3f} {:8.2f}{}".format(key, 1000 * results[key], 1000 * baseline,
+                                                              results[key] / baseline,
+                                                              "  REGRESSION" if regression else ""))
+            if regression:
+                regressions.append(key)
+
+    if args.save_baseline:
+        # Baselines of other benchmarks (e.g. --filter) are kept, if they were measured at a comparable speed
+        baselines = {k: machine_factor * v for k, v in baselines.items()}
+        baselines.update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "calibration": calibration,
+                       "results": dict(sorted(baselines.items()))}, f, indent=1)
+            f.write("\n")
+        print("Saved baselines:", args.baselines)
+    elif len(regressions) > 0:
+        print("{} regressions (tolerance {:.0%}).".format(len(regressions), args.tolerance))
+        if args.strict:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
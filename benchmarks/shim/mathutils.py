@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Minimal stand-in for blender's mathutils (Vector only), see bench_offline.py.
+"""
+
+import numpy as np
+
+
+class Vector(np.ndarray):
+    def __new__(cls, values=(0.0, 0.0, 0.0)):
+        return np.array(values, dtype=np.float64).view(cls)
+
+    def copy(self):
+        return Vector(self)
+
+    @property
+    def length(self):
+        return float(np.linalg.norm(self))
+
+    def normalized(self):
+        length = self.length
+        return Vector(self / length) if length > 0 else self.copy()
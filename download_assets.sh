@@ -4,3 +4,7 @@ cd "$(dirname "$0")"
 #wget -nc -P io_photostory/assets/ https://eoimages.gsfc.nasa.gov/images/imagerecords/73000/73801/world.topo.bathy.200409.3x5400x2700.jpg
 wget -nc -P io_photostory/assets/ https://eoimages.gsfc.nasa.gov/images/imagerecords/73000/73934/gebco_08_rev_elev_21600x10800.png
 wget -nc -P io_photostory/assets/ https://eoimages.gsfc.nasa.gov/images/imagerecords/73000/73801/world.topo.bathy.200409.3x21600x10800.jpg
+
+# Build tile pyramids, such that only the visible region of the map is loaded in high resolution (requires Pillow)
+python3 -m io_photostory.map_tiles io_photostory/assets/gebco_08_rev_elev_21600x10800.png io_photostory/assets/world.topo.bathy.200409.3x21600x10800.jpg \
+    || echo "WARNING: Building map tiles failed (is Pillow installed?). The full resolution assets are used instead."
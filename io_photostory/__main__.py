@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import os
+import sys
+
+if __package__ in (None, ""):
+    # Executed as script, like: blender --background --python io_photostory/__main__.py -- build ...
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from io_photostory.cli import main
+else:
+    from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Bulk creation of keyframes: one keyframe_points.add and foreach_set per F-curve, instead of keyframe_insert per key.
+"""
+
+import bpy
+import numpy as np
+
+# Values of the interpolation enum of keyframes (BEZT_IPO_*)
+INTERPOLATION_MODES = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}
+
+# Group of F-curves, which keyframe_insert uses for transforms of objects
+TRANSFORM_PATHS = {"location", "rotation_euler", "rotation_quaternion", "scale"}
+
+
+class KeyframeWriter:
+    def __init__(self):
+        self.curves = {}  # (pointer of data-block, data path, index) -> [data-block, {frame: (value, interpolation)}]
+
+    def insert(self, id_data, data_path, value, frame, index=-1, interpolation='BEZIER'):
+        """
+        Add a keyframe, like id_data.keyframe_insert(data_path, index, frame), but with an explicit value. A later
+        keyframe at the same frame replaces an earlier one.
+        :param id_data: Animated data-block (e.g. object)
+        :param data_path: Path of the property, relative to 'id_data' (see bpy_struct.path_from_id)
+        :param value: Value of the property, a sequence for all components if index is -1 (and the property is an
+                      array)
+        :param interpolation: Interpolation from this keyframe to the next one ('CONSTANT', 'LINEAR' or 'BEZIER')
+        """
+        if index < 0 and not hasattr(value, "__len__"):
+            index = 0
+        if index < 0:
+            for i, v in enumerate(value):
+                self.insert(id_data, data_path, v, frame, i, interpolation)
+            return
+        key = (id_data.as_pointer(), data_path, index)
+        curve = self.curves.get(key)
+        if curve is None:
+            curve = self.curves[key] = [id_data, {}]
+        curve[1][frame] = (float(value), INTERPOLATION_MODES[interpolation])
+
+    def insert_property(self, struct, property_name, frame, index=-1, interpolation='BEZIER'):
+        """
+        Add a keyframe with the current value of a property, like struct.keyframe_insert(property_name, index, frame)
+        :param struct: Data-block or struct of a data-block (e.g. modifier)
+        """
+        value = getattr(struct, property_name)
+        if index >= 0:
+            value = value[index]
+        self.insert(struct.id_data, struct.path_from_id(property_name), value, frame, index, interpolation)
+
+    def get_num_keyframes(self):
+        return sum(len(keys) for _, keys in self.curves.values())
+
+    def write(self):
+        """
+        Write all collected keyframes to F-curves, merged with existing keyframes, and clear the collection
+        """
+        for (_, data_path, index), (id_data, keys) in self.curves.items():
+            fcurve = get_fcurve(id_data, data_path, index)
+            points = fcurve.keyframe_points
+            if len(points) > 0:
+                # Keep existing keyframes, unless they are replaced
+                co = np.empty(2 * len(points), dtype=np.float32)
+                interpolation = np.empty(len(points), dtype=np.int32)
+                points.foreach_get("co", co)
+                points.foreach_get("interpolation", interpolation)
+                existing = {float(f): (float(v), int(i)) for (f, v), i in zip(co.reshape(-1, 2), interpolation)}
+                existing.update(keys)
+                keys = existing
+                id_data.animation_data.action.fcurves.remove(fcurve)
+                fcurve = get_fcurve(id_data, data_path, index)
+                points = fcurve.keyframe_points
+
+            frames = sorted(keys)
+            co = np.empty((len(frames), 2), dtype=np.float32)
+            co[:, 0] = frames
+            co[:, 1] = [keys[f][0] for f in frames]
+            points.add(len(frames))
+            points.foreach_set("co", co.ravel())
+            points.foreach_set("interpolation", np.array([keys[f][1] for f in frames], dtype=np.int32))
+            fcurve.update()  # Sort keyframes and calculate handles
+        self.curves = {}
+
+
+def get_fcurve(id_data, data_path, index):
+    """
+    :return: F-curve of a property of a data-block, which is created (with an action), if it does not exist
+    """
+    if id_data.animation_data is None:
+        id_data.animation_data_create()
+    action = id_data.animation_data.action
+    if action is None:
+        action = bpy.data.actions.new(id_data.name + "Action")
+        id_data.animation_data.action = action
+    fcurve = action.fcurves.find(data_path, index=index)
+    if fcurve is None:
+        if data_path in TRANSFORM_PATHS and isinstance(id_data, bpy.types.Object):
+            fcurve = action.fcurves.new(data_path, index=index, action_group="Object Transforms")
+        else:
+            fcurve = action.fcurves.new(data_path, index=index)
+    return fcurve
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Command-line interface of photostory, blender is only imported by the commands, which require it.
+
+Usage:
+    python -m io_photostory build story.json --out story.blend
+    python -m io_photostory estimate story.json --fps 25
+    blender --background --factory-startup --python io_photostory/__main__.py -- build story.json --out story.blend
+    blender --background story.blend --python io_photostory/__main__.py -- render-plates
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+
+from . import frame_manifest
+from . import media_probe
+from . import profiling
+from . import proxies
+from . import render_farm
+from . import story_reader
+from . import timeline
+from .helpers_cache import get_cache_dir
+
+
+def get_arguments(argv=None):
+    """
+    Arguments of the command line (sys.argv) without the program and the arguments, which are meant for blender
+    (everything before '--'), if present. Explicit arguments 'argv' are returned unchanged.
+    """
+    if argv is not None:
+        return argv
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return sys.argv[1:]
+
+
+def clear_blend_data(bpy):
+    """
+    Remove all objects (and the data they use) from the current file, without using operators
+    """
+    for collection in (bpy.data.objects, bpy.data.meshes, bpy.data.curves, bpy.data.cameras, bpy.data.lights,
+                       bpy.data.materials, bpy.data.textures, bpy.data.images):
+        for block in list(collection):
+            collection.remove(block)
+
+
+def build(args):
+    """
+    Build a story, optionally profiled: the report is written to <out>.profile.json (see profiling.py)
+    """
+    if not args.profile:
+        return build_story(args)
+    profiler = profiling.Profiler(use_cprofile=args.cprofile)
+    with profiler:
+        result = build_story(args)
+    path = os.path.splitext(os.path.abspath(args.out))[0] + ".profile.json"
+    profiler.save(path)
+    profiler.log_summary(logging.getLogger(profiling.LOGGER_NAME))
+    print("Saved profile:", path)
+    return result
+
+
+def build_story(args):
+    import bpy
+    from .importer import PhotostoryBuilder
+
+    if not args.incremental:
+        clear_blend_data(bpy)
+    scene = bpy.context.scene
+    if args.resolution is not None:
+        scene.render.resolution_x, scene.render.resolution_y = args.resolution
+    if args.fps is not None:
+        scene.render.fps = args.fps
+    if args.render_output is not None:
+        scene.render.filepath = os.path.join(os.path.abspath(args.render_output), "")
+
+    def get_builder(**kwargs):
+        return PhotostoryBuilder(setup_scene=True,
+                                 unroll_map=not args.no_unroll_map,
+                                 skip_duplicates=not args.no_skip_duplicates,
+                                 default_slide_duration=args.default_slide_duration,
+                                 use_proxies=not args.no_proxies,
+                                 use_video_proxies=args.video_proxies,
+                                 proxy_dir=proxy_dir,
+                                 incremental=args.incremental,
+                                 layout_strategy=args.layout,
+                                 use_plates=args.plates,
+                                 chunked=args.chunk_size is not None,
+                                 chunk_size=args.chunk_size or 64,
+                                 **kwargs)
+
+    story = os.path.abspath(args.story)
+    out = os.path.abspath(args.out)
+    proxy_dir = os.path.abspath(args.proxy_dir or os.path.join(os.path.dirname(out), proxies.PROXY_DIRECTORY))
+    if args.slides_per_part is None:
+        builder = get_builder()
+        builder.build(story)
+        with profiling.span("save"):
+            bpy.ops.wm.save_as_mainfile(filepath=out)
+            profiling.count("operator_calls")
+        print("Saved blender file:", out)
+        frame_manifest.save_manifest(render_farm.find_manifest(out), builder.manifest)
+        return 0
+
+    # Split story into parts, each part continues at the frame, where the previous part ended
+    if args.incremental:
+        raise RuntimeError("Stories, which are split into parts, can not be updated incrementally.")
+    num_slides = story_reader.scan_story(story)["num_slides"]
+    manifests = []
+    parts = []
+    first_frame = 1
+    for i, first_slide in enumerate(range(0, num_slides, args.slides_per_part)):
+        if i > 0:
+            clear_blend_data(bpy)
+        builder = get_builder(first_slide=first_slide, num_slides=args.slides_per_part, first_frame=first_frame)
+        builder.build(story)
+        part_out = get_part_path(out, i)
+        with profiling.span("save"):
+            bpy.ops.wm.save_as_mainfile(filepath=part_out, copy=True)
+            profiling.count("operator_calls")
+        print("Saved blender file:", part_out)
+        frame_manifest.save_manifest(render_farm.find_manifest(part_out), builder.manifest)
+        manifests.append(builder.manifest)
+        parts.append({"blend": part_out, "manifest": render_farm.find_manifest(part_out)})
+        first_frame = builder.frame_end + 1
+
+    manifest = frame_manifest.concatenate_manifests(manifests, parts)
+    frame_manifest.save_manifest(render_farm.find_manifest(out), manifest)
+    output_dir = os.path.dirname(manifest["render_filepath"])
+    if os.path.isdir(output_dir):
+        frame_manifest.save_manifest(os.path.join(output_dir, frame_manifest.MANIFEST_NAME), manifest)
+    print("Saved {} parts, frames {}-{}".format(len(parts), manifest["frame_start"], manifest["frame_end"]))
+    return 0
+
+
+def get_part_path(blend_path, index):
+    """
+    Path of the .blend file of a part of a story, e.g. story.part000.blend
+    """
+    return "{}.part{:03d}.blend".format(os.path.splitext(blend_path)[0], index)
+
+
+def render_plates(args):
+    """
+    Render the plates of the opened .blend file (see plates.py). The camera stays where it is at the first frame of
+    each slide, the view is widened to the size of the plate without changing the scale.
+    """
+    import bpy
+
+    scene = bpy.context.scene
+    manifest = frame_manifest.load_manifest(args.manifest or render_farm.find_manifest(bpy.data.filepath))
+    slides = None if args.slides is None else {int(s) for s in args.slides.split(",")}
+    render = scene.render
+    cam_data = scene.camera.data
+    settings = (render.filepath, render.resolution_x, render.resolution_y, render.resolution_percentage,
+                cam_data.sensor_fit, cam_data.angle, cam_data.ortho_scale, scene.frame_current)
+    frame_width, frame_height = manifest["frame_size"]
+    extension = manifest.get("file_extension", "")
+
+    for plate in manifest.get("plates", []):
+        if slides is not None and plate["slide"] not in slides:
+            continue
+        render.resolution_x, render.resolution_y, render.resolution_percentage = plate["width"], plate["height"], 100
+        cam_data.sensor_fit = 'HORIZONTAL'
+        if cam_data.type == 'ORTHO':
+            cam_data.ortho_scale = plate["width"] / manifest["plate_scale"]
+        else:
+            cam_data.angle = 2 * math.atan(math.tan(0.5 * settings[5]) * plate["width"] / max(frame_width, frame_height))
+        render.filepath = plate["path"][:len(plate["path"]) - len(extension)]
+        scene.frame_set(plate["frame"])
+        bpy.ops.render.render(write_still=True)
+        print("Rendered plate:", plate["path"])
+
+    (render.filepath, render.resolution_x, render.resolution_y, render.resolution_percentage,
+     cam_data.sensor_fit, cam_data.angle, cam_data.ortho_scale, frame) = settings
+    scene.frame_set(frame)
+    return 0
+
+
+def estimate(args):
+    """
+    Plan the timeline of a story without blender and print its length and estimated render time
+    """
+    with open(args.story) as f:
+        story = json.load(f)
+    if args.default_slide_duration is not None:
+        story["default_slide_duration"] = args.default_slide_duration
+    story_dir = os.path.dirname(os.path.abspath(args.story))
+
+    def resolve_path(path):
+        return os.path.join(story_dir, path)  # Absolute paths stay unchanged
+
+    # Lengths of videos, from their headers
+    probe = media_probe.MediaProbe(os.path.join(get_cache_dir(), "media_probe.json"))
+    video_frames = {}
+    for slide_desc in story["slides"]:
+        for path in slide_desc.get("foreground_paths", []) + slide_desc.get("background_paths", []):
+            path = resolve_path(path)
+            if path in video_frames or not path.lower().endswith(media_probe.VIDEO_EXTENSIONS):
+                continue
+            info = probe.get_video_info(path)
+            if info is None:
+                print("Unable to read the length of video {}, it is counted as photo.".format(path), file=sys.stderr)
+                continue
+            video_frames[path] = media_probe.get_scene_frames(info, args.fps if args.video_proxies else None)
+    probe.save()
+
+    planned = timeline.plan_story(story, args.fps, video_frames, unroll_map=not args.no_unroll_map,
+                                  resolve_path=resolve_path)
+    if args.json:
+        print(json.dumps({"summary": planned.get_summary(), "slides": planned.slides, "segments": planned.segments},
+                         indent=1))
+    else:
+        print(timeline.format_summary(planned.get_summary(), args.seconds_per_frame))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="io_photostory",
+                                     description="Generate photostory scenes without blender user interface.")
+    parser.add_argument("--verbose", action="store_true", help="Print debug messages (e.g. each loaded image)")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    parser_build = commands.add_parser("build", help="Generate the scene of a story and save it as .blend file.")
+    parser_build.add_argument("story", help="Path of story (.json)")
+    parser_build.add_argument("--out", required=True, help="Path of resulting .blend file")
+    parser_build.add_argument("--render-output", help="Render output directory (required for placeholders)")
+    parser_build.add_argument("--resolution", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"),
+                              help="Render resolution (default: resolution of startup file)")
+    parser_build.add_argument("--fps", type=int, help="Frame rate (default: frame rate of startup file)")
+    parser_build.add_argument("--default-slide-duration", type=float, default=4.5,
+                              help="Default slide duration in seconds (might be overwritten by json)")
+    parser_build.add_argument("--no-unroll-map", action="store_true", help="Do not add the map unroll animation")
+    parser_build.add_argument("--no-skip-duplicates", action="store_true",
+                              help="Do not create placeholders for duplicate frames")
+    parser_build.add_argument("--no-proxies", action="store_true", help="Do not downscale photos")
+    parser_build.add_argument("--video-proxies", action="store_true",
+                              help="Transcode videos to key frames only, at the displayed size and the frame rate of "
+                                   "the scene (requires ffmpeg)")
+    parser_build.add_argument("--proxy-dir",
+                              help="Directory of proxies, which has to be accessible by render nodes "
+                                   "(default: photostory_proxies next to --out)")
+    parser_build.add_argument("--incremental", action="store_true",
+                              help="Update the photostory of the opened .blend file, only changed slides are rebuilt "
+                                   "(blender --background story.blend --python ...)")
+    parser_build.add_argument("--layout", choices=["greedy", "rows", "skyline", "best"], default="greedy",
+                              help="Arrangement of the foreground photos of a slide (default: greedy)")
+    parser_build.add_argument("--plates", action="store_true",
+                              help="Render each photo slide once and composite transitions between photo slides")
+    parser_build.add_argument("--slides-per-part", type=int, metavar="SLIDES",
+                              help="Split the story into parts of this many slides, one .blend file per part "
+                                   "(<out>.part000.blend, ...), and a combined frame manifest (<out>.frames.json)")
+    parser_build.add_argument("--chunk-size", type=int, metavar="SLIDES",
+                              help="Read and build the story in chunks of this many slides (for very large stories)")
+    parser_build.add_argument("--profile", action="store_true",
+                              help="Time the phases of the import and write a report (<out>.profile.json)")
+    parser_build.add_argument("--cprofile", action="store_true",
+                              help="Include a cProfile summary in the report and write <out>.profile.json.prof "
+                                   "(implies --profile)")
+    parser_build.set_defaults(func=build)
+
+    parser_estimate = commands.add_parser("estimate", help="Plan the timeline of a story without blender and "
+                                                           "estimate the length of the video and its render time.")
+    parser_estimate.add_argument("story", help="Path of story (.json)")
+    parser_estimate.add_argument("--fps", type=int, default=24, help="Frame rate (default: 24)")
+    parser_estimate.add_argument("--default-slide-duration", type=float,
+                                 help="Default slide duration in seconds (default: duration of json or 4.5)")
+    parser_estimate.add_argument("--no-unroll-map", action="store_true", help="Without the map unroll animation")
+    parser_estimate.add_argument("--video-proxies", action="store_true",
+                                 help="Videos are converted to the frame rate (see build, --video-proxies)")
+    parser_estimate.add_argument("--seconds-per-frame", type=float,
+                                 help="Render time of a frame of a photo slide, to estimate the total render time")
+    parser_estimate.add_argument("--json", action="store_true", help="Print the whole timeline as json")
+    parser_estimate.set_defaults(func=estimate)
+
+    parser_plates = commands.add_parser("render-plates", help="Render the plates of the opened .blend file.")
+    parser_plates.add_argument("--manifest", help="Frame manifest (default: <blend>.frames.json)")
+    parser_plates.add_argument("--slides", help="Comma-separated slides, whose plates are rendered (default: all)")
+    parser_plates.set_defaults(func=render_plates)
+
+    args = parser.parse_args(get_arguments(argv))
+    profiling.setup_logging(logging.DEBUG if args.verbose else logging.INFO)
+    if getattr(args, "cprofile", False):
+        args.profile = True
+    return args.func(args)
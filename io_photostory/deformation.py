@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Vectorized geometry of photo planes: subdivided grids, lifted corners and rotations.
+"""
+
+import numpy as np
+
+
+def grid_coordinates(width, height, cuts=0):
+    """
+    Vertices of a plane [0,width]x[0,height], which is subdivided 'cuts' times in each direction.
+    Vertices are stored row by row, starting at (0,0).
+    :return: (N,3) array, with N = (cuts+2)^2
+    """
+    xs = np.linspace(0, width, cuts + 2)
+    ys = np.linspace(0, height, cuts + 2)
+    gx, gy = np.meshgrid(xs, ys)
+    return np.stack((gx.ravel(), gy.ravel(), np.zeros(gx.size)), axis=1)
+
+
+def grid_faces(cuts=0):
+    """
+    Quads of a grid created by 'grid_coordinates'
+    :return: (F,4) array of vertex indices (counter-clockwise), with F = (cuts+1)^2
+    """
+    n = cuts + 2
+    i = np.arange(n - 1)
+    r, c = np.meshgrid(i, i, indexing='ij')
+    v0 = (r * n + c).ravel()
+    return np.stack((v0, v0 + 1, v0 + n + 1, v0 + n), axis=1)
+
+
+def grid_uvs(width, height, cuts=0, uv_border=0):
+    """
+    Texture coordinates for each loop of the faces of 'grid_faces'. The border is added outside of [0,1], see
+    'create_plane_meshdata'.
+    :return: (F*4,2) array
+    """
+    border_u = uv_border
+    border_v = border_u * width / height
+    uv = grid_coordinates(1, 1, cuts)[:, :2]
+    uv[:, 0] = uv[:, 0] * (1 + 2 * border_u) - border_u
+    uv[:, 1] = uv[:, 1] * (1 + 2 * border_v) - border_v
+    return uv[grid_faces(cuts).ravel()]
+
+
+def grid_corner_indices(cuts=0):
+    """
+    Indices of the corners (0,0), (w,0), (w,h), (0,h) within a grid created by 'grid_coordinates'
+    """
+    n = cuts + 2
+    return np.array([0, n - 1, n * n - 1, n * (n - 1)])
+
+
+def sharp_falloff(distance, radius):
+    """
+    Weight of proportional editing with falloff 'SHARP'
+    """
+    f = np.clip(1 - distance / radius, 0, 1)
+    return f * f
+
+
+def lift_corners(coordinates, corner_indices, lifts, radius):
+    """
+    Lift corners in z-direction and drag their neighbourhood along, like proportional editing does. Edited in place.
+    :param coordinates: (N,3) array of vertices
+    :param corner_indices: Indices of lifted vertices
+    :param lifts: Lift of each corner
+    :param radius: Radius of proportional editing
+    """
+    corners = coordinates[corner_indices, :2]
+    distances = np.linalg.norm(coordinates[np.newaxis, :, :2] - corners[:, np.newaxis, :], axis=2)
+    coordinates[:, 2] += np.dot(np.asarray(lifts), sharp_falloff(distances, radius))
+    return coordinates
+
+
+def rotate_z(coordinates, angle):
+    """
+    Rotate vertices around the z-axis through their median point. Edited in place.
+    :param coordinates: (N,3) array of vertices
+    :param angle: Angle in radians
+    """
+    median = coordinates[:, :2].mean(axis=0)
+    c, s = np.cos(angle), np.sin(angle)
+    xy = coordinates[:, :2] - median
+    coordinates[:, 0] = c * xy[:, 0] - s * xy[:, 1] + median[0]
+    coordinates[:, 1] = s * xy[:, 0] + c * xy[:, 1] + median[1]
+    return coordinates
+
+
+def photo_coordinates(width, height, cuts=0, lifts=None, radius=200, angle=0):
+    """
+    Computes all vertices of a (deformed) photo plane at once
+    :param width: Width of photo
+    :param height: Height of photo
+    :param cuts: Number of subdivisions
+    :param lifts: Optional lift of each of the 4 corners
+    :param radius: Radius of the area influenced by lifting corners
+    :param angle: Rotation around z in radians
+    :return: (N,3) array, see 'grid_coordinates'
+    """
+    coordinates = grid_coordinates(width, height, cuts)
+    if lifts is not None:
+        lift_corners(coordinates, grid_corner_indices(cuts), lifts, radius)
+    if angle != 0:
+        rotate_z(coordinates, angle)
+    return coordinates
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Detection of frames, which are identical to the previous one (no animated property changes and no video advances).
+"""
+
+import math
+
+import numpy as np
+
+# Relative tolerance of float properties
+TOLERANCE = 1e-6
+
+
+def get_animated_ids(scene):
+    """
+    :return: List of all data-blocks of the scene, which can carry animation data (objects, their data and materials,
+             node trees, world and scene), without duplicates
+    """
+    ids = []
+    seen = set()
+
+    def add(id_data):
+        if id_data is not None and id_data.as_pointer() not in seen:
+            seen.add(id_data.as_pointer())
+            ids.append(id_data)
+
+    add(scene)
+    add(scene.world)
+    if scene.world is not None:
+        add(scene.world.node_tree)
+    for obj in scene.objects:
+        add(obj)
+        add(obj.data)
+        for slot in obj.material_slots:
+            add(slot.material)
+            if slot.material is not None:
+                add(slot.material.node_tree)
+    return ids
+
+
+def get_video_users(scene):
+    """
+    :return: List of image users of all videos, which are used by materials of the scene
+    """
+    users = []
+    seen = set()
+    for obj in scene.objects:
+        for slot in obj.material_slots:
+            if slot.material is None or slot.material.node_tree is None:
+                continue
+            if slot.material.as_pointer() in seen:
+                continue
+            seen.add(slot.material.as_pointer())
+            for node in slot.material.node_tree.nodes:
+                if node.type == 'TEX_IMAGE' and node.image is not None and node.image.source == 'MOVIE':
+                    users.append(node.image_user)
+    return users
+
+
+def get_value_type(id_data, fcurve):
+    """
+    :return: Python type (bool, int or float) of the property, which is animated by 'fcurve'
+    """
+    try:
+        value = id_data.path_resolve(fcurve.data_path)
+    except ValueError:
+        return float
+    if not isinstance(value, (bool, int, float, str)):
+        try:
+            value = value[fcurve.array_index]
+        except (TypeError, IndexError):
+            return float
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, str)):  # Enums are animated by their index
+        return int
+    return float
+
+
+def get_fcurve_span(fcurve, frame_start, frame_end):
+    """
+    Frames, outside of which the F-curve is constant
+    :return: Tuple (first, last) of frames, which might differ from their previous frame, or None
+    """
+    points = fcurve.keyframe_points
+    if len(points) == 0 and len(fcurve.modifiers) == 0:
+        return None
+    if len(fcurve.modifiers) > 0 or (fcurve.extrapolation != 'CONSTANT' and len(points) > 1):
+        return frame_start, frame_end
+    first = math.floor(min(p.co[0] for p in points))
+    last = math.ceil(max(p.co[0] for p in points)) + 1
+    if last < frame_start or first > frame_end:
+        return None
+    return max(first, frame_start), min(last, frame_end)
+
+
+def get_fcurve_changes(fcurve, value_type, frame_start, frame_end):
+    """
+    :return: (N) bool array, whether the evaluated property changes from frame f-1 to f, for f in [start, end]
+    """
+    changed = np.zeros(frame_end - frame_start + 1, dtype=bool)
+    span = get_fcurve_span(fcurve, frame_start, frame_end)
+    if span is None:
+        return changed
+    first, last = span
+    values = np.array([fcurve.evaluate(f) for f in range(first - 1, last + 1)])
+    if value_type is float:
+        differs = np.abs(np.diff(values)) > TOLERANCE * np.maximum(1, np.abs(values[1:]))
+    elif value_type is bool:
+        differs = np.diff(values >= 0.5)
+    else:
+        # Depending on the version, blender truncates or rounds values of integer properties
+        differs = (np.diff(np.trunc(values)) != 0) | (np.diff(np.floor(values + 0.5)) != 0)
+    changed[first - frame_start:last - frame_start + 1] = differs
+    return changed
+
+
+def get_video_changes(image_user, frame_start, frame_end):
+    """
+    The frame of a video follows the scene frame in [image_user.frame_start, frame_start + frame_duration - 1] and
+    is held otherwise, unless the video is cyclic (see BKE_image_user_frame_get)
+    :return: (N) bool array, whether the video shows a different frame at f than at f-1, for f in [start, end]
+    """
+    changed = np.zeros(frame_end - frame_start + 1, dtype=bool)
+    if image_user.frame_duration < 1:
+        return changed
+    if image_user.use_cyclic:
+        changed[:] = True
+        return changed
+    first = max(image_user.frame_start, frame_start)
+    last = min(image_user.frame_start + image_user.frame_duration - 1, frame_end)
+    if first <= last:
+        changed[first - frame_start:last - frame_start + 1] = True
+    return changed
+
+
+def get_changed_frames(scene, frame_start, frame_end, exclude=()):
+    """
+    Evaluate all animated properties and videos of the scene at each frame
+    :param exclude: Data-blocks, whose animation is ignored (e.g. the camera)
+    :return: (N) bool array, whether frame f differs from frame f-1, for f in [start, end]. The first frame is always
+             marked as changed.
+    """
+    changed = np.zeros(frame_end - frame_start + 1, dtype=bool)
+    if len(changed) == 0:
+        return changed
+    changed[0] = True
+    excluded = {id_data.as_pointer() for id_data in exclude}
+    for id_data in get_animated_ids(scene):
+        if id_data.as_pointer() in excluded:
+            continue
+        animation_data = getattr(id_data, "animation_data", None)
+        if animation_data is None:
+            continue
+        if len(animation_data.drivers) > 0:
+            # Drivers can depend on anything, e.g. the frame => Assume they change each frame
+            changed[:] = True
+            return changed
+        for track in animation_data.nla_tracks:
+            if track.mute:
+                continue
+            for strip in track.strips:
+                first = max(int(math.floor(strip.frame_start)), frame_start)
+                last = min(int(math.ceil(strip.frame_end)) + 1, frame_end)
+                if first <= last:
+                    changed[first - frame_start:last - frame_start + 1] = True
+        if animation_data.action is None:
+            continue
+        for fcurve in animation_data.action.fcurves:
+            if fcurve.mute:
+                continue
+            changed |= get_fcurve_changes(fcurve, get_value_type(id_data, fcurve), frame_start, frame_end)
+    for image_user in get_video_users(scene):
+        changed |= get_video_changes(image_user, frame_start, frame_end)
+    return changed
+
+
+def get_duplicate_sources(changed, frame_start):
+    """
+    :param changed: Result of get_changed_frames
+    :return: Dict duplicate frame -> identical frame, which is rendered
+    """
+    sources = {}
+    source = frame_start
+    for i in range(len(changed)):
+        if changed[i]:
+            source = frame_start + i
+        else:
+            sources[frame_start + i] = source
+    return sources
+
+
+def find_duplicate_frames(scene, frame_start, frame_end):
+    """
+    :return: Dict duplicate frame -> identical frame, which is rendered
+    """
+    return get_duplicate_sources(get_changed_frames(scene, frame_start, frame_end), frame_start)
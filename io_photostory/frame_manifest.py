@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Frame manifest of an imported photostory: duplicate frames and the content (segment) of each frame range.
+
+Format (json):
+{
+    "version": 2,
+    "frame_start": 1, "frame_end": 1000, "fps": 24,
+    "render_filepath": "/tmp/render/", "file_extension": ".png",
+    "segments": [{"type": "photo", "start": 1, "end": 108, "slide": 0}, ...],
+    "duplicate_frames": [2, 3, ...],
+    "duplicate_sources": {"2": 1, "3": 1, ...},
+    "plates": [{"slide": 0, "frame": 1, "camera_x": 960.0, "path": "/tmp/render/plates/slide_0000.png",
+                "width": 2080, "height": 1080}, ...],
+    "plate_frames": {"1": 960.0, ...},
+    "plate_scale": 1.0, "frame_size": [1920, 1080],
+    "parts": [{"blend": "/tmp/story.part000.blend", "manifest": "/tmp/story.part000.frames.json",
+               "frame_start": 1, "frame_end": 5000}, ...]
+}
+Plates and parts are optional, see plates.py and cli.py (--slides-per-part).
+"""
+
+import json
+import os
+import re
+
+MANIFEST_NAME = "photostory_frames.json"
+VERSION = 2
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version", 0) > VERSION:
+        raise RuntimeError("Frame manifest {} is newer than this version of photostory.".format(path))
+    return manifest
+
+
+def concatenate_manifests(manifests, parts):
+    """
+    Combine the manifests of consecutive parts of a story
+    :param manifests: Manifests of parts, in order
+    :param parts: List of dicts, which describe each part (e.g. its .blend file), frame ranges are added
+    :return: Combined manifest
+    """
+    result = dict(manifests[0])
+    result.update({"frame_end": manifests[-1]["frame_end"], "segments": [], "duplicate_frames": [],
+                   "duplicate_sources": {}, "plates": [], "plate_frames": {}, "parts": []})
+    for i, (manifest, part) in enumerate(zip(manifests, parts)):
+        if i > 0 and manifest["frame_start"] != manifests[i - 1]["frame_end"] + 1:
+            raise RuntimeError("Parts of story are not consecutive.")
+        result["segments"] += manifest.get("segments", [])
+        result["duplicate_frames"] += manifest.get("duplicate_frames", [])
+        result["duplicate_sources"].update(manifest.get("duplicate_sources", {}))
+        result["plates"] += [dict(plate, part=i) for plate in manifest.get("plates", [])]
+        result["plate_frames"].update(manifest.get("plate_frames", {}))
+        result["parts"].append(dict(part, frame_start=manifest["frame_start"], frame_end=manifest["frame_end"]))
+    return result
+
+
+def get_part(manifest, frame):
+    """
+    :return: Index of the part, which renders a frame, or None if the story is not split
+    """
+    for i, part in enumerate(manifest.get("parts", [])):
+        if part["frame_start"] <= frame <= part["frame_end"]:
+            return i
+    return None
+
+
+def get_ranges(frames):
+    """
+    Compress frame numbers into ranges
+    :param frames: Iterable of frame numbers
+    :return: Sorted list of inclusive ranges (first, last)
+    """
+    ranges = []
+    for f in sorted(set(frames)):
+        if len(ranges) > 0 and ranges[-1][1] == f - 1:
+            ranges[-1][1] = f
+        else:
+            ranges.append([f, f])
+    return [tuple(r) for r in ranges]
+
+
+def get_unique_frames(manifest):
+    """
+    :return: Sorted list of frames, which have to be rendered (neither duplicates nor composited from plates)
+    """
+    skipped = set(manifest.get("duplicate_frames", []))
+    skipped.update(int(f) for f in manifest.get("plate_frames", {}))
+    return [f for f in range(manifest["frame_start"], manifest["frame_end"] + 1) if f not in skipped]
+
+
+def get_duplicate_sources(manifest):
+    """
+    :return: Dict duplicate frame -> frame, which is identical and rendered. Without explicit sources, the last
+             preceding frame, which is not a duplicate, is used.
+    """
+    sources = manifest.get("duplicate_sources")
+    if sources is not None:
+        return {int(f): int(s) for f, s in sources.items()}
+    sources = {}
+    duplicates = set(manifest.get("duplicate_frames", []))
+    source = None
+    for f in range(manifest["frame_start"], manifest["frame_end"] + 1):
+        if f not in duplicates:
+            source = f
+        elif source is not None:
+            sources[f] = source
+    return sources
+
+
+def get_frame_path(filepath, frame, extension=""):
+    """
+    Path of a rendered frame, like blender names it: the last group of '#' in the file name is replaced by the
+    zero-padded frame number, otherwise 4 digits are appended.
+    :param filepath: Absolute render output path
+    :param extension: File extension, if added by blender (see bpy.types.RenderSettings.use_file_extension)
+    """
+    directory, name = os.path.split(filepath)
+    hashes = list(re.finditer("#+", name))
+    if len(hashes) > 0:
+        m = hashes[-1]
+        name = name[:m.start()] + str(frame).zfill(m.end() - m.start()) + name[m.end():]
+    else:
+        name += "{:04d}".format(frame)
+    return os.path.join(directory, name + extension)
+
+
+def get_manifest_frame_path(manifest, frame):
+    return get_frame_path(manifest["render_filepath"], frame, manifest.get("file_extension", ""))
+
+
+def format_frame_ranges(ranges):
+    """
+    Frame list in the format of blender's command-line option -f, e.g. "1..10,15,20..30"
+    """
+    return ",".join(str(a) if a == b else "{}..{}".format(a, b) for a, b in ranges)
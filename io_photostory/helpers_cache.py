@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+def get_cache_dir(*subdirs):
+    """
+    Returns the directory used for persistent caches, creating it if necessary.
+    The location can be changed with the environment variable PHOTOSTORY_CACHE_DIR.
+    :param subdirs: Optional sub-directories within the cache directory
+    :return: Absolute path of the (sub-)directory
+    """
+    root = os.environ.get("PHOTOSTORY_CACHE_DIR")
+    if not root:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+        root = os.path.join(xdg_cache, "photostory")
+    path = os.path.join(root, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_file_signature(path):
+    """
+    Cheap identity of a file, which changes whenever the file is modified.
+    :param path: Path of file
+    :return: Tuple (modification time in ns, size in bytes)
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class JsonCache:
+    """
+    Persistent key-value store backed by a json file. Values have to be json serializable.
+    Changes are only written to disk when calling 'save'.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        self.entries = {}
+        if os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                log.warning("Ignoring corrupt cache file: {}".format(path))
+                self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def set(self, key, value):
+        self.entries[key] = value
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -18,8 +18,14 @@
 
 import bpy
 import math
+import numpy as np
 from mathutils import Vector
 
+from .deformation import grid_coordinates, grid_faces, grid_uvs
+
+# Grid meshes with the topology of subdivided planes, see 'create_grid_meshdata'
+_grid_templates = {}
+
 
 def create_plane_meshdata(w, h, uv_border=0):
     verts = [
@@ -45,7 +51,98 @@ def create_plane_meshdata(w, h, uv_border=0):
     return mesh_data
 
 
-def create_spiral_meshdata(center=(0, 0, 0), offset=1, points_per_round=20, rounds=3, extend=0, invert_direction=False):
+def get_grid_template(cuts):
+    """
+    Returns a mesh with the topology of a plane, which is subdivided 'cuts' times. Created once per number of cuts.
+    """
+    template = _grid_templates.get(cuts)
+    if template is not None:
+        try:
+            template.name
+            return template
+        except ReferenceError:  # Template was removed
+            pass
+    template = bpy.data.meshes.new("grid_template_{}".format(cuts))
+    template.from_pydata(grid_coordinates(1, 1, cuts).tolist(), [], grid_faces(cuts).tolist())
+    template.uv_layers.new()
+    _grid_templates[cuts] = template
+    return template
+
+
+def set_meshdata_coordinates(mesh_data, coordinates):
+    """
+    Overwrite all vertex coordinates of a mesh at once
+    :param mesh_data: bpy.types.Mesh
+    :param coordinates: (N,3) array, N has to match the number of vertices
+    """
+    mesh_data.vertices.foreach_set("co", np.asarray(coordinates, dtype=np.float32).ravel())
+    mesh_data.update()
+
+
+def create_grid_meshdata(w, h, cuts=0, uv_border=0, coordinates=None):
+    """
+    Create a plane, which is subdivided 'cuts' times in each direction (see deformation.grid_coordinates)
+    :param w: Width of plane
+    :param h: Height of plane
+    :param cuts: Number of subdivisions
+    :param uv_border: Border of texture coordinates, see 'create_plane_meshdata'
+    :param coordinates: Optional (N,3) array of (deformed) vertex coordinates
+    :return: bpy.types.Mesh
+    """
+    mesh_data = get_grid_template(cuts).copy()
+    mesh_data.name = "plane"
+    if coordinates is None:
+        coordinates = grid_coordinates(w, h, cuts)
+    mesh_data.uv_layers.active.data.foreach_set("uv", grid_uvs(w, h, cuts, uv_border).astype(np.float32).ravel())
+    set_meshdata_coordinates(mesh_data, coordinates)
+    return mesh_data
+
+
+def create_meshdata(name, vertices, faces, loop_uvs=None, material_indices=None):
+    """
+    Create a mesh from arrays at once
+    :param name: Name of mesh data-block
+    :param vertices: (N,3) array
+    :param faces: (F,4) array of vertex indices (quads)
+    :param loop_uvs: Optional (F*4,2) array of texture coordinates
+    :param material_indices: Optional (F) array of material indices
+    :return: bpy.types.Mesh
+    """
+    faces = np.asarray(faces, dtype=np.int32)
+    mesh_data = bpy.data.meshes.new(name)
+    mesh_data.vertices.add(len(vertices))
+    mesh_data.vertices.foreach_set("co", np.asarray(vertices, dtype=np.float32).ravel())
+    mesh_data.loops.add(faces.size)
+    mesh_data.loops.foreach_set("vertex_index", faces.ravel())
+    mesh_data.polygons.add(len(faces))
+    mesh_data.polygons.foreach_set("loop_start", np.arange(0, faces.size, 4, dtype=np.int32))
+    mesh_data.polygons.foreach_set("loop_total", np.full(len(faces), 4, dtype=np.int32))
+    if material_indices is not None:
+        mesh_data.polygons.foreach_set("material_index", np.asarray(material_indices, dtype=np.int32))
+    if loop_uvs is not None:
+        mesh_data.uv_layers.new()
+        mesh_data.uv_layers.active.data.foreach_set("uv", np.asarray(loop_uvs, dtype=np.float32).ravel())
+    mesh_data.update(calc_edges=True)
+    return mesh_data
+
+
+def create_poly_curvedata(name, points):
+    """
+    Create a 3D curve with a single poly-line spline
+    :param name: Name of curve data-block
+    :param points: List of 3D points
+    :return: bpy.types.Curve
+    """
+    curve_data = bpy.data.curves.new(name, 'CURVE')
+    curve_data.dimensions = '3D'
+    spline = curve_data.splines.new(type='POLY')
+    spline.points.add(len(points) - 1)
+    for sp, p in zip(spline.points, points):
+        sp.co = (p[0], p[1], p[2], 1.0)
+    return curve_data
+
+
+def create_spiral_points(center=(0, 0, 0), offset=1, points_per_round=20, rounds=3, extend=0, invert_direction=False):
 
     verts = []
     for i in range(points_per_round * rounds + 1):
@@ -63,6 +160,12 @@ def create_spiral_meshdata(center=(0, 0, 0), offset=1, points_per_round=20, roun
             verts[i] = verts[i]-verts[len(verts)-1]
         verts.reverse()
 
+    return verts
+
+
+def create_spiral_meshdata(center=(0, 0, 0), offset=1, points_per_round=20, rounds=3, extend=0, invert_direction=False):
+    verts = create_spiral_points(center, offset, points_per_round, rounds, extend, invert_direction)
+
     edges = []
     for i in range(len(verts) - 1):
         edges.append([i, i + 1])
@@ -18,6 +18,8 @@
 
 import bpy
 
+from . import profiling
+
 """
 Blender area types:
 ‘EMPTY’, ‘VIEW_3D’, ‘TIMELINE’, ‘GRAPH_EDITOR’, ‘DOPESHEET_EDITOR’, ‘NLA_EDITOR’, ‘IMAGE_EDITOR’, ‘CLIP_EDITOR’,
@@ -76,6 +78,19 @@ def get_override(area_type):
     raise RuntimeError("Target area type not available:", area_type)
 
 
+def get_areas(area_type):
+    """
+    Iterates all areas of the provided 'area_type'. Yields nothing when running in background mode.
+    :param area_type: String, which identifies the view
+    """
+    if bpy.context.window_manager is None:
+        return
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == area_type:
+                yield area
+
+
 def get_area(area_type):
     """
     Searches areas in all windows for the provided 'area_type'
@@ -105,6 +120,7 @@ def enter_editmode(obj, execution_context=None):
     bpy.ops.object.select_all(execution_context, action='DESELECT')
     bpy.context.view_layer.objects.active = obj
     bpy.ops.object.mode_set(execution_context, mode='EDIT', toggle=False)
+    profiling.count("operator_calls", 2)
     return execution_context
 
 
@@ -112,9 +128,11 @@ def leave_editmode(execution_context=None):
     if execution_context is None:
         execution_context = get_override('VIEW_3D')
     bpy.ops.object.mode_set(execution_context, mode='OBJECT', toggle=False)
+    profiling.count("operator_calls")
 
 
 def select_only(obj):
     bpy.ops.object.select_all(action='DESELECT')
+    profiling.count("operator_calls")
     obj.select = True
 
@@ -0,0 +1,1250 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import hashlib
+import logging
+import math
+import os
+from mathutils import Vector
+from itertools import chain, islice
+import json
+import bpy
+import numpy as np
+import random
+
+from bpy_extras.image_utils import load_image
+from bpy_extras.io_utils import ImportHelper
+from bpy.props import StringProperty, BoolProperty, FloatProperty, EnumProperty
+
+from . import animation
+from . import deformation
+from . import frame_analysis
+from . import frame_manifest
+from . import layout
+from . import layout_engine
+from . import materials
+from . import media_probe
+from . import plates
+from . import profiling
+from . import proxies
+from . import story_reader
+from . import timeline
+from . import world_map
+from .helpers_views import *
+from .helpers_geometry import *
+from .helpers_cache import get_cache_dir, get_file_signature, JsonCache
+
+log = logging.getLogger(__name__)
+
+SLIDE_TYPES = ("photo_slide", "gps_slide")
+
+
+def check_slide_type(index, slide_type):
+    """
+    Raise an error for slides of unknown type, before anything of the story is built
+    """
+    if slide_type not in SLIDE_TYPES:
+        raise RuntimeError("Unknown slide type: {} (slide {})".format(slide_type, index))
+
+
+def get_slide_hash(slide_desc, settings):
+    """
+    Hash of everything the geometry of a slide depends on: its description, the referenced files and 'settings'
+    :param slide_desc: Slide description (json), with absolute paths
+    :param settings: Json serializable, global settings that influence slides
+    :return: Hex-string
+    """
+    h = hashlib.sha1(json.dumps([slide_desc, settings], sort_keys=True).encode('utf-8'))
+    for p in chain(slide_desc.get("foreground_paths", []), slide_desc.get("background_paths", [])):
+        try:
+            h.update(str(get_file_signature(p)).encode('utf-8'))
+        except OSError:
+            h.update(b"missing")
+    return h.hexdigest()
+
+
+def get_slide_seed(slide_desc):
+    """
+    Seed of all random choices of a slide: the value of "seed" in its description, or derived from its type, name and
+    the names of its files (stable across machines and re-imports)
+    :return: Integer
+    """
+    if "seed" in slide_desc:
+        return int(slide_desc["seed"])
+    names = [slide_desc.get("type"), slide_desc.get("name")]
+    for key in ("foreground_paths", "background_paths"):
+        names.append([os.path.basename(p) for p in slide_desc.get(key, [])])
+    return int(hashlib.sha1(json.dumps(names).encode('utf-8')).hexdigest()[:8], 16)
+
+
+def get_layout_key(slide, strategy):
+    """
+    Key of a slide within the layout cache: everything its layout depends on
+    """
+    sizes = [[(p.width, p.height) for p in slide.photos], [(p.width, p.height) for p in slide.photos_background]]
+    key = json.dumps([slide.seed, sizes, [slide.width, slide.height], strategy])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def get_num_data_blocks():
+    """
+    :return: Dict type -> number of data-blocks, for the types created by imports
+    """
+    return {"objects": len(bpy.data.objects), "meshes": len(bpy.data.meshes), "curves": len(bpy.data.curves),
+            "materials": len(bpy.data.materials), "images": len(bpy.data.images), "actions": len(bpy.data.actions)}
+
+
+def get_num_keyframes():
+    """
+    :return: Number of keyframes of all actions
+    """
+    return sum(len(c.keyframe_points) for a in bpy.data.actions for c in a.fcurves)
+
+
+def remove_object_tree(obj, materials=None):
+    """
+    Remove an object, all its children and their mesh / curve data, if not used otherwise
+    :param materials: Optional set, which collects the materials of removed objects (see 'remove_unused_materials')
+    """
+    for child in list(obj.children):
+        remove_object_tree(child, materials)
+    if materials is not None:
+        materials.update(slot.material for slot in obj.material_slots if slot.material is not None)
+    data = obj.data
+    bpy.data.objects.remove(obj)
+    if data is not None and data.users == 0:
+        if isinstance(data, bpy.types.Mesh):
+            bpy.data.meshes.remove(data)
+        elif isinstance(data, bpy.types.Curve):
+            bpy.data.curves.remove(data)
+
+
+def remove_unused_materials(materials):
+    """
+    Remove materials, which are not used anymore, and their images, if not used otherwise
+    :return: Number of removed materials
+    """
+    images = set()
+    num_removed = 0
+    for material in materials:
+        if material.users > 0:
+            continue
+        if material.node_tree is not None:
+            images.update(n.image for n in material.node_tree.nodes if n.type == 'TEX_IMAGE' and n.image is not None)
+        bpy.data.materials.remove(material)
+        num_removed += 1
+    for image in images:
+        if image.users == 0:
+            bpy.data.images.remove(image)
+    return num_removed
+
+class Photo(layout.Rectangle):
+    def __init__(self, path, size):
+        """
+        :param path: Absolute path of the image / video file
+        :param size: Tuple (width, height) of the image, as probed from the file header
+        """
+        layout.Rectangle.__init__(self, 0, 0, size[0], size[1])
+        self.path = path
+        self.image = None  # bpy.types.Image, loaded lazily when creating the photo object
+        self.object = None
+        self.texture_node = None
+        self.type = "UNKNOWN"
+
+        # Geometry, see 'add_deformation' and 'Slide.add_randomization'
+        self.uv_border = 0.025
+        self.cuts = 0
+        self.corner_lifts = None
+        self.proportional_size = 200
+        self.rotation = 0
+
+    def add_deformation(self, max_edge_transition=20, proportional_size=200, cuts=20, rng=random):
+        """
+        Subdivide the photo and lift its corners randomly (like proportional editing with sharp falloff)
+        :param rng: Source of randomness (random.Random or the module 'random')
+        """
+        self.cuts = cuts
+        self.corner_lifts = [rng.random() * max_edge_transition for i in range(4)]
+        self.proportional_size = proportional_size
+        if self.object is not None:
+            self.update_geometry()
+
+    def get_coordinates(self):
+        """
+        :return: (N,3) array of all vertices of the photo, including deformation and rotation
+        """
+        return deformation.photo_coordinates(self.width, self.height, self.cuts, self.corner_lifts,
+                                             self.proportional_size, self.rotation)
+
+    def update_geometry(self):
+        coordinates = self.get_coordinates()
+        if len(self.object.data.vertices) == len(coordinates):
+            set_meshdata_coordinates(self.object.data, coordinates)
+        else:
+            mesh_data = create_grid_meshdata(self.width, self.height, self.cuts, self.uv_border, coordinates)
+            for m in self.object.data.materials:
+                mesh_data.materials.append(m)
+            self.object.data = mesh_data
+
+
+class Slide(layout.Size):
+    def __init__(self, size, json, duration, root=None):
+        """
+        :param size: Size of the slide
+        :param json: Description of the slide
+        :param duration: Default duration in seconds
+        :param root: Existing root object of the slide (incremental import), a new root is created if None
+        """
+        layout.Size.__init__(self, size.width, size.height)
+        self.photos = []
+        self.photos_background = []
+        self.texts = []
+        #self.duration = 4.5 if kwargs.get("duration") is None else kwargs.get("duration")
+        self.duration = duration
+        self.longest_video_frames = 0
+        self.json = json
+        self.seed = get_slide_seed(json)
+        self.root = root
+        if self.root is None:
+            self.root = bpy.data.objects.new("slide", None)
+            self.root["photostory_role"] = "slide"
+            bpy.context.view_layer.active_layer_collection.collection.objects.link(self.root)
+        else:
+            self.longest_video_frames = self.root.get("photostory_video_frames", 0)
+
+    def get_type(self):
+        return self.json["type"]
+
+    def has_video(self):
+        return self.longest_video_frames > 0
+
+    def get_random(self, purpose):
+        """
+        Independent, reproducible source of randomness for each purpose (e.g. "layout"), such that skipping one
+        (cached layouts) does not change the others
+        :return: random.Random
+        """
+        return random.Random("{}-{}".format(self.seed, purpose))
+
+    def get_video_nodes(self):
+        """
+        :return: Image texture nodes of all videos on this slide
+        """
+        nodes = []
+        for obj in self.root.children:
+            for slot in obj.material_slots:
+                if slot.material is None or slot.material.node_tree is None:
+                    continue
+                for node in slot.material.node_tree.nodes:
+                    if node.type == 'TEX_IMAGE' and node.image is not None and node.image.source == 'MOVIE':
+                        nodes.append(node)
+        return nodes
+
+    def start_videos_at(self, frame):
+        for node in self.get_video_nodes():
+            node.image_user.frame_start = frame
+
+    def generate_layout(self, canvas_rect, layout_search=None):
+        # for p in self.photos:
+        #     print("{} {}: ".format(p.width, p.height, p.image.filepath))
+
+        # bg_scale = 0.66 * layout.generate_layout(self.photos, canvas_rect)
+        #
+        # if len(self.photos_background) > 0:
+        #     layout.scale_layout(self.photos, 0.8)
+        # layout.center_layout(self.photos, canvas_rect)
+        #
+        # # Evenly distribute background pictures
+        # if len(self.photos_background) > 0:
+        #     angle = 2 * math.pi / len(self.photos_background)
+        layout.generate_layout_1(self.photos, self.photos_background, canvas_rect, layout_search,
+                                 self.get_random("layout"))
+
+
+        # Randomly place background objects
+        # bg_rects = layout.get_background_rectangles(self.photos, canvas_rect)
+        # for bg_photo in self.photos_background:
+        #     p = layout.sample_in_rectangles(bg_rects)
+        #     bg_photo.width *= bg_scale
+        #     bg_photo.height *= bg_scale
+        #     bg_photo.x = p[0] - bg_photo.width / 2
+        #     bg_photo.y = p[1] - bg_photo.height / 2
+
+    def add_randomization(self, rotation_sigma=0.02, rng=random):
+        for p in self.photos:
+            p.rotation = rng.normalvariate(0, rotation_sigma)
+            if p.object is not None:
+                p.update_geometry()
+
+        for p in self.photos_background:
+            p.rotation = rng.normalvariate(0, 6 * rotation_sigma)
+            if p.object is not None:
+                p.update_geometry()
+
+    def release(self):
+        """
+        Drop the python-side state of a built and animated slide, its objects are kept (see 'chunked' builds)
+        """
+        self.photos = []
+        self.photos_background = []
+        self.texts = []
+        self.json = {"type": self.get_type()}
+
+
+class PhotostoryBuilder:
+    """
+    Generates the scene of a photostory. Only blender's data API is used, such that scenes can be built without user
+    interface as well (blender --background).
+    """
+    def __init__(self, setup_scene=True, unroll_map=True, skip_duplicates=True, default_slide_duration=4.5,
+                 use_proxies=True, incremental=False, layout_strategy="greedy", use_plates=False,
+                 chunked=False, chunk_size=64, first_slide=0, num_slides=None, first_frame=1,
+                 use_video_proxies=False, proxy_dir=None):
+        self.setup_scene = setup_scene
+        self.unroll_map = unroll_map
+        self.skip_duplicates = skip_duplicates
+        self.default_slide_duration = default_slide_duration
+        self.use_proxies = use_proxies
+        self.use_video_proxies = use_video_proxies
+        self.proxy_dir = proxy_dir
+        self.incremental = incremental
+        self.layout_strategy = layout_strategy
+        self.use_plates = use_plates
+        self.chunked = chunked
+        self.chunk_size = chunk_size
+        # Part of a story, see 'get_part_slides'
+        self.first_slide = first_slide
+        self.num_slides = num_slides
+        self.first_frame = first_frame
+        self.warnings = []
+
+    def get_part_slides(self, total):
+        """
+        Slides of the story, which are built. For a part of a story (see cli.py, '--slides-per-part'), the first slide
+        of the next part is built as well, such that the transition to it can be rendered.
+        :param total: Number of slides of the story
+        :return: Tuple (first, stop, end): the part owns slides in [first, stop), slides in [first, end) are built
+        """
+        if self.num_slides is None:
+            return self.first_slide, total, total
+        stop = min(self.first_slide + self.num_slides, total)
+        return self.first_slide, stop, min(stop + 1, total)
+
+    def warn(self, message):
+        log.warning(message)
+        self.warnings.append(message)
+
+    def build(self, filepath):
+        """
+        Generate the scene of a story (json). Timing spans and counters are recorded, if a profiler is active (see
+        profiling.py).
+        """
+        profiled = profiling.get_active() is not None
+        num_blocks = get_num_data_blocks()
+        num_keyframes = get_num_keyframes() if profiled else 0
+        with profiling.span("build"):
+            self.build_scene(filepath)
+        for name, n in get_num_data_blocks().items():
+            profiling.count(name + "_created", n - num_blocks[name])
+        if profiled:
+            # Incremental imports keep the keyframes of a previous import, only the difference is counted
+            profiling.count("keyframes_created", get_num_keyframes() - num_keyframes)
+
+    def build_scene(self, filepath):
+
+        self.images = {}
+        self.image_sizes = {}
+        self.video_frames = {}  # Path of video -> number of frames it is played (of the proxy, if there is one)
+        self.removed_materials = set()  # Materials of removed objects (incremental import), see remove_unused_materials
+        self.proxies = {}
+        self.layout_search = None
+        if self.layout_strategy != "greedy":
+            strategies = layout_engine.STRATEGIES.keys() if self.layout_strategy == "best" else [self.layout_strategy]
+            executable = getattr(bpy.app, "binary_path_python", None)  # Blender < 2.91 embeds python
+            self.layout_search = layout_engine.LayoutSearch(strategies, executable=executable)
+        self.layout_cache = JsonCache(os.path.join(get_cache_dir(), "layouts.json"))
+        self.materials = materials.PhotoMaterialPool()
+        self.slides = []
+        self.duplicate_frames = []
+        self.duplicate_sources = {}  # Duplicate frame -> identical frame, which is rendered
+        self.segments = []  # Content of frame ranges, see frame_manifest.py
+        self.timeline = None  # Frames of slides, see timeline.py
+        self.keyframes = animation.KeyframeWriter()  # Keyframes of all animations, written at once (per chunk)
+        self.plates = []  # Slides, which are rendered once, see plates.py
+        self.plate_frames = {}  # Frame -> camera location (x), composited from plates
+        self.plate_scale = None  # Pixels per scene unit
+        self.world_map = None
+        self.camera = None
+        self.scene = bpy.context.scene
+        self.canvas = layout.Rectangle(0, 0, self.scene.render.resolution_x, self.scene.render.resolution_y)
+        self.max_wh = max(self.canvas.height, self.canvas.width)
+        self.camera_origin = Vector((self.canvas.width / 2, self.canvas.height / 2, self.max_wh / 2))
+        self.assets_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "assets")
+
+        # self.renderer = 'INTERNAL'
+
+        # "Hidden" settings
+        self.use_orthographic_camera = False
+        self.transition_time = timeline.TRANSITION_TIME
+        self.photo_rotation_sigma = 0.02
+        self.photo_max_edge_transition = 20
+        self.offset_slides = 0.08 * self.canvas.width
+
+        # Find objects of previous import
+        existing = self.collect_existing_objects() if self.incremental else {}
+
+        # Create camera
+        if "camera" in existing:
+            self.camera = existing["camera"][0]
+            self.camera.animation_data_clear()
+        else:
+            cam_data = bpy.data.cameras.new("camera_data")
+            if self.use_orthographic_camera:
+                cam_data.type = 'ORTHO'
+                cam_data.ortho_scale = self.max_wh
+            else:
+                cam_data.type = 'PERSP'
+                cam_data.ortho_scale = self.max_wh
+                cam_data.lens_unit = 'FOV'
+                cam_data.angle = 1.57254
+            cam_data.clip_end = 100000
+            self.camera = bpy.data.objects.new("Camera", cam_data)
+            self.camera["photostory_role"] = "camera"
+            bpy.context.view_layer.active_layer_collection.collection.objects.link(self.camera)
+        self.camera.location = self.camera_origin
+
+        # Setup scene
+        if self.setup_scene:
+            # Adjust far clipping of 3D views (if there are any)
+            for area in get_areas('VIEW_3D'):
+                area.spaces.active.clip_end = max(100000, area.spaces.active.clip_end)
+
+            # Create world, if not existing
+            if bpy.context.scene.world is None:
+                log.info("Creating new world data-block...")
+                bpy.context.scene.world = bpy.data.worlds.new("World")
+
+            # Enable ambient occlusion
+            bpy.context.scene.world.light_settings.use_ambient_occlusion = True
+            bpy.context.scene.world.light_settings.ao_factor = 1
+            bpy.context.scene.camera = self.camera
+
+        # Create lamp
+        if "light" not in existing:
+            light = bpy.data.objects.new("Sun", bpy.data.lights.new("Sun", 'SUN'))
+            light["photostory_role"] = "light"
+            light.location = Vector((0, 0, 5000))
+            bpy.context.view_layer.active_layer_collection.collection.objects.link(light)
+
+        # Background and map are cheap to recreate, slides are only recreated if they changed
+        for obj in chain(existing.get("background", []), existing.get("map", [])):
+            remove_object_tree(obj, self.removed_materials)
+        existing_slides = {}
+        for root in existing.get("slide", []):
+            existing_slides.setdefault(root.get("photostory_hash"), []).append(root)
+        # bpy.ops.object.lamp_add(type='SUN', view_align=False, location=(0, 0, 5000), layers=(
+        #     True, False, False, False, False, False, False, False, False, False, False, False, False, False, False,
+        #     False,
+        #     False, False, False, False))
+        # bpy.context.object.data.use_specular = False # Handled by material already
+
+        log.info("Generating photostory...")
+        log.info("- Canvas size: {}x{}".format(self.canvas.width, self.canvas.height))
+
+        self.story_dir = os.path.dirname(filepath)
+        self.existing_slides = existing_slides
+        self.num_reused = 0
+        self.probe = media_probe.MediaProbe(os.path.join(get_cache_dir(), "media_probe.json"))
+        self.slide_settings = [self.canvas.width, self.canvas.height, self.scene.render.resolution_percentage,
+                               self.use_proxies, self.photo_rotation_sigma, self.photo_max_edge_transition,
+                               self.layout_strategy,
+                               self.scene.render.fps if self.use_video_proxies else None]  # Frames of videos
+        if self.chunked:
+            self.build_chunked(filepath)
+        else:
+            self.build_all(filepath)
+
+        # Materials and images of removed slides, unless new slides use them (the pool of materials is done)
+        num_removed = remove_unused_materials(self.removed_materials)
+        self.removed_materials = set()
+        if num_removed > 0:
+            log.info("- Removed {} unused materials".format(num_removed))
+        self.frame_end = self.timeline.frame_end
+        self.segments = self.timeline.segments
+        next_part = [segment for segment in self.segments if segment["slide"] >= self.stop_slide]
+        if len(next_part) > 0:
+            # Frames of the first slide of the next part are rendered by the next part
+            self.frame_end = next_part[0]["start"] - 1
+            self.segments = [segment for segment in self.segments if segment["slide"] < self.stop_slide]
+        if self.setup_scene:
+            bpy.context.scene.frame_start = self.first_frame
+            bpy.context.scene.frame_end = self.frame_end
+
+        # Identify duplicate / identical frames, by evaluating the animation of all frames
+        with profiling.span("frame_analysis"):
+            self.duplicate_sources = frame_analysis.find_duplicate_frames(self.scene, self.first_frame,
+                                                                          self.frame_end)
+            self.duplicate_frames = sorted(self.duplicate_sources)
+        if self.use_plates:
+            with profiling.span("plates"):
+                self.plan_plates()
+
+        # Create placeholder for duplicate frames (in order not to render those)
+        log.debug("Duplicate frames: {}".format(self.duplicate_frames))
+        log.info("There are {} frames that are duplicates and don't have to be rendered.".format(len(self.duplicate_frames)))
+        self.manifest = self.get_frame_manifest()
+        output_dir = os.path.dirname(self.manifest["render_filepath"])
+        skipped_frames = sorted(set(self.duplicate_frames).union(self.plate_frames))
+        if self.skip_duplicates and len(skipped_frames) > 0:
+            if os.path.isdir(output_dir):
+                bpy.context.scene.render.use_overwrite = False
+                log.info("Creating placeholder files ....")
+                with profiling.span("placeholders"):
+                    for f in skipped_frames:
+                        open(frame_manifest.get_manifest_frame_path(self.manifest, f), 'a').close()
+            else:
+                log.warning("Unable to create placeholder files as output directoy does not exist: {}".format(
+                    bpy.context.scene.render.filepath))
+
+        # Describe frames for render farm and post-processing (see photo-selector/generate_duplicates.py). The manifest
+        # of a story, which is split into parts, is written by cli.py.
+        if os.path.isdir(output_dir) and self.num_slides is None:
+            frame_manifest.save_manifest(os.path.join(output_dir, frame_manifest.MANIFEST_NAME), self.manifest)
+
+        log.info("Photostory ready!")
+
+    def build_all(self, filepath):
+        """
+        Load the whole story, then create all slides step by step (layouts, proxies, objects, animation)
+        """
+        log.info("- Loading json...")
+        with profiling.span("load_story"), open(filepath) as data_file:
+            slides_desc = json.load(data_file)
+            d = slides_desc.get("default_slide_duration")
+            if d is not None:
+                self.default_slide_duration = float(d)
+
+        # Parse all slides and store image paths
+        for i, slide_desc in enumerate(slides_desc["slides"]):
+            check_slide_type(i, slide_desc.get("type"))
+        first, self.stop_slide, end = self.get_part_slides(len(slides_desc["slides"]))
+        self.first_gps_slide = next((i for i, d in enumerate(slides_desc["slides"]) if d["type"] == "gps_slide"), None)
+        images_paths = set()
+        num_image_paths = 0
+        for slide_desc in slides_desc["slides"][first:end]:
+            paths = self.resolve_paths(slide_desc)
+            num_image_paths += len(paths)
+            images_paths.update(paths)
+
+        # Probe sizes of all images/videos (no duplicates). Pixel data is loaded lazily, when creating photo objects.
+        log.info("- Probing images/videos ({} unique of {} paths) ...".format(len(images_paths), num_image_paths))
+        with profiling.span("probe"):
+            self.probe_sizes(images_paths)
+
+        # Create title slide
+        #FIXME Introduce 'text_slide'
+        #self.slides.append(self.create_title_slide(self.canvas, "Vietnam\n2018"))
+
+        # Create (photo) slides, only layouts for now
+        with profiling.span("slides"):
+            for i in range(first, end):
+                self.slides.append(self.create_slide(i, slides_desc["slides"][i], slides_desc["slides"]))
+            self.finish_slides()
+
+        # Downscale photos to the size they are displayed at
+        if self.use_proxies or self.use_video_proxies:
+            with profiling.span("proxies"):
+                self.create_proxies(self.slides)
+
+        # Create photo objects
+        with profiling.span("photo_objects"):
+            for slide in self.slides:
+                if slide.get_type() == "photo_slide" and len(slide.root.children) == 0:
+                    self.build_photo_slide(slide, self.photo_rotation_sigma, self.photo_max_edge_transition)
+
+        # Create background
+        with profiling.span("background"):
+            self.create_background(len(self.slides), first)
+        # self.create_background(i+1)
+
+
+        # Plan frames of all slides, then create animation
+        self.timeline = self.create_timeline()
+        for slide in self.slides:
+            self.timeline.add_slide(slide.index, slide.json, slide.longest_video_frames, slide.duration)
+        with profiling.span("animation"):
+            bpy.context.view_layer.update()
+            profiling.count("depsgraph_updates")
+            for slide, planned in zip(self.slides, self.timeline.slides):
+                self.animate_slide(slide, planned)
+        self.write_keyframes()
+
+    def build_chunked(self, filepath):
+        """
+        Read the story slide by slide and build it in chunks of 'chunk_size' slides: each chunk is created, animated
+        and released, before the next chunk is read. Only a pre-pass (number of slides, gps slides) covers the whole
+        story.
+        """
+        log.info("- Scanning json...")
+        with profiling.span("scan_story"):
+            summary = story_reader.scan_story(filepath)
+        for slide_type, i in summary["slide_types"].items():
+            check_slide_type(i, slide_type)
+        d = summary["header"].get("default_slide_duration")
+        if d is not None:
+            self.default_slide_duration = float(d)
+        first_slide, self.stop_slide, end = self.get_part_slides(summary["num_slides"])
+        self.first_gps_slide = summary["gps_slides"][0]["index"] if len(summary["gps_slides"]) > 0 else None
+        self.create_background(end - first_slide, first_slide)
+
+        self.timeline = self.create_timeline()
+        slides_desc = islice(story_reader.iter_slides(filepath), first_slide, end)
+        for chunk in story_reader.iter_batches(slides_desc, self.chunk_size):
+            first = first_slide + len(self.slides)
+            with profiling.span("probe"):
+                images_paths = set()
+                for slide_desc in chunk:
+                    images_paths.update(self.resolve_paths(slide_desc))
+                self.probe_sizes(images_paths)
+
+            with profiling.span("slides"):
+                slides = [self.create_slide(first + i, slide_desc, summary["gps_slides"])
+                          for i, slide_desc in enumerate(chunk)]
+            if self.use_proxies or self.use_video_proxies:
+                with profiling.span("proxies"):
+                    self.create_proxies(slides)
+            with profiling.span("photo_objects"):
+                for slide in slides:
+                    if slide.get_type() == "photo_slide" and len(slide.root.children) == 0:
+                        self.build_photo_slide(slide, self.photo_rotation_sigma, self.photo_max_edge_transition)
+
+            with profiling.span("animation"):
+                bpy.context.view_layer.update()
+                profiling.count("depsgraph_updates")
+                for slide in slides:
+                    planned = self.timeline.add_slide(slide.index, slide.json, slide.longest_video_frames,
+                                                      slide.duration)
+                    self.animate_slide(slide, planned)
+                    slide.release()
+            self.write_keyframes()  # Keyframes of a chunk are not kept until the end of the build
+            self.slides += slides
+            log.info("- Built slides {}-{} of {}".format(first + 1, first + len(slides), summary["num_slides"]))
+
+        self.finish_slides()
+
+    def write_keyframes(self):
+        """
+        Write the collected keyframes of all animations (see animation.KeyframeWriter), the collection is cleared
+        """
+        with profiling.span("keyframes"):
+            profiling.count("keyframes_written", self.keyframes.get_num_keyframes())
+            self.keyframes.write()
+
+    def resolve_paths(self, slide_desc):
+        """
+        Make paths of a slide description absolute (relative paths are relative to the story file), in place
+        :return: List of paths of all images / videos of the slide
+        """
+        if slide_desc["type"] != "photo_slide":
+            return []
+        slide_desc["background_paths"] = [p if os.path.isabs(p) else os.path.join(self.story_dir, p) for p in slide_desc["background_paths"]]
+        slide_desc["foreground_paths"] = [p if os.path.isabs(p) else os.path.join(self.story_dir, p) for p in slide_desc["foreground_paths"]]
+        return slide_desc["background_paths"] + slide_desc["foreground_paths"]
+
+    def probe_sizes(self, paths):
+        """
+        Read the sizes of images / videos and the lengths of videos from their headers, such that blender only loads
+        them when creating photo objects
+        """
+        for p in paths:
+            path = os.path.abspath(p)
+            if path in self.image_sizes:
+                continue
+            size = None
+            if path.lower().endswith(media_probe.VIDEO_EXTENSIONS):
+                info = self.probe.get_video_info(path)
+                if info is not None:
+                    size = (info["width"], info["height"])
+                    self.video_frames[path] = media_probe.get_scene_frames(info)
+            if size is None:
+                size = self.probe.get_size(path)
+            if size is None:
+                # Unsupported header, let blender decode the file
+                img = self.get_image(path)
+                if img is not None:
+                    size = tuple(img.size)
+            if size is not None:
+                self.image_sizes[path] = size
+            else:
+                self.warn("Loadind image {} failed".format(path))
+
+    def create_slide(self, i, slide_desc, gps_slides):
+        """
+        Create the i-th slide (layout only) or reuse it from a previous import
+        :param gps_slides: Descriptions of all gps slides of the story, used to create the map
+        """
+        check_slide_type(i, slide_desc.get("type"))
+        slide_hash = get_slide_hash(slide_desc, self.slide_settings)
+        reusable = self.existing_slides.get(slide_hash)
+        if slide_desc["type"] == "gps_slide" and self.world_map is None:
+            with profiling.span("map"):
+                self.create_map(gps_slides)
+
+        if reusable:
+            slide = Slide(self.canvas, slide_desc, duration=self.default_slide_duration, root=reusable.pop())
+            self.num_reused += 1
+        elif slide_desc["type"] == "photo_slide":
+            slide = self.create_photo_slide(self.canvas, slide_desc)
+        else:
+            slide = Slide(self.canvas, slide_desc, duration=self.default_slide_duration)
+
+        slide.index = i
+        slide.root["photostory_hash"] = slide_hash
+        slide.root.location = Vector((i * (self.canvas.width+self.offset_slides), 0, 0))
+        return slide
+
+    def finish_slides(self):
+        """
+        Store computed layouts and remove slides of a previous import, which were not reused
+        """
+        if self.layout_search is not None:
+            self.layout_search.close()
+        self.layout_cache.save()
+        self.probe.save()
+
+        # Remove slides of previous import, which changed
+        for roots in self.existing_slides.values():
+            for root in roots:
+                remove_object_tree(root, self.removed_materials)
+        if self.incremental:
+            log.info("- Reusing {} of {} slides".format(self.num_reused, len(self.slides)))
+        profiling.count("slides_reused", self.num_reused)
+
+    def create_timeline(self):
+        unroll_slide = self.first_gps_slide if self.unroll_map else None
+        return timeline.Timeline(self.scene.render.fps, self.first_frame, self.default_slide_duration, unroll_slide,
+                                 self.transition_time)
+
+    def animate_slide(self, slide, planned):
+        """
+        Add the camera (and map) animation of a slide, at the frames planned by the timeline
+        :param planned: Slide of the timeline (see timeline.py)
+        """
+        # Set start location of frame
+        # TODO add optional variation
+        start_location = slide.root.matrix_world @ self.camera_origin
+        self.camera.location = start_location
+        self.keyframes.insert_property(self.camera, "location", planned["start"])
+        slide.start_videos_at(planned["start"])
+
+        if planned["type"] == "map":
+
+            # Move map to current slide
+            self.world_map.set_location(slide.root.location, planned["start"] - self.timeline.frames_transition)
+
+            # Add unroll animation, when showing map for the first time
+            if planned["unroll"] is not None:
+                with profiling.span("unroll"):
+                    self.world_map.add_unroll_animation(*planned["unroll"])
+
+            self.keyframes.insert_property(self.camera, "location", planned["route"][0])
+            with profiling.span("route"):
+                self.world_map.animate_route(slide.json["gps_coordinates"], self.camera, planned["route"][0],
+                                             planned["route"][1], planned["end"])
+
+        else:
+            # Insert keyframe for end location
+            end_location = start_location  # Todo: Allow variations here
+            self.camera.location = end_location
+            self.keyframes.insert_property(self.camera, "location", planned["end"])
+
+    def get_frame_manifest(self):
+        render = self.scene.render
+        return {"version": frame_manifest.VERSION,
+                "frame_start": self.first_frame,
+                "frame_end": self.frame_end,
+                "fps": render.fps,
+                "render_filepath": bpy.path.abspath(render.filepath),
+                "file_extension": render.file_extension if render.use_file_extension else "",
+                "segments": self.segments,
+                "duplicate_frames": sorted(int(f) for f in self.duplicate_frames),
+                "duplicate_sources": {str(f): s for f, s in sorted(self.duplicate_sources.items())},
+                "plates": self.plates,
+                "plate_frames": {str(f): x for f, x in sorted(self.plate_frames.items())},
+                "plate_scale": self.plate_scale,
+                "frame_size": list(self.get_frame_size())}
+
+    def get_frame_size(self):
+        render = self.scene.render
+        return (int(render.resolution_x * render.resolution_percentage / 100),
+                int(render.resolution_y * render.resolution_percentage / 100))
+
+    def plan_plates(self):
+        """
+        Choose the frames, which are composited from plates (see plates.py): all frames of photo slides without videos
+        and transitions between two of them, as long as nothing but the location (x) of the camera is animated.
+        Videos and maps are rendered in 3D.
+        """
+        frame_size = self.get_frame_size()
+        cam_data = self.camera.data
+        if cam_data.type == 'ORTHO':
+            self.plate_scale = max(frame_size) / cam_data.ortho_scale
+        else:
+            self.plate_scale = 0.5 * max(frame_size) / math.tan(0.5 * cam_data.angle) / self.camera_origin.z
+        plate_width = plates.get_plate_width(frame_size[0], self.plate_scale, self.offset_slides)
+        render = self.scene.render
+        extension = render.file_extension if render.use_file_extension else ""
+
+        # Number of changes of anything but the camera, up to each frame (index 0 is the first frame)
+        changes = np.cumsum(frame_analysis.get_changed_frames(self.scene, self.first_frame, self.frame_end,
+                                                              exclude=(self.camera,)))
+        action = self.camera.animation_data.action
+        location_curves = [action.fcurves.find("location", index=i) for i in range(3)]
+
+        def get_camera_location(f):
+            return [c.evaluate(f) if c is not None else self.camera.location[i] for i, c in enumerate(location_curves)]
+
+        slides = {slide.index: slide for slide in self.slides}
+        slide_plates = {}
+        for segment in self.segments:
+            slide = slides[segment["slide"]]
+            if segment["type"] != "photo" or slide.has_video():
+                continue
+            x, y, z = get_camera_location(segment["start"])
+            slide_plates[segment["slide"]] = {"slide": segment["slide"], "frame": segment["start"], "camera_x": x,
+                                              "path": plates.get_plate_path(bpy.path.abspath(render.filepath),
+                                                                            segment["slide"], extension),
+                                              "width": plate_width, "height": frame_size[1], "yz": (y, z)}
+
+        for segment in self.segments:
+            plate = slide_plates.get(segment["slide"])
+            if plate is None:
+                continue
+            required = [plate]
+            if segment["type"] == "transition":
+                required.append(slide_plates.get(segment["slide"] + 1))
+                if required[1] is None or \
+                        changes[required[1]["frame"] - self.first_frame] != changes[plate["frame"] - self.first_frame]:
+                    continue
+            elif segment["type"] != "photo":
+                continue
+            for f in range(segment["start"], segment["end"] + 1):
+                x, y, z = get_camera_location(f)
+                if changes[f - self.first_frame] != changes[plate["frame"] - self.first_frame] or \
+                        abs(y - plate["yz"][0]) > 1e-3 or \
+                        abs(z - plate["yz"][1]) > 1e-3:
+                    continue
+                self.plate_frames[f] = x
+                for p in required:
+                    p["used"] = True
+
+        self.plates = []
+        for plate in slide_plates.values():
+            if plate.pop("used", False):
+                del plate["yz"]
+                self.plates.append(plate)
+        log.info("- {} frames are composited from {} plates".format(len(self.plate_frames), len(self.plates)))
+
+    def create_title_slide(self, canvas_rect, text):
+        slide = Slide(canvas_rect, json={"type": "text_slide"}, duration=self.default_slide_duration)
+
+        # Create text
+        text_data = bpy.data.curves.new("title_text", type='FONT')
+        text_data.body = text
+        text_data.align_x = 'RIGHT' #'CENTER'
+        text_data.size = 200
+        text_data.extrude = 10
+        text_object = bpy.data.objects.new("title", text_data)
+        bpy.context.view_layer.active_layer_collection.collection.objects.link(text_object)
+
+        # Get / Create material
+        material = bpy.data.materials.get("title_material")
+        if material is None:
+            material = bpy.data.materials.new(name="title_material")
+            material.diffuse_color = (0, 0.8, 0.095)
+
+        text_object.data.materials.append(material)
+        text_object.parent = slide.root
+        text_object.location = Vector((canvas_rect.width / 2, canvas_rect.height / 2, 0))
+        slide.texts.append(text_object)
+
+        return slide
+
+    def create_photo_slide(self, canvas_rect, slide_desc):
+        slide = Slide(canvas_rect, json=slide_desc, duration=self.default_slide_duration)
+
+        # Add photos to slide
+        for p in slide_desc["foreground_paths"]:
+            path = os.path.abspath(p)
+            if path in self.image_sizes:
+                slide.photos.append(Photo(path, self.image_sizes[path]))
+        for p in slide_desc["background_paths"]:
+            path = os.path.abspath(p)
+            if path in self.image_sizes:
+                slide.photos_background.append(Photo(path, self.image_sizes[path]))
+
+        # Create layout, or reuse a previously computed one
+        key = get_layout_key(slide, self.layout_strategy)
+        cached = self.layout_cache.get(key)
+        if cached is not None and len(cached) == len(slide.photos) + len(slide.photos_background):
+            for p, rect in zip(chain(slide.photos, slide.photos_background), cached):
+                p.x, p.y, p.width, p.height = rect
+            profiling.count("layouts_cached")
+        else:
+            with profiling.span("layout"):
+                slide.generate_layout(self.canvas, self.layout_search)
+            if self.layout_search is None or self.layout_search.last_search_complete:
+                self.layout_cache.set(key, [[p.x, p.y, p.width, p.height]
+                                            for p in chain(slide.photos, slide.photos_background)])
+            else:
+                log.warning("Layout search exceeded its time budget, the layout of {} photos is not cached.".format(
+                    len(slide.photos)))
+            profiling.count("layouts_computed")
+
+        return slide
+
+    def build_photo_slide(self, slide, rotation_sigma, max_edge_transition):
+        # Randomize geometry first, such that each mesh is written only once
+        with profiling.span("geometry"):
+            rng = slide.get_random("deformation")
+            for p in slide.photos:
+                p.add_deformation(max_edge_transition, rng=rng)
+            slide.add_randomization(rotation_sigma, slide.get_random("rotation"))
+
+        # Create photo objects
+        with profiling.span("objects"):
+            for p in chain(slide.photos, slide.photos_background):
+                self.create_photo_object(p, slide.root)
+
+                # Check for videos
+                if p.type == "MOVIE":
+                    slide.longest_video_frames = max(slide.longest_video_frames, self.get_video_frames(p))
+        slide.root["photostory_video_frames"] = slide.longest_video_frames
+
+        # Edit foreground photos
+        for p in slide.photos:
+            p.object.location.z = 1
+
+        # Edit background photos
+        for i, p in enumerate(slide.photos_background):
+            p.object.location.z = i / len(slide.photos_background)
+
+        return slide
+
+    def create_photo_object(self, photo, parent=None):
+        # image = obj_image_load(context_imagepath_map, line, DIR, use_image_search, relpath)
+
+        # Create mesh and object
+        mesh_data = create_grid_meshdata(photo.width, photo.height, photo.cuts, photo.uv_border, photo.get_coordinates())
+        photo.object = bpy.data.objects.new("photo", mesh_data)
+
+        # Load texture
+        with profiling.span("image"):
+            photo.image = self.get_image(photo.path, self.proxies.get(photo.path))
+        is_movie = photo.image.source == "MOVIE"
+
+        # Get material, shared by all photos showing the same image (videos start at individual frames)
+        with profiling.span("material"):
+            material, photo.texture_node = self.materials.get_material(photo.path, photo.image, shared=not is_movie)
+        photo.object.data.materials.append(material)
+
+        if is_movie:
+            photo.type = "MOVIE"
+            self.setup_video_image_user(photo.image, photo.texture_node.image_user, self.get_video_frames(photo))
+        else:
+            photo.type = "PICTURE"
+
+        # Location
+        photo.object.location = Vector((photo.x, photo.y, 0))
+
+        if parent is not None:
+            photo.object.parent = parent
+
+        bpy.context.view_layer.active_layer_collection.collection.objects.link(photo.object)
+
+    def get_image(self, path, proxy_path=None):
+        """
+        Load an image / video only once, even if it is used by multiple photos. Images are identified by the loaded
+        file, such that a proxy replaces an original, which was loaded before.
+        :param path: Absolute path of file
+        :param proxy_path: Optional path of a downscaled version of the file, which is loaded instead
+        :return: bpy.types.Image or None, if loading failed
+        """
+        load_path = path if proxy_path is None else proxy_path
+        img = self.images.get(load_path)
+        if img is None:
+            img = load_image(load_path, None, recursive=False, check_existing=True)
+            if img is not None:
+                if proxy_path is not None:
+                    img.name = os.path.basename(path)
+                    # The original might have been loaded to read its size (see probe_sizes), drop it if unused
+                    original = self.images.pop(path, None)
+                    if original is not None and original.users == 0:
+                        bpy.data.images.remove(original)
+                self.images[load_path] = img
+                log.debug("-- Loaded: {}".format(load_path))
+                profiling.count("images_loaded")
+                profiling.count("image_bytes", os.path.getsize(load_path))
+        return img
+
+    def create_proxies(self, slides):
+        """
+        Create downscaled copies of all photos (if 'use_proxies') and videos (if 'use_video_proxies') of 'slides',
+        matching the largest size each photo is displayed at. Videos are converted to the frame rate of the scene.
+        """
+        # Account for the render resolution and some margin for deformations / perspective
+        scale = 1.2 * self.scene.render.resolution_percentage / 100
+        requests = {}
+        video_requests = {}
+        for slide in slides:
+            for p in chain(slide.photos, slide.photos_background):
+                is_video = p.path.lower().endswith(media_probe.VIDEO_EXTENSIONS)
+                if (is_video and not self.use_video_proxies) or (not is_video and not self.use_proxies):
+                    continue
+                display_size = (scale * p.width, scale * p.height)
+                r = video_requests if is_video else requests
+                if p.path in r:
+                    previous = r[p.path][1]
+                    display_size = (max(previous[0], display_size[0]), max(previous[1], display_size[1]))
+                r[p.path] = (self.image_sizes[p.path], display_size)
+
+        if len(requests) > 0:
+            if proxies.is_available():
+                log.info("- Creating proxies for {} images ...".format(len(requests)))
+                executable = getattr(bpy.app, "binary_path_python", None)  # Blender < 2.91 embeds python
+                created = proxies.create_proxies(requests, self.get_proxy_dir(), executable=executable)
+                self.proxies.update(created)
+                log.info("- Using {} proxies".format(len(created)))
+                profiling.count("proxies", len(created))
+            else:
+                log.info("- Skipping proxies, as Pillow is not installed.")
+
+        if len(video_requests) > 0:
+            log.info("- Creating proxies for {} videos ...".format(len(video_requests)))
+            fps = self.scene.render.fps / self.scene.render.fps_base
+            created = proxies.create_video_proxies(video_requests, self.get_proxy_dir(), fps)
+            for path, proxy_path in created.items():
+                info = self.probe.get_video_info(proxy_path)
+                if info is None:
+                    log.warning("Unable to read video proxy {}, using original.".format(proxy_path))
+                    continue
+                self.proxies[path] = proxy_path
+                self.video_frames[path] = media_probe.get_scene_frames(info)
+            self.probe.save()
+            log.info("- Using {} video proxies".format(len(created)))
+            profiling.count("video_proxies", len(created))
+
+    def get_proxy_dir(self):
+        """
+        Proxies are referenced by the saved .blend file, so they are stored next to it (next to the story, if the
+        .blend file is not saved yet), unless 'proxy_dir' is given. Other users and render nodes need access to them.
+        """
+        if self.proxy_dir is not None:
+            return os.path.abspath(bpy.path.abspath(self.proxy_dir))
+        base_dir = os.path.dirname(bpy.data.filepath) if bpy.data.filepath else self.story_dir
+        return os.path.join(base_dir, proxies.PROXY_DIRECTORY)
+
+    def get_video_frames(self, photo):
+        """
+        :return: Number of frames the video of 'photo' is played, as probed from its header (of the proxy, if there is
+                 one). Blender opens the video to count its frames, if the header is not supported.
+        """
+        frames = self.video_frames.get(photo.path)
+        if frames is None:
+            frames = photo.image.frame_duration
+            self.video_frames[photo.path] = frames
+        return frames
+
+    def setup_video_image_user(self, image, image_user, frames=None):
+        """
+        :param frames: Number of frames of the video, which is loaded by 'image' (original or proxy)
+        """
+        if frames is None:
+            frames = image.frame_duration
+        image_user.frame_duration = frames - 1  # -1 to avoid white texture at the end of video
+        image_user.use_auto_refresh = True
+
+    def create_background(self, num_slides, first_slide=0, bg_type="White"):
+
+        # Create mesh and object
+        border_x = 2 * self.canvas.width
+        border_y = 2 * self.canvas.height
+        bg_width = (self.canvas.width+self.offset_slides) * num_slides + 2 * border_x
+        bg_height = self.canvas.height + 2 * border_y
+        mesh_data = create_plane_meshdata(bg_width, bg_height, -1)
+        background = bpy.data.objects.new("background", mesh_data)
+
+        # Load texture
+        texture = bpy.data.textures.new(name="bg_texture", type='IMAGE')
+        u = 1
+        if bg_type == "Wood":
+            texture.image = load_image(os.path.join(self.assets_dir, "floor.png"), None, recursive=False)
+            u = bg_width / texture.image.size[0]
+
+        # Add uv map
+        mesh_data.uv_layers.new()
+        mesh_data.uv_layers.active.data[0].uv = (0, 0)
+        mesh_data.uv_layers.active.data[1].uv = (u, 0)
+        mesh_data.uv_layers.active.data[2].uv = (u, 1)
+        mesh_data.uv_layers.active.data[3].uv = (0, 1)
+
+        # Create material
+        material = bpy.data.materials.new(name="bg_material")
+        material.specular_intensity = 0
+        background.data.materials.append(material)
+
+        # Location
+        background["photostory_role"] = "background"
+        background.location = Vector((first_slide * (self.canvas.width+self.offset_slides) - border_x, -border_y, -5))
+        bpy.context.view_layer.active_layer_collection.collection.objects.link(background)
+        return background
+
+    def create_map(self, slides_desc):
+        map_rect = self.canvas.best_fit(layout.Rectangle(0, 0, 21600, 10800))
+
+        # Region covered by all routes, shown in high resolution
+        locations = [world_map.get_latlong(l) for slide_desc in slides_desc if slide_desc["type"] == "gps_slide"
+                     for l in slide_desc["gps_coordinates"]]
+        region = world_map.get_route_region(locations)
+
+        # The camera shows about twice the route extent (90 degree field of view, height ~ route length)
+        lats = [l[0] for l in locations]
+        longs = [l[1] for l in locations]
+        route_extent = max(map_rect.width * (max(longs) - min(longs)) / 360,
+                           map_rect.height * (max(lats) - min(lats)) / 180,
+                           0.001 * map_rect.width)
+        required_texture_width = map_rect.width * self.canvas.width / (2 * route_extent)
+
+        self.world_map = world_map.WorldMap(map_rect.width,
+                                            map_rect.height,
+                                            os.path.join(self.assets_dir, "world.topo.bathy.200409.3x21600x10800.jpg"),
+                                            os.path.join(self.assets_dir, "gebco_08_rev_elev_21600x10800.png"),
+                                            region=region,
+                                            required_texture_width=required_texture_width,
+                                            keyframes=self.keyframes)
+        self.world_map.object.location = Vector((map_rect.x, 1.5 * self.canvas.height, 1))
+
+    def collect_existing_objects(self):
+        """
+        Find objects, which were created by a previous import (used by incremental imports)
+        :return: Dict role -> list of objects, with roles 'camera', 'light', 'background', 'slide' and 'map'
+        """
+        result = {}
+        for obj in self.scene.objects:
+            role = obj.get("photostory_role")
+            if role is not None:
+                result.setdefault(role, []).append(obj)
+        return result
+
+
+class PhotostoryImporter(bpy.types.Operator, ImportHelper):
+    bl_idname = "import_scene.photostory"
+    bl_label = "Import Photostory"
+    filter_glob = StringProperty(default="*.json", options={'HIDDEN'})
+    setup_scene = BoolProperty(name="Setup scene",
+                               description="Setup scenes properties (start/end frame, clipping)",
+                               default=True)
+    unroll_map = BoolProperty(name="Unroll map",
+                                   description="Add an unroll animation when the map is shown for the first GPS slide",
+                                   default=True)
+    skip_duplicates = BoolProperty(name="Skip duplicates",
+                               description="Skip frames that are identical to previous (creating placeholders)",
+                               default=True)
+    default_slide_duration = FloatProperty(name="Default slide duration",
+                                           description="Default slide duration (might be overwritten by json)",
+                                           default=4.5)
+    use_proxies = BoolProperty(name="Use proxies",
+                               description="Downscale photos to the size they are displayed at, in parallel "
+                                           "(requires Pillow, proxies are cached)",
+                               default=True)
+    use_video_proxies = BoolProperty(name="Video proxies",
+                                     description="Transcode videos to key frames only, at the size they are displayed "
+                                                 "at and the frame rate of the scene, in parallel (requires ffmpeg, "
+                                                 "proxies are cached)",
+                                     default=False)
+    proxy_dir = StringProperty(name="Proxy directory",
+                               description="Directory of proxies, which has to be accessible by render nodes "
+                                           "(default: photostory_proxies next to the .blend file or the story)",
+                               subtype='DIR_PATH',
+                               default="")
+    incremental = BoolProperty(name="Incremental",
+                               description="Update a previously imported photostory, only slides that changed "
+                                           "are rebuilt",
+                               default=False)
+    layout_strategy = EnumProperty(name="Layout",
+                                   description="Arrangement of the foreground photos of a slide",
+                                   items=(('greedy', "Greedy", "Place photos one by one, in the order of the story"),
+                                          ('rows', "Rows", "Justified rows, best order of photos"),
+                                          ('skyline', "Skyline", "Skyline packing, best order of photos"),
+                                          ('best', "Best", "Best layout of all strategies (slower)")),
+                                   default='greedy')
+    use_plates = BoolProperty(name="Plate render",
+                              description="Render each photo slide once and pan over it in 2D (transitions between "
+                                          "photo slides are composited, requires Pillow)",
+                              default=False)
+    chunked = BoolProperty(name="Chunked build",
+                           description="Read and build the story in chunks of slides, which keeps memory usage low "
+                                       "for very large stories",
+                           default=False)
+    write_profile = BoolProperty(name="Write profile",
+                                 description="Time the phases of the import and write a report "
+                                             "(<file>.profile.json, next to the .blend file or the story)",
+                                 default=False)
+
+    def execute(self, context):
+        profiling.setup_logging()
+        builder = PhotostoryBuilder(setup_scene=self.setup_scene,
+                                    unroll_map=self.unroll_map,
+                                    skip_duplicates=self.skip_duplicates,
+                                    default_slide_duration=self.default_slide_duration,
+                                    use_proxies=self.use_proxies,
+                                    use_video_proxies=self.use_video_proxies,
+                                    proxy_dir=self.proxy_dir or None,
+                                    incremental=self.incremental,
+                                    layout_strategy=self.layout_strategy,
+                                    use_plates=self.use_plates,
+                                    chunked=self.chunked)
+        if self.write_profile:
+            profiler = profiling.Profiler()
+            with profiler:
+                builder.build(self.filepath)
+            base = bpy.data.filepath if bpy.data.filepath else self.filepath
+            path = os.path.splitext(base)[0] + ".profile.json"
+            profiler.save(path)
+            profiler.log_summary(log)
+            self.report({'INFO'}, "Saved profile: {}".format(path))
+        else:
+            builder.build(self.filepath)
+        for warning in builder.warnings:
+            self.report({'WARNING'}, warning)
+        return {'FINISHED'}
+
+
+class PhotostoryImporterTestPanel(bpy.types.Panel):
+    bl_label = "Photostory Importer TestPanel"
+    bl_idname = "OBJECT_PT_photostory"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = "scene"
+
+    def draw(self, context):
+        self.layout.operator("import_scene.photostory")
+
+
+def menu_func_import(self, context):
+    self.layout.operator(PhotostoryImporter.bl_idname, text="Photostroy (.json)")
@@ -21,6 +21,8 @@ import random
 import numpy as np
 from mathutils import Vector
 
+from .rect_set import RectSet, arrange_greedy
+
 
 class Size:
     def __init__(self, w=0, h=0):
@@ -205,12 +207,16 @@ class Rectangle(Size, Position):
 
 
 def is_valid_configuration(existing_rectangles, rectangle):
+    """
+    :param existing_rectangles: List of rectangles or RectSet
+    :param rectangle: Tested rectangle
+    """
     if rectangle.x < 0 or rectangle.y < 0:
         return False
-    for r in existing_rectangles:
-        if r.intersects(rectangle, margin=0.5):
-            return False
-    return True
+    if not isinstance(existing_rectangles, RectSet):
+        existing_rectangles = RectSet.from_rectangles(existing_rectangles)
+    return not existing_rectangles.intersects_any(rectangle.x, rectangle.y, rectangle.width, rectangle.height,
+                                                  margin=0.5)
 
 
 # def generate_layout(rectangles, canvas):
@@ -228,83 +234,62 @@ def arrange_rects_in_canvas_1(rectangles, canvas):
     if canvas.width <= 0 or canvas.height <= 0:
         raise RuntimeError("Invalid canvas size.")
 
-    rectangles[0].x = 0
-    rectangles[0].y = 0
-    aspect_ratio = canvas.width / canvas.height
-    bounding_box = rectangles[0]
-
-    for i, rect in enumerate(rectangles[1:], 1):
-        best_aspect_diff = 0
-        best_config = None
-
-        for rect_n in rectangles[:i]:
-            # Possible configurations for new rectangle
-            test_configurations = [
-                Rectangle(rect_n.right, rect_n.top, rect.width, rect.height),
-                Rectangle(rect_n.right, rect_n.bottom - rect.height, rect.width, rect.height),
-                Rectangle(rect_n.left, rect_n.bottom, rect.width, rect.height),
-                Rectangle(rect_n.right - rect.width, rect_n.bottom, rect.width, rect.height)
-            ]
-
-            # Find best configuration
-            for ic, c in enumerate(test_configurations):
-                if is_valid_configuration(rectangles[:i], c):
-                    aspect = Rectangle.merge(c,bounding_box).aspect()
-                    aspect_diff = abs(aspect_ratio - aspect)
-                    if best_config is None or aspect_diff < best_aspect_diff:
-                        best_config = c
-                        best_aspect_diff = aspect_diff
-
-        bounding_box = Rectangle.merge(best_config, bounding_box)
-        rect.set_rect(best_config)
+    placed = arrange_greedy([r.width for r in rectangles], [r.height for r in rectangles],
+                            canvas.width / canvas.height)
 
     # Scale created layout to fit canvas
-    factor = min(canvas.width / bounding_box.width, canvas.height / bounding_box.height)
-    for r in rectangles:
-        r.x *= factor
-        r.y *= factor
-        r.width *= factor
-        r.height *= factor
+    _, _, bb_width, bb_height = placed.bounding_box()
+    factor = min(canvas.width / bb_width, canvas.height / bb_height)
+    placed.scale(factor)
+    for i, r in enumerate(rectangles):
+        r.x, r.y, r.width, r.height = placed.get(i)
 
     return factor
 
 
-def arrange_rects_in_background_1(rects, foreground_rects, canvas):
-    # Evenly distribute background pictures
+def arrange_rects_in_background_1(rects, foreground_rects, canvas, rng=random):
+    """
+    Evenly distribute background pictures around the foreground
+    :param rng: Source of randomness (random.Random or the module 'random')
+    """
     if len(rects) <= 0:
         return
 
-    angle_offset = 2 * np.pi / len(rects)
-    center = Vector((0.5 * canvas.width, 0.5 * canvas.height))
-    angle = 0
     largest_fg_area = Rectangle.get_largest(foreground_rects).area
-    for r in rects:
-        a = angle + random.normalvariate(0, np.pi * 0.07)
-        ray = Ray(center, Vector((np.sin(a), np.cos(a))))
-        t = intersect_ray_rectangle(ray, canvas)
-        border_point = ray.get_point(t)
-        ray = Ray(border_point, -ray.direction)
-        t = intersect_ray_rectangles(ray, foreground_rects)
-        if t is None:
-            fg_point = center
-        else:
-            fg_point = ray.get_point(t)
-
-        pos = 0.5 * fg_point + 0.5 * border_point
+    angle_offset = 2 * np.pi / len(rects)
+    center = np.array([0.5 * canvas.width, 0.5 * canvas.height])
+    angles = np.array([i * angle_offset + rng.normalvariate(0, np.pi * 0.07) for i in range(len(rects))])
+    directions = np.stack((np.sin(angles), np.cos(angles)), axis=1)
+    origins = np.tile(center, (len(rects), 1))
+
+    # Cast rays from the center to the border of the canvas and back onto the foreground
+    t = intersect_rays_rectangles(origins, directions, rectangles_to_array([canvas]))[:, 0]
+    border_points = origins + t[:, np.newaxis] * directions
+    t = intersect_rays_rectangles(border_points, -directions, rectangles_to_array(foreground_rects)).min(axis=1)
+    fg_points = np.where(np.isfinite(t)[:, np.newaxis], border_points - t[:, np.newaxis] * directions, center)
+
+    positions = 0.5 * fg_points + 0.5 * border_points
+    for r, pos in zip(rects, positions):
         r.scale(1.2 * np.sqrt(largest_fg_area / r.area))
-        r.center = pos
-        angle += angle_offset
-
+        r.center = Vector(pos)
 
 
-def generate_layout_1(foreground_rects, background_rects, canvas):
-    bg_scale = 0.85 * arrange_rects_in_canvas_1(foreground_rects, canvas)
+def generate_layout_1(foreground_rects, background_rects, canvas, layout_search=None, rng=random):
+    """
+    :param layout_search: Optional layout_engine.LayoutSearch, which arranges the foreground instead of
+                          'arrange_rects_in_canvas_1'
+    :param rng: Source of randomness (random.Random or the module 'random'), also seeds 'layout_search'
+    """
+    if layout_search is None:
+        arrange_rects_in_canvas_1(foreground_rects, canvas)
+    else:
+        layout_search.arrange(foreground_rects, canvas, seed=rng.getrandbits(32))
 
     if len(background_rects) > 0:
         scale_layout(foreground_rects, 0.85)
     center_layout(foreground_rects, canvas)
 
-    arrange_rects_in_background_1(background_rects, foreground_rects, canvas)
+    arrange_rects_in_background_1(background_rects, foreground_rects, canvas, rng)
 
 
 def center_layout(rectangles, canvas):
@@ -358,10 +343,11 @@ def get_background_rectangles(rectangles, canvas):
     return background_rectangles
 
 
-def sample_in_rectangles(rectangles):
+def sample_in_rectangles(rectangles, rng=random):
     """
     Sample a random point from a list of rectangles
     :param rectangles: Input rectangles
+    :param rng: Source of randomness (random.Random or the module 'random')
     :return: Random 2D point (x,y)
     """
     if len(rectangles) == 0:
@@ -370,7 +356,7 @@ def sample_in_rectangles(rectangles):
     areas = [r.area for r in rectangles]
     total_area = sum(areas)
 
-    x = random.random() * total_area
+    x = rng.random() * total_area
     a = 0
     for i, ai in enumerate(areas):
         a += ai
@@ -378,8 +364,8 @@ def sample_in_rectangles(rectangles):
             break
 
     rect = rectangles[i]
-    return (rect.x + random.random() * rect.width,
-            rect.y + random.random() * rect.height)
+    return (rect.x + rng.random() * rect.width,
+            rect.y + rng.random() * rect.height)
 
 
 def intersect_ray_segment(ray, seg_p0, seg_p1):
@@ -399,30 +385,57 @@ def intersect_ray_segment(ray, seg_p0, seg_p1):
         x = np.linalg.solve(a, b)
         if x[0] >= 0 and 1 >= x[1] >= 0:
             return x[0]
-    except np.linalg.linalg.LinAlgError:
+    except np.linalg.LinAlgError:
         pass
     return None
 
 
+def rectangles_to_array(rects):
+    """
+    :param rects: List of rectangles
+    :return: (N,4) array with columns x, y, width, height
+    """
+    return np.array([(r.x, r.y, r.width, r.height) for r in rects], dtype=float).reshape(-1, 4)
+
+
+def intersect_rays_rectangles(origins, directions, rects):
+    """
+    Intersect many rays with the borders of many axis-aligned rectangles at once (slab method)
+    :param origins: (M,2) array of starting points of rays
+    :param directions: (M,2) array of directions of rays
+    :param rects: (N,4) array of rectangles, see 'rectangles_to_array'
+    :return: (M,N) array of the distance (in multiples of the direction) to the first intersection of each ray with
+             the border of each rectangle, np.inf if there is none
+    """
+    origins = np.asarray(origins, dtype=float)[:, np.newaxis, :]
+    directions = np.asarray(directions, dtype=float)[:, np.newaxis, :]
+    rects = np.asarray(rects, dtype=float)
+    low = rects[np.newaxis, :, :2]
+    high = low + rects[np.newaxis, :, 2:]
+
+    parallel = directions == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t0 = (low - origins) / directions
+        t1 = (high - origins) / directions
+    t_near = np.minimum(t0, t1)
+    t_far = np.maximum(t0, t1)
+    # Rays parallel to an axis hit either everywhere or nowhere along this axis
+    inside = (origins >= low) & (origins <= high)
+    t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), t_near)
+    t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), t_far)
+
+    t_enter = t_near.max(axis=2)
+    t_exit = t_far.min(axis=2)
+    t = np.where(t_enter >= 0, t_enter, t_exit)  # Rays starting inside a rectangle hit its border when leaving
+    return np.where((t_exit >= t_enter) & (t >= 0), t, np.inf)
+
+
 def intersect_ray_rectangle(ray, rect):
-    segments = [((rect.left, rect.top), (rect.right, rect.top)),
-                ((rect.right, rect.top), (rect.right, rect.bottom)),
-                ((rect.left, rect.bottom), (rect.right, rect.bottom)),
-                ((rect.left, rect.top), (rect.left, rect.bottom))]
-    d = None
-    for s in segments:
-        sd = intersect_ray_segment(ray, s[0], s[1])
-        if sd is not None:
-            if d is None or sd < d:
-                d = sd
-    return d
+    return intersect_ray_rectangles(ray, [rect])
 
 
 def intersect_ray_rectangles(ray, rects):
-    d = None
-    for r in rects:
-        rd = intersect_ray_rectangle(ray, r)
-        if rd is not None:
-            if d is None or rd < d:
-                d = rd
-    return d
\ No newline at end of file
+    if len(rects) == 0:
+        return None
+    t = intersect_rays_rectangles([ray.position], [ray.direction], rectangles_to_array(rects)).min()
+    return t if np.isfinite(t) else None
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Layout strategies for the foreground photos of a slide, and a best-of-N search over strategies and orders of photos.
+"""
+
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .rect_set import RectSet, arrange_greedy
+
+
+def arrange_rows(widths, heights, aspect_ratio):
+    """
+    Justified rows: photos keep their order and aspect ratio, all photos of a row have the same height and all rows
+    have the same width. The number of rows is chosen to match 'aspect_ratio'.
+    :return: RectSet
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    aspects = widths / heights
+    n = len(aspects)
+    best = None
+    for num_rows in range(1, n + 1):
+        # Break rows, such that each row is about as wide as the average row (at unit height)
+        target = aspects.sum() / num_rows
+        row_ids = np.zeros(n, dtype=int)
+        row, row_width = 0, 0
+        for i, a in enumerate(aspects):
+            if row_width > 0 and row_width + 0.5 * a > target and row < num_rows - 1:
+                row += 1
+                row_width = 0
+            row_ids[i] = row
+            row_width += a
+        # Scale rows to unit width
+        row_heights = 1 / np.bincount(row_ids, weights=aspects)
+        error = abs(math.log(1 / row_heights.sum() / aspect_ratio))
+        if best is None or error < best[0]:
+            best = (error, row_ids, row_heights)
+
+    _, row_ids, row_heights = best
+    h = row_heights[row_ids]
+    w = aspects * h
+    y = np.concatenate(([0], np.cumsum(row_heights)[:-1]))[row_ids]
+    x = np.zeros(n)
+    for row in range(len(row_heights)):
+        in_row = row_ids == row
+        x[in_row] = np.concatenate(([0], np.cumsum(w[in_row])[:-1]))
+
+    # Keep the pixel scale of the input
+    scale = math.sqrt((widths * heights).sum() / (w * h).sum())
+    return RectSet.from_arrays(scale * x, scale * y, scale * w, scale * h)
+
+
+def pack_skyline(widths, heights, strip_width):
+    """
+    Bottom-left packing into a strip of fixed width. The skyline is a list of segments [x, y, width], which stores
+    the lowest free y for each part of the strip.
+    :return: RectSet
+    """
+    skyline = [[0.0, 0.0, strip_width]]
+    result = RectSet(len(widths))
+    for w, h in zip(widths, heights):
+        best = None
+        for i, (x, _, _) in enumerate(skyline):
+            if x + w > strip_width + 1e-9:
+                break
+            y, j, covered = 0, i, 0
+            while covered < w - 1e-9:
+                y = max(y, skyline[j][1])
+                covered = skyline[j][0] + skyline[j][2] - x
+                j += 1
+            if best is None or (y, x) < best[:2]:
+                best = (y, x)
+        y, x = best
+        result.append(x, y, w, h)
+
+        # Update skyline
+        new_skyline = []
+        for sx, sy, sw in skyline:
+            if sx + sw <= x or sx >= x + w:
+                new_skyline.append([sx, sy, sw])
+                continue
+            if sx < x:
+                new_skyline.append([sx, sy, x - sx])
+            if sx + sw > x + w:
+                new_skyline.append([x + w, sy, sx + sw - x - w])
+        new_skyline.append([x, y + h, w])
+        new_skyline.sort()
+        skyline = []
+        for segment in new_skyline:
+            if len(skyline) > 0 and skyline[-1][1] == segment[1]:
+                skyline[-1][2] += segment[2]
+            else:
+                skyline.append(segment)
+    return result
+
+
+def arrange_skyline(widths, heights, aspect_ratio, strip_factors=(0.8, 0.9, 1.0, 1.12, 1.25)):
+    """
+    Skyline packing, the width of the strip is chosen to match 'aspect_ratio'
+    :return: RectSet
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    ideal_width = math.sqrt((widths * heights).sum() * aspect_ratio)
+    best = None
+    for f in strip_factors:
+        rects = pack_skyline(widths, heights, max(widths.max(), f * ideal_width))
+        _, _, w, h = rects.bounding_box()
+        error = abs(math.log(w / h / aspect_ratio))
+        if best is None or error < best[0]:
+            best = (error, rects)
+    return best[1]
+
+
+STRATEGIES = {
+    "greedy": arrange_greedy,
+    "rows": arrange_rows,
+    "skyline": arrange_skyline,
+}
+
+
+def arrange(strategy, widths, heights, aspect_ratio, order=None):
+    """
+    :param strategy: Name of strategy, see STRATEGIES
+    :param order: Optional permutation, in which photos are passed to the strategy
+    :return: RectSet, in the order of the input
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    if order is None:
+        return STRATEGIES[strategy](widths, heights, aspect_ratio)
+    order = np.asarray(order)
+    rects = STRATEGIES[strategy](widths[order], heights[order], aspect_ratio).to_array()
+    result = np.empty_like(rects)
+    result[order] = rects
+    return RectSet.from_arrays(*result.T)
+
+
+def score_layout(rects, canvas_width, canvas_height, aspect_weight=0.25, uniformity_weight=0.5):
+    """
+    Quality of a layout, once it is scaled to fit the canvas. Higher is better.
+    - coverage: Fraction of the canvas covered by photos
+    - aspect error: Deviation of the aspect ratio of the layout from the canvas (log-scale)
+    - non-uniformity: Coefficient of variation of the (square root of) areas of photos
+    """
+    _, _, w, h = rects.bounding_box()
+    scale = min(canvas_width / w, canvas_height / h)
+    coverage = rects.areas.sum() * scale * scale / (canvas_width * canvas_height)
+    aspect_error = abs(math.log(w / h * canvas_height / canvas_width))
+    sides = np.sqrt(rects.areas)
+    non_uniformity = sides.std() / sides.mean() if len(sides) > 1 else 0
+    return coverage - aspect_weight * aspect_error - uniformity_weight * non_uniformity
+
+
+def evaluate_candidates(widths, heights, canvas_width, canvas_height, candidates, deadline=None):
+    """
+    Arrange and score candidates. Runs in worker processes.
+    :param candidates: List of tuples (strategy, order)
+    :param deadline: Optional time (time.time()), after which the remaining candidates are skipped
+    :return: Tuple (best, number of evaluated candidates), best is a tuple (score, strategy, (N,4) array of rectangles
+             in input order) of the first of the best candidates or None
+    """
+    best = None
+    num_evaluated = 0
+    for strategy, order in candidates:
+        if deadline is not None and time.time() > deadline:
+            break
+        rects = arrange(strategy, widths, heights, canvas_width / canvas_height, order)
+        score = score_layout(rects, canvas_width, canvas_height)
+        if best is None or score > best[0]:
+            best = (score, strategy, rects.to_array())
+        num_evaluated += 1
+    return best, num_evaluated
+
+
+class LayoutSearch:
+    """
+    Best-of-N layouts: each strategy is tried with the given order of photos, with photos sorted by size and aspect
+    ratio, and with random orders, 'num_candidates' layouts in total. The result only depends on the photos and the
+    seed, the time budget is a safety cap, which marks a search as incomplete (see 'last_search_complete').
+    Large slides are evaluated in parallel worker processes, which are kept alive for all slides.
+    """
+    def __init__(self, strategies=("greedy", "rows", "skyline"), num_candidates=64, time_budget=30.0,
+                 parallel_threshold=12, max_workers=None, executable=None):
+        """
+        :param strategies: Names of strategies, see STRATEGIES
+        :param num_candidates: Number of scored layouts per slide
+        :param time_budget: Maximal time per slide in seconds (at least one layout per strategy is scored)
+        :param parallel_threshold: Minimal number of photos, which is arranged in parallel
+        :param max_workers: Number of worker processes (default: number of cores)
+        :param executable: Python interpreter used for worker processes (required within blender < 2.91)
+        """
+        for s in strategies:
+            if s not in STRATEGIES:
+                raise RuntimeError("Unknown layout strategy '{}'".format(s))
+        self.strategies = list(strategies)
+        self.num_candidates = num_candidates
+        self.time_budget = time_budget
+        self.parallel_threshold = parallel_threshold
+        self.max_workers = max_workers
+        self.executable = executable
+        self.executor = None
+        self.last_search_complete = True  # False, if the last search was stopped by the time budget
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def get_candidates(self, widths, heights, seed=0):
+        """
+        :return: List of (strategy, order), the most promising first
+        """
+        n = len(widths)
+        orders = [None,
+                  np.argsort(-np.asarray(widths) * np.asarray(heights), kind='stable'),
+                  np.argsort(np.asarray(widths) / np.asarray(heights), kind='stable')]
+        rng = random.Random(seed)
+        while len(orders) * len(self.strategies) < self.num_candidates and n > 1:
+            order = list(range(n))
+            rng.shuffle(order)
+            orders.append(np.array(order))
+        return [(s, o) for o in orders for s in self.strategies][:max(self.num_candidates, len(self.strategies))]
+
+    def get_executor(self):
+        if self.executor is None:
+            context = multiprocessing.get_context('spawn')
+            if self.executable is not None:
+                context.set_executable(self.executable)
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self.executor
+
+    def search(self, widths, heights, canvas_width, canvas_height, seed=0):
+        """
+        :param seed: Seed of random orders
+        :return: Tuple (score, strategy, (N,4) array of rectangles in input order, not scaled to the canvas)
+        """
+        candidates = self.get_candidates(widths, heights, seed)
+        args = (np.asarray(widths, dtype=float), np.asarray(heights, dtype=float), canvas_width, canvas_height)
+        deadline = time.time() + self.time_budget
+        num_required = len(self.strategies)  # Candidates, which are evaluated regardless of the time budget
+        best, num_evaluated = evaluate_candidates(*args, candidates[:num_required])
+        remaining = candidates[num_required:]
+
+        if len(widths) < self.parallel_threshold or self.max_workers == 1:
+            results = [evaluate_candidates(*args, remaining, deadline)]
+        else:
+            executor = self.get_executor()
+            chunk_size = max(1, len(remaining) // (4 * (self.max_workers or multiprocessing.cpu_count())))
+            futures = [executor.submit(evaluate_candidates, *args, remaining[i:i + chunk_size], deadline)
+                       for i in range(0, len(remaining), chunk_size)]
+            # Workers skip their candidates after the deadline, so waiting for them does not delay the next slide
+            wait(futures)
+            results = [future.result() for future in futures]
+
+        # Results in the order of candidates, the first of equally good layouts wins
+        for result, n in results:
+            num_evaluated += n
+            if result is not None and result[0] > best[0]:
+                best = result
+        self.last_search_complete = num_evaluated == len(candidates)
+        return best
+
+    def arrange(self, rectangles, canvas, seed=0):
+        """
+        Replacement of layout.arrange_rects_in_canvas_1
+        :param rectangles: List of rectangles, which need to be arranged. Edited in place.
+        :param canvas: Canvas for arrangement
+        :return Scale factor, applied to rectangles
+        """
+        if len(rectangles) == 0:
+            return 1
+        if canvas.width <= 0 or canvas.height <= 0:
+            raise RuntimeError("Invalid canvas size.")
+        score, strategy, rects = self.search([r.width for r in rectangles], [r.height for r in rectangles],
+                                             canvas.width, canvas.height, seed)
+        rects = RectSet.from_arrays(*rects.T)
+        x, y, w, h = rects.bounding_box()
+        rects.translate(-x, -y)
+        factor = min(canvas.width / w, canvas.height / h)
+        rects.scale(factor)
+        for i, r in enumerate(rectangles):
+            r.x, r.y, r.width, r.height = rects.get(i)
+        return factor
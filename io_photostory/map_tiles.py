@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Tile pyramids of the world map assets, such that only the region around routes is loaded in detail.
+
+Usage:
+    python3 -m io_photostory.map_tiles io_photostory/assets/world.topo.bathy.200409.3x21600x10800.jpg \
+                                       io_photostory/assets/gebco_08_rev_elev_21600x10800.png
+"""
+
+import argparse
+import json
+import math
+import os
+
+PYRAMID_INDEX = "index.json"
+
+
+def get_pyramid_dir(source):
+    """
+    Directory of the tile pyramid of an asset, e.g. assets/tiles/<name>/
+    """
+    return os.path.join(os.path.dirname(source), "tiles", os.path.splitext(os.path.basename(source))[0])
+
+
+def build_pyramid(source, destination=None, tile_size=1024, overview_width=4096, quality=92):
+    """
+    Cut an image into tiles at multiple resolutions. Level 0 has the full resolution, the resolution halves with each
+    level, until the width drops below 'overview_width'. Additionally, a single overview image is stored.
+    :param source: Path of image
+    :param destination: Output directory (default: get_pyramid_dir(source))
+    :param tile_size: Width and height of tiles
+    :param overview_width: Width of overview image
+    :param quality: JPEG quality
+    :return: Path of pyramid index
+    """
+    from PIL import Image
+    Image.MAX_IMAGE_PIXELS = None
+
+    if destination is None:
+        destination = get_pyramid_dir(source)
+    extension = ".png" if source.lower().endswith(".png") else ".jpg"
+    save_args = {"optimize": True} if extension == ".png" else {"quality": quality}
+
+    with Image.open(source) as img:
+        img.load()
+        index = {"source": os.path.basename(source),
+                 "width": img.width,
+                 "height": img.height,
+                 "tile_size": tile_size,
+                 "extension": extension,
+                 "overview": "overview" + extension,
+                 "levels": []}
+
+        level = 0
+        level_img = img
+        while True:
+            cols = math.ceil(level_img.width / tile_size)
+            rows = math.ceil(level_img.height / tile_size)
+            print("Level {}: {}x{} pixels, {}x{} tiles".format(level, level_img.width, level_img.height, cols, rows))
+            os.makedirs(os.path.join(destination, str(level)), exist_ok=True)
+            for row in range(rows):
+                for col in range(cols):
+                    box = (col * tile_size, row * tile_size,
+                           min((col + 1) * tile_size, level_img.width), min((row + 1) * tile_size, level_img.height))
+                    level_img.crop(box).save(os.path.join(destination, str(level), get_tile_name(row, col, extension)),
+                                             **save_args)
+            index["levels"].append({"level": level, "width": level_img.width, "height": level_img.height,
+                                    "rows": rows, "cols": cols})
+            if level_img.width // 2 < overview_width:
+                break
+            level += 1
+            level_img = level_img.resize((level_img.width // 2, level_img.height // 2), Image.LANCZOS)
+
+        overview_height = round(img.height * overview_width / img.width)
+        img.resize((overview_width, overview_height), Image.LANCZOS).save(
+            os.path.join(destination, index["overview"]), **save_args)
+
+    index_path = os.path.join(destination, PYRAMID_INDEX)
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    return index_path
+
+
+def get_tile_name(row, col, extension):
+    return "{}_{}{}".format(row, col, extension)
+
+
+class Tile:
+    """
+    Tile of a pyramid, covering [u0,u1]x[v0,v1] of the map in normalized coordinates (v=0 is the south pole)
+    """
+    def __init__(self, path, row, col, u0, v0, u1, v1):
+        self.path = path
+        self.row = row
+        self.col = col
+        self.u0 = u0
+        self.v0 = v0
+        self.u1 = u1
+        self.v1 = v1
+
+
+class TilePyramid:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, PYRAMID_INDEX)) as f:
+            self.index = json.load(f)
+        self.levels = self.index["levels"]
+
+    @staticmethod
+    def find(source):
+        """
+        :param source: Path of the original asset
+        :return: TilePyramid of asset or None, if it was not built yet
+        """
+        directory = get_pyramid_dir(source)
+        if os.path.isfile(os.path.join(directory, PYRAMID_INDEX)):
+            return TilePyramid(directory)
+        return None
+
+    def get_overview_path(self):
+        return os.path.join(self.directory, self.index["overview"])
+
+    def choose_level(self, required_width):
+        """
+        :param required_width: Required resolution, as width of the whole map in pixels
+        :return: Lowest resolution level, which has at least the required resolution (or the highest available)
+        """
+        for level in reversed(self.levels):
+            if level["width"] >= required_width:
+                return level["level"]
+        return self.levels[0]["level"]
+
+    def get_tiles(self, level, u0, v0, u1, v1):
+        """
+        All tiles of a level, which overlap the region [u0,u1]x[v0,v1] (normalized map coordinates)
+        :return: List of Tile
+        """
+        info = self.levels[level]
+        tile_size = self.index["tile_size"]
+        w, h = info["width"], info["height"]
+        col0 = max(0, int(math.floor(u0 * w / tile_size)))
+        col1 = min(info["cols"] - 1, int(math.floor(u1 * w / tile_size)))
+        # Rows are counted from the top of the image (north)
+        row0 = max(0, int(math.floor((1 - v1) * h / tile_size)))
+        row1 = min(info["rows"] - 1, int(math.floor((1 - v0) * h / tile_size)))
+
+        tiles = []
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                path = os.path.join(self.directory, str(level), get_tile_name(row, col, self.index["extension"]))
+                tiles.append(Tile(path, row, col,
+                                  col * tile_size / w, 1 - min((row + 1) * tile_size, h) / h,
+                                  min((col + 1) * tile_size, w) / w, 1 - row * tile_size / h))
+        return tiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build tile pyramids of world map assets.")
+    parser.add_argument("sources", nargs="+", help="Images to tile")
+    parser.add_argument("--tile-size", type=int, default=1024, help="Width and height of tiles in pixels")
+    parser.add_argument("--overview-width", type=int, default=4096, help="Width of overview image in pixels")
+    args = parser.parse_args()
+    for source in args.sources:
+        print("Tiling", source)
+        print("Written", build_pyramid(source, tile_size=args.tile_size, overview_width=args.overview_width))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import bpy
+
+PHOTO_SHADER_NAME = "photostory_photo_shader"
+
+
+def new_group_socket(group, in_out, socket_type, name):
+    if hasattr(group, "interface"):  # Blender >= 4.0
+        return group.interface.new_socket(name, in_out=in_out, socket_type=socket_type)
+    if in_out == 'INPUT':
+        return group.inputs.new(socket_type, name)
+    return group.outputs.new(socket_type, name)
+
+
+def get_photo_shader():
+    """
+    Node group shared by all photo materials: Diffuse photo, white where the photo is transparent.
+    Inputs: 'Color', 'Alpha', output: 'Shader'
+    """
+    group = bpy.data.node_groups.get(PHOTO_SHADER_NAME)
+    if group is not None:
+        return group
+
+    group = bpy.data.node_groups.new(PHOTO_SHADER_NAME, 'ShaderNodeTree')
+    new_group_socket(group, 'INPUT', 'NodeSocketColor', "Color")
+    new_group_socket(group, 'INPUT', 'NodeSocketFloat', "Alpha")
+    new_group_socket(group, 'OUTPUT', 'NodeSocketShader', "Shader")
+
+    nodes = group.nodes
+    links = group.links
+    node_in = nodes.new('NodeGroupInput')
+    node_in.location = (0, 0)
+    node_bsdf_photo = nodes.new('ShaderNodeBsdfDiffuse')
+    node_bsdf_photo.location = (300, 0)
+    node_bsdf_white = nodes.new('ShaderNodeBsdfDiffuse')
+    node_bsdf_white.location = (300, -300)
+    node_mix = nodes.new('ShaderNodeMixShader')
+    node_mix.location = (600, -150)
+    node_out = nodes.new('NodeGroupOutput')
+    node_out.location = (900, 0)
+    links.new(node_in.outputs['Color'], node_bsdf_photo.inputs['Color'])
+    links.new(node_bsdf_white.outputs['BSDF'], node_mix.inputs[1])
+    links.new(node_bsdf_photo.outputs['BSDF'], node_mix.inputs[2])
+    links.new(node_in.outputs['Alpha'], node_mix.inputs['Fac'])
+    links.new(node_mix.outputs['Shader'], node_out.inputs['Shader'])
+    return group
+
+
+def create_photo_material(image):
+    """
+    Create a lightweight material, which feeds 'image' into the shared photo shader
+    :param image: bpy.types.Image
+    :return: Tuple (bpy.types.Material, image texture node)
+    """
+    material = bpy.data.materials.new(name="photo_material")
+    material.specular_intensity = 0
+    material.use_nodes = True
+    mat_nodes = material.node_tree.nodes
+    mat_links = material.node_tree.links
+    mat_nodes.clear()
+    node_t = mat_nodes.new('ShaderNodeTexImage')
+    node_t.image = image
+    node_t.extension = 'CLIP'
+    node_t.location = (0, 0)
+    node_shader = mat_nodes.new('ShaderNodeGroup')
+    node_shader.node_tree = get_photo_shader()
+    node_shader.location = (300, 0)
+    node_om = mat_nodes.new('ShaderNodeOutputMaterial')
+    node_om.location = (600, 0)
+    mat_links.new(node_t.outputs['Color'], node_shader.inputs['Color'])
+    mat_links.new(node_t.outputs['Alpha'], node_shader.inputs['Alpha'])
+    mat_links.new(node_shader.outputs['Shader'], node_om.inputs['Surface'])
+    return material, node_t
+
+
+class PhotoMaterialPool:
+    """
+    Provides one material per image, which is reused by all photos showing this image. Materials of previous imports
+    are found via the custom property 'photostory_path'.
+    """
+    def __init__(self):
+        self.materials = {}
+        for material in bpy.data.materials:
+            path = material.get("photostory_path")
+            if path is not None and material.node_tree is not None:
+                self.materials[path] = material
+
+    @staticmethod
+    def get_texture_node(material):
+        for node in material.node_tree.nodes:
+            if node.type == 'TEX_IMAGE':
+                return node
+        return None
+
+    def get_material(self, path, image, shared=True):
+        """
+        :param path: Path of the photo, which identifies the material
+        :param image: bpy.types.Image of the photo
+        :param shared: If False, a new material is created, which is not reused (required by videos, which start at
+                       different frames)
+        :return: Tuple (bpy.types.Material, image texture node)
+        """
+        if shared:
+            material = self.materials.get(path)
+            if material is not None:
+                node = PhotoMaterialPool.get_texture_node(material)
+                if node is not None and node.image == image:
+                    return material, node
+
+        material, node = create_photo_material(image)
+        if shared:
+            material["photostory_path"] = path
+            self.materials[path] = material
+        return material, node
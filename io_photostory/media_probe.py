@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Sizes of images and videos, and lengths of videos, read from their file headers.
+"""
+
+import os
+import struct
+
+from .helpers_cache import JsonCache, get_file_signature
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# JPEG start-of-frame markers (all except DHT, JPG and DAC, which share the range)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# File extensions of videos, which are loaded as movies by blender
+VIDEO_EXTENSIONS = ('.avi', '.mp4', '.mov', '.mkv', '.webm', '.mpg', '.mpeg', '.ogv', '.m4v')
+
+# ISO base media (mp4 / mov) atoms, which contain the track header
+MP4_CONTAINER_ATOMS = {b'moov', b'trak'}
+
+# Atoms within a track ('trak'), which contain its media header, handler and sample table
+MP4_TRACK_CONTAINER_ATOMS = {b'mdia', b'minf', b'stbl'}
+
+# Types of the first atom of ISO base media files
+MP4_FIRST_ATOMS = (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip')
+
+
+def probe_png_size(f):
+    header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def probe_jpeg_size(f):
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':  # Fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker == 0xD8 or marker == 0x01 or 0xD0 <= marker <= 0xD7:  # Markers without payload
+            continue
+        if marker == 0xD9:  # End of image
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">xHH", data)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def iterate_mp4_atoms(f, end):
+    """
+    Yields (type, payload_start, payload_end) for each atom between the current position and 'end'
+    """
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, atom_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - start
+        if size < header_size:
+            return
+        yield atom_type, start + header_size, start + size
+        f.seek(start + size)
+
+
+def get_mp4_end(f):
+    """
+    :return: Size of the file, if it is an ISO base media file, None otherwise. The file is rewound.
+    """
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    f.seek(0)
+    if end < 8 or f.read(8)[4:8] not in MP4_FIRST_ATOMS:
+        return None
+    f.seek(0)
+    return end
+
+
+def read_tkhd_size(f):
+    """
+    :return: Tuple (width, height) of a track header, read from the start of its payload
+    """
+    version = f.read(1)[0]
+    # Skip flags, times, track id, reserved and duration, then reserved, layer, group, volume and matrix
+    f.seek(3 + (32 if version == 1 else 20) + 8 + 8 + 36, os.SEEK_CUR)
+    width, height = struct.unpack(">II", f.read(8))
+    return width >> 16, height >> 16  # 16.16 fixed point
+
+
+def read_mdhd_timing(f):
+    """
+    :return: Tuple (timescale, duration) of a media header, read from the start of its payload. The duration is
+             given in units of the timescale (per second).
+    """
+    version = f.read(1)[0]
+    if version == 1:
+        return struct.unpack(">xxx16xIQ", f.read(3 + 16 + 12))
+    return struct.unpack(">xxx8xII", f.read(3 + 8 + 8))
+
+
+def read_stts_samples(f):
+    """
+    :return: Number of samples (frames) of a time-to-sample table, read from the start of its payload
+    """
+    num_entries = struct.unpack(">4xI", f.read(8))[0]
+    entries = struct.unpack(">{}I".format(2 * num_entries), f.read(8 * num_entries))
+    return sum(entries[::2])  # Pairs of (sample count, sample duration)
+
+
+def probe_mp4_size(f, end=None):
+    if end is None:
+        end = get_mp4_end(f)
+        if end is None:
+            return None
+
+    for atom_type, payload_start, payload_end in iterate_mp4_atoms(f, end):
+        if atom_type in MP4_CONTAINER_ATOMS:
+            f.seek(payload_start)
+            result = probe_mp4_size(f, payload_end)
+            if result is not None:
+                return result
+        elif atom_type == b'tkhd':
+            f.seek(payload_start)
+            width, height = read_tkhd_size(f)
+            if width > 0 and height > 0:  # Audio tracks have zero size
+                return width, height
+    return None
+
+
+def read_mp4_track(f, end, track=None):
+    """
+    Collect the properties of a track from the atoms between the current position and 'end' (payload of 'trak')
+    :return: Dict with (some of) the keys "size", "timescale", "duration", "handler" and "frames"
+    """
+    if track is None:
+        track = {}
+    for atom_type, payload_start, payload_end in iterate_mp4_atoms(f, end):
+        f.seek(payload_start)
+        if atom_type in MP4_TRACK_CONTAINER_ATOMS:
+            read_mp4_track(f, payload_end, track)
+        elif atom_type == b'tkhd':
+            track["size"] = read_tkhd_size(f)
+        elif atom_type == b'mdhd':
+            track["timescale"], track["duration"] = read_mdhd_timing(f)
+        elif atom_type == b'hdlr':
+            track["handler"] = struct.unpack(">8x4s", f.read(12))[0]
+        elif atom_type == b'stts':
+            track["frames"] = read_stts_samples(f)
+    return track
+
+
+def probe_mp4_video(f):
+    """
+    Read the properties of the first video track of an ISO base media file. Fragmented files, whose sample tables are
+    empty, are not supported.
+    :return: Dict {"width", "height", "frames", "duration" (seconds), "fps"} or None
+    """
+    end = get_mp4_end(f)
+    if end is None:
+        return None
+    for atom_type, payload_start, payload_end in iterate_mp4_atoms(f, end):
+        if atom_type != b'moov':
+            continue
+        f.seek(payload_start)
+        for track_type, track_start, track_end in iterate_mp4_atoms(f, payload_end):
+            if track_type != b'trak':
+                continue
+            f.seek(track_start)
+            track = read_mp4_track(f, track_end)
+            if track.get("handler") != b'vide' or len(track.keys() & {"size", "timescale", "frames"}) < 3:
+                continue
+            width, height = track["size"]
+            if width == 0 or height == 0 or track["frames"] == 0 or track["timescale"] == 0 or track["duration"] == 0:
+                continue
+            duration = track["duration"] / track["timescale"]
+            return {"width": width, "height": height, "frames": track["frames"], "duration": duration,
+                    "fps": track["frames"] / duration}
+    return None
+
+
+def probe_size(path):
+    """
+    Read the dimensions of an image or video from its file header.
+    Supported formats: JPEG, PNG and ISO base media files (mp4, mov, ...).
+    :param path: Path of the media file
+    :return: Tuple (width, height) or None, if the format is not supported or the file is invalid
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(8)
+            f.seek(0)
+            if head.startswith(b'\xff\xd8'):
+                return probe_jpeg_size(f)
+            if head == PNG_SIGNATURE:
+                return probe_png_size(f)
+            return probe_mp4_size(f)
+    except (OSError, struct.error, IndexError):
+        return None
+
+
+def probe_video(path):
+    """
+    Read the size, length and frame rate of a video from its container header.
+    Supported formats: ISO base media files (mp4, mov, ...).
+    :param path: Path of the video
+    :return: Dict {"width", "height", "frames", "duration" (seconds), "fps"} or None, if the format is not supported
+             or the file is invalid
+    """
+    try:
+        with open(path, 'rb') as f:
+            return probe_mp4_video(f)
+    except (OSError, struct.error, IndexError):
+        return None
+
+
+def get_scene_frames(video_info, fps=None):
+    """
+    Number of frames a video is played in a scene. Blender shows one frame of a video per frame of the scene, so the
+    frame rate of the video only matters, if it is converted to the one of the scene (see proxies.py).
+    :param video_info: Result of 'probe_video'
+    :param fps: Frame rate of the scene, if the video is converted to it
+    """
+    if fps is None:
+        return video_info["frames"]
+    return max(1, round(video_info["duration"] * fps))
+
+
+class MediaProbe:
+    """
+    Caches the results of 'probe_size' and 'probe_video' persistently, keyed by path, modification time and file size.
+    """
+    def __init__(self, cache_path=None):
+        self.cache = None if cache_path is None else JsonCache(cache_path)
+
+    def get_size(self, path):
+        """
+        :param path: Path of the media file
+        :return: Tuple (width, height) or None, if the size could not be determined from the header
+        """
+        dimensions = self.get_cached(path, "dimensions", probe_size)
+        return None if dimensions is None else tuple(dimensions)
+
+    def get_video_info(self, path):
+        """
+        :param path: Path of the video
+        :return: Dict (see 'probe_video') or None, if the properties could not be determined from the header
+        """
+        return self.get_cached(path, "video", probe_video)
+
+    def get_cached(self, path, field, probe):
+        """
+        :param field: Key of the cache entry of 'path', which stores the result of 'probe'
+        :param probe: Function path -> json serializable result or None, which is not cached
+        """
+        try:
+            mtime, size = get_file_signature(path)
+        except OSError:
+            return None
+
+        entry = None
+        if self.cache is not None:
+            entry = self.cache.get(path)
+            if entry is not None and entry["mtime"] == mtime and entry["size"] == size:
+                if field in entry:
+                    return entry[field]
+            else:
+                entry = None
+
+        result = probe(path)
+        if result is not None and self.cache is not None:
+            entry = dict(entry) if entry is not None else {"mtime": mtime, "size": size}
+            entry[field] = list(result) if isinstance(result, tuple) else result
+            self.cache.set(path, entry)
+        return result
+
+    def save(self):
+        if self.cache is not None:
+            self.cache.save()
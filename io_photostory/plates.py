@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Plate rendering: frames of flat photo slides are composited from one wide still (plate) per slide.
+
+Usage:
+    python3 -m io_photostory.plates story.blend
+"""
+
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from . import frame_manifest
+
+PLATE_DIRECTORY = "plates"
+
+# Plates of neighbouring slides overlap by this many pixels, which hides resampled borders
+OVERLAP = 2
+
+
+def is_available():
+    return Image is not None
+
+
+def get_plate_path(render_filepath, slide, extension=""):
+    return os.path.join(os.path.dirname(render_filepath), PLATE_DIRECTORY, "slide_{:04d}{}".format(slide, extension))
+
+
+def get_plate_width(frame_width, scale, slide_gap):
+    """
+    :param frame_width: Width of frames in pixels
+    :param scale: Pixels per scene unit
+    :param slide_gap: Distance of neighbouring slides in scene units
+    :return: Width of plates in pixels
+    """
+    return frame_width + 2 * (math.ceil(0.5 * slide_gap * scale) + OVERLAP)
+
+
+def get_plate_extent(manifest, plate):
+    """
+    :return: Tuple (left, right) of the part of the scene (x, in scene units), which the plate shows
+    """
+    half_width = 0.5 * plate["width"] / manifest["plate_scale"]
+    return plate["camera_x"] - half_width, plate["camera_x"] + half_width
+
+
+def get_frame_plates(manifest, camera_x):
+    """
+    :return: List of plates, which are visible at a camera location
+    """
+    half_width = 0.5 * manifest["frame_size"][0] / manifest["plate_scale"]
+    plates = []
+    for plate in manifest["plates"]:
+        left, right = get_plate_extent(manifest, plate)
+        if left < camera_x + half_width and right > camera_x - half_width:
+            plates.append(plate)
+    return plates
+
+
+def composite_frame(manifest, camera_x, path):
+    """
+    Pan plates to a camera location and write the resulting frame. Runs in a worker process.
+    :return: path
+    """
+    frame_width, frame_height = manifest["frame_size"]
+    result = Image.new("RGB", (frame_width, frame_height))
+    for plate in get_frame_plates(manifest, camera_x):
+        # Position of the top left corner of the plate within the frame (sub-pixel)
+        dx = (plate["camera_x"] - camera_x) * manifest["plate_scale"] + 0.5 * (frame_width - plate["width"])
+        dy = 0.5 * (frame_height - plate["height"])
+        with Image.open(plate["path"]) as image:
+            image = image.convert("RGB")
+            shifted = image.transform(result.size, Image.AFFINE, (1, 0, -dx, 0, 1, -dy), resample=Image.BILINEAR)
+            # The border of a resampled plate is blended with black, it is covered by the neighbouring plate
+            mask = Image.new("L", image.size, 0)
+            mask.paste(255, (1, 1, image.size[0] - 1, image.size[1] - 1))
+            mask = mask.transform(result.size, Image.AFFINE, (1, 0, -dx, 0, 1, -dy), resample=Image.NEAREST)
+        result.paste(shifted, (0, 0), mask)
+    result.save(path)
+    return path
+
+
+def composite(manifest, max_workers=None):
+    """
+    Create all frames of the manifest, which are composited from plates (duplicate frames are skipped)
+    :return: Number of frames
+    """
+    if not is_available():
+        raise RuntimeError("Compositing plates requires Pillow.")
+    duplicates = set(manifest.get("duplicate_frames", []))
+    jobs = [(float(x), frame_manifest.get_manifest_frame_path(manifest, int(f)))
+            for f, x in manifest.get("plate_frames", {}).items() if int(f) not in duplicates]
+    for plate in manifest.get("plates", []):
+        if not os.path.isfile(plate["path"]):
+            raise RuntimeError("Plate {} was not rendered.".format(plate["path"]))
+    if len(jobs) < 2 or max_workers == 1:
+        for x, path in jobs:
+            composite_frame(manifest, x, path)
+        return len(jobs)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for _ in executor.map(composite_frame, [manifest] * len(jobs), *zip(*jobs), chunksize=8):
+            pass
+    return len(jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Composite the frames of a photostory, which pan over plates.")
+    parser.add_argument("blend", help="Path of .blend file")
+    parser.add_argument("--manifest", help="Frame manifest (default: <blend>.frames.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    from .render_farm import find_manifest
+    manifest = frame_manifest.load_manifest(args.manifest or find_manifest(os.path.abspath(args.blend)))
+    print("Composited {} frames from {} plates.".format(composite(manifest, args.workers),
+                                                         len(manifest.get("plates", []))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Timing spans, counters and optional cProfile runs of imports, summarized in a json report.
+
+Usage:
+    profiler = Profiler(use_cprofile=True)
+    with profiler:
+        with span("layout"):
+            count("photos", 3)
+    profiler.save("story.profile.json")
+"""
+
+import cProfile
+import io
+import json
+import logging
+import pstats
+import time
+from contextlib import contextmanager
+
+LOGGER_NAME = __package__
+
+# Number of functions in the cProfile summary of a report
+NUM_PROFILED_FUNCTIONS = 40
+
+_active = None
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Print messages of photostory to the console (blender does not configure logging)
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    if len(logger.handlers) == 0:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+
+class Profiler:
+    def __init__(self, use_cprofile=False):
+        """
+        :param use_cprofile: If True, all python functions are profiled as well (slows down the import)
+        """
+        self.spans = {}  # Path, e.g. "build/slides/layout" -> [count, total seconds, max seconds]
+        self.counters = {}
+        self.stack = []
+        self.cprofile = cProfile.Profile() if use_cprofile else None
+        self.start_time = None
+        self.total_time = 0
+        self.previous = None
+
+    def __enter__(self):
+        global _active
+        self.previous = _active
+        _active = self
+        self.start_time = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self
+
+    def __exit__(self, *args):
+        global _active
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.total_time += time.perf_counter() - self.start_time
+        _active = self.previous
+        return False
+
+    @contextmanager
+    def span(self, name):
+        self.stack.append(name)
+        path = "/".join(self.stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.stack.pop()
+            entry = self.spans.get(path)
+            if entry is None:
+                self.spans[path] = [1, duration, duration]
+            else:
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_profile_summary(self):
+        """
+        :return: List of dicts, the functions with the highest cumulative time
+        """
+        if self.cprofile is None:
+            return None
+        stats = pstats.Stats(self.cprofile, stream=io.StringIO())
+        functions = []
+        for (filename, line, function), (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+            functions.append({"function": function, "file": filename, "line": line, "calls": calls,
+                              "time": own_time, "cumulative_time": cumulative_time})
+        functions.sort(key=lambda f: f["cumulative_time"], reverse=True)
+        return functions[:NUM_PROFILED_FUNCTIONS]
+
+    def get_report(self):
+        report = {"total_time": self.total_time,
+                  "spans": {path: {"count": c, "total": total, "mean": total / c, "max": longest}
+                            for path, (c, total, longest) in sorted(self.spans.items())},
+                  "counters": dict(sorted(self.counters.items()))}
+        profile = self.get_profile_summary()
+        if profile is not None:
+            report["profile"] = profile
+        return report
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.get_report(), f, indent=1)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(path + ".prof")
+
+    def log_summary(self, logger, min_fraction=0.01):
+        """
+        Log spans, which took at least 'min_fraction' of the total time, and all counters
+        """
+        for path, (c, total, _) in sorted(self.spans.items()):
+            if total >= min_fraction * self.total_time:
+                logger.info("{:8.3f}s {:6d}x  {}".format(total, c, path))
+        for name, value in sorted(self.counters.items()):
+            logger.info("{:>16}  {}".format(value, name))
+
+
+@contextmanager
+def _no_span():
+    yield
+
+
+def span(name):
+    """
+    Time a block of code, if a profiler is active: with span("layout"): ...
+    """
+    if _active is None:
+        return _no_span()
+    return _active.span(name)
+
+
+def count(name, value=1):
+    if _active is not None:
+        _active.count(name, value)
+
+
+def get_active():
+    return _active
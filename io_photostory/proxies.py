@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Downscaled copies (proxies) of photos and key frame only copies of videos, created in parallel.
+"""
+
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .helpers_cache import get_file_signature
+
+log = logging.getLogger(__name__)
+
+# Proxy sizes are rounded up to multiples of this value, so that small layout changes reuse cached proxies
+SIZE_QUANTIZATION = 64
+
+# Only create a proxy, if it is at least this much smaller than the original
+MIN_REDUCTION = 0.8
+
+# Default directory of proxies, next to the .blend file (see importer), which is shared with render nodes
+PROXY_DIRECTORY = "photostory_proxies"
+
+# JPEG quality of video proxies (ffmpeg's -q:v, 2 is best, 31 is worst)
+VIDEO_PROXY_QUALITY = 3
+
+
+def is_available():
+    return Image is not None
+
+
+def find_ffmpeg():
+    """
+    :return: Path of ffmpeg (environment variable PHOTOSTORY_FFMPEG or search path) or None, if it is not installed
+    """
+    return shutil.which(os.environ.get("PHOTOSTORY_FFMPEG", "ffmpeg"))
+
+
+def get_proxy_size(image_size, display_size):
+    """
+    Size of the proxy for an image, which is displayed at (up to) 'display_size' pixels.
+    :param image_size: Tuple (width, height) of the original image
+    :param display_size: Tuple (width, height), the largest size the image is displayed at
+    :return: Tuple (width, height) of proxy, or None if the original image is not (much) larger than required
+    """
+    scale = max(display_size[0] / image_size[0], display_size[1] / image_size[1])
+    if scale >= MIN_REDUCTION:
+        return None
+    longest_side = max(image_size) * scale
+    longest_side = SIZE_QUANTIZATION * math.ceil(longest_side / SIZE_QUANTIZATION)
+    scale = longest_side / max(image_size)
+    if scale >= MIN_REDUCTION:
+        return None
+    return max(1, round(image_size[0] * scale)), max(1, round(image_size[1] * scale))
+
+
+def get_video_proxy_size(video_size, display_size):
+    """
+    Size of the proxy for a video. Unlike photos, videos always get a proxy (for its key frames and frame rate), at
+    the original size, if it is not much larger than required. Sizes are even, as required by chroma subsampling.
+    :return: Tuple (width, height) of proxy
+    """
+    proxy_size = get_proxy_size(video_size, display_size) or video_size
+    return max(2, proxy_size[0] + proxy_size[0] % 2), max(2, proxy_size[1] + proxy_size[1] % 2)
+
+
+def get_proxy_path(cache_dir, path, proxy_size, fps=None):
+    """
+    Location of a proxy within the cache. The name is derived from the identity of the source file, the proxy size and
+    (videos only) the frame rate of the proxy.
+    """
+    mtime, size = get_file_signature(path)
+    key = "{}|{}|{}|{}x{}".format(os.path.realpath(path), mtime, size, proxy_size[0], proxy_size[1])
+    if fps is not None:
+        key += "|{:g}".format(fps)
+        extension = ".mov"
+    else:
+        extension = ".png" if path.lower().endswith(".png") else ".jpg"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, digest[:2], digest + extension)
+
+
+def create_proxy(path, proxy_path, proxy_size):
+    """
+    Decode and downscale a single image. Runs in a worker process.
+    :return: proxy_path
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', proxy_size)  # Lets the JPEG decoder skip resolution, which is not required
+        img = img.resize(proxy_size, Image.LANCZOS)
+        if proxy_path.endswith(".jpg") and img.mode != 'RGB':
+            img = img.convert('RGB')
+        os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+        tmp_path = proxy_path + ".{}.tmp".format(os.getpid())
+        if proxy_path.endswith(".jpg"):
+            img.save(tmp_path, format='JPEG', quality=95)
+        else:
+            img.save(tmp_path, format='PNG')
+    os.replace(tmp_path, proxy_path)
+    return proxy_path
+
+
+def create_proxies(requests, cache_dir, max_workers=None, executable=None):
+    """
+    Create proxies for multiple images in parallel. Existing proxies in the cache are reused.
+    :param requests: Dict path -> (image_size, display_size), see 'get_proxy_size'
+    :param cache_dir: Directory, which stores the proxies
+    :param max_workers: Number of worker processes (default: number of cores)
+    :param executable: Python interpreter used for worker processes (required within blender < 2.91)
+    :return: Dict path -> proxy path, for all images that got a proxy
+    """
+    result = {}
+    jobs = []
+    for path, (image_size, display_size) in requests.items():
+        proxy_size = get_proxy_size(image_size, display_size)
+        if proxy_size is None:
+            continue
+        proxy_path = get_proxy_path(cache_dir, path, proxy_size)
+        if os.path.isfile(proxy_path):
+            result[path] = proxy_path
+        else:
+            jobs.append((path, proxy_path, proxy_size))
+
+    if len(jobs) == 0:
+        return result
+
+    context = multiprocessing.get_context('spawn')
+    if executable is not None:
+        context.set_executable(executable)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = {executor.submit(create_proxy, *job): job[0] for job in jobs}
+        for future, path in futures.items():
+            try:
+                result[path] = future.result()
+            except Exception as e:
+                log.warning("Creating proxy for {} failed ({}), using original.".format(path, e))
+    return result
+
+
+def create_video_proxy(path, proxy_path, proxy_size, fps, ffmpeg):
+    """
+    Transcode a single video to MJPEG (key frames only), without audio. Runs in a worker thread, ffmpeg does the work.
+    :return: proxy_path
+    """
+    os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+    tmp_path = proxy_path + ".{}.tmp".format(os.getpid())
+    command = [ffmpeg, "-nostdin", "-y", "-loglevel", "error", "-i", path, "-an",
+               "-vf", "fps={:g},scale={}:{}:flags=lanczos".format(fps, proxy_size[0], proxy_size[1]),
+               "-c:v", "mjpeg", "-q:v", str(VIDEO_PROXY_QUALITY), "-pix_fmt", "yuvj420p", "-f", "mov", tmp_path]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        message = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(message[-1] if len(message) > 0 else "ffmpeg exited with {}".format(result.returncode))
+    os.replace(tmp_path, proxy_path)
+    return proxy_path
+
+
+def create_video_proxies(requests, cache_dir, fps, max_workers=None, ffmpeg=None):
+    """
+    Create proxies for multiple videos in parallel. Existing proxies in the cache are reused.
+    :param requests: Dict path -> (video_size, display_size), see 'get_video_proxy_size'
+    :param cache_dir: Directory, which stores the proxies
+    :param fps: Frame rate of the proxies (frame rate of the scene)
+    :param max_workers: Number of parallel ffmpeg processes (default: half the number of cores, as ffmpeg uses multiple
+                        threads itself)
+    :param ffmpeg: Path of ffmpeg (default: see 'find_ffmpeg')
+    :return: Dict path -> proxy path, for all videos that got a proxy
+    """
+    if ffmpeg is None:
+        ffmpeg = find_ffmpeg()
+        if ffmpeg is None:
+            log.warning("Skipping video proxies, as ffmpeg is not installed.")
+            return {}
+
+    result = {}
+    jobs = []
+    for path, (video_size, display_size) in requests.items():
+        proxy_size = get_video_proxy_size(video_size, display_size)
+        proxy_path = get_proxy_path(cache_dir, path, proxy_size, fps)
+        if os.path.isfile(proxy_path):
+            result[path] = proxy_path
+        else:
+            jobs.append((path, proxy_path, proxy_size, fps, ffmpeg))
+
+    if len(jobs) == 0:
+        return result
+
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(create_video_proxy, *job): job[0] for job in jobs}
+        for future, path in futures.items():
+            try:
+                result[path] = future.result()
+            except Exception as e:
+                log.warning("Creating video proxy for {} failed ({}), using original.".format(path, e))
+    return result
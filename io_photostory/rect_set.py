@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Collections of axis-aligned rectangles, stored as arrays (same conventions as layout.Rectangle).
+"""
+
+import numpy as np
+
+from .spatial_index import GridIndex
+
+
+class RectSet:
+    """
+    Struct of arrays: x, y, w, h hold the left, top, width and height of all rectangles
+    """
+    def __init__(self, capacity=16):
+        self._data = np.zeros((4, max(1, capacity)))
+        self.count = 0
+
+    @staticmethod
+    def from_arrays(x, y, w, h):
+        x = np.asarray(x, dtype=float).ravel()
+        result = RectSet(len(x))
+        result._data[:, :len(x)] = (x, np.ravel(y), np.ravel(w), np.ravel(h))
+        result.count = len(x)
+        return result
+
+    @staticmethod
+    def from_rectangles(rectangles):
+        """
+        :param rectangles: Objects with the attributes x, y, width and height (e.g. layout.Rectangle)
+        """
+        return RectSet.from_arrays([r.x for r in rectangles], [r.y for r in rectangles],
+                                   [r.width for r in rectangles], [r.height for r in rectangles])
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def x(self):
+        return self._data[0, :self.count]
+
+    @property
+    def y(self):
+        return self._data[1, :self.count]
+
+    @property
+    def w(self):
+        return self._data[2, :self.count]
+
+    @property
+    def h(self):
+        return self._data[3, :self.count]
+
+    @property
+    def right(self):
+        return self.x + self.w
+
+    @property
+    def bottom(self):
+        return self.y + self.h
+
+    @property
+    def areas(self):
+        return self.w * self.h
+
+    def append(self, x, y, w, h):
+        """
+        Add a rectangle, the storage grows by doubling
+        :return: Index of new rectangle
+        """
+        if self.count == self._data.shape[1]:
+            self._data = np.concatenate((self._data, np.zeros_like(self._data)), axis=1)
+        self._data[:, self.count] = (x, y, w, h)
+        self.count += 1
+        return self.count - 1
+
+    def get(self, index):
+        """
+        :return: Tuple (x, y, w, h)
+        """
+        return tuple(float(v) for v in self._data[:, index])
+
+    def to_array(self):
+        """
+        :return: (N,4) array with columns x, y, width, height
+        """
+        return self._data[:, :self.count].T.copy()
+
+    def scale(self, factor):
+        self._data[:, :self.count] *= factor
+
+    def translate(self, dx, dy):
+        self._data[0, :self.count] += dx
+        self._data[1, :self.count] += dy
+
+    def intersections(self, x, y, w, h):
+        """
+        Overlap of each rectangle with each of K query rectangles
+        :param x, y, w, h: Scalars or arrays of length K
+        :return: Tuple of (N,K) arrays (width, height) of intersections, negative if there is none
+        """
+        x, y, w, h = (np.atleast_1d(np.asarray(v, dtype=float))[np.newaxis, :] for v in (x, y, w, h))
+        width = np.minimum(self.right[:, np.newaxis], x + w) - np.maximum(self.x[:, np.newaxis], x)
+        height = np.minimum(self.bottom[:, np.newaxis], y + h) - np.maximum(self.y[:, np.newaxis], y)
+        return width, height
+
+    def intersects_any(self, x, y, w, h, margin=0):
+        """
+        Test query rectangles for overlap with any rectangle of this set, see layout.Rectangle.intersects
+        :param x, y, w, h: Scalars or arrays of length K
+        :return: Bool or (K) array of bools
+        """
+        width, height = self.intersections(x, y, w, h)
+        result = np.any((width > margin) & (height > margin), axis=0)
+        return bool(result[0]) if np.ndim(x) == 0 else result
+
+    def merge(self, x, y, w, h):
+        """
+        Bounding boxes of each rectangle and another rectangle (or one rectangle per element)
+        :return: RectSet
+        """
+        left = np.minimum(self.x, x)
+        top = np.minimum(self.y, y)
+        return RectSet.from_arrays(left, top,
+                                   np.maximum(self.right, np.add(x, w)) - left,
+                                   np.maximum(self.bottom, np.add(y, h)) - top)
+
+    def bounding_box(self):
+        """
+        :return: Tuple (x, y, w, h)
+        """
+        if self.count < 1:
+            raise RuntimeError("'bounding_box' requires at least 1 input rectangle")
+        x, y = self.x.min(), self.y.min()
+        return float(x), float(y), float(self.right.max() - x), float(self.bottom.max() - y)
+
+    def get_largest(self):
+        """
+        :return: Index of the rectangle with the largest area (the first one, if there are multiple)
+        """
+        if self.count < 1:
+            raise RuntimeError("'get_largest' requires at least 1 input rectangle")
+        return int(np.argmax(self.areas))
+
+
+def get_aspects(w, h):
+    w = np.asarray(w, dtype=float)
+    h = np.asarray(h, dtype=float)
+    return np.divide(w, h, out=np.zeros(np.broadcast(w, h).shape), where=h != 0)
+
+
+def get_greedy_configurations(x, y, right, bottom, w, h):
+    """
+    Positions of a new rectangle of size (w,h), attached to placed rectangles by 'arrange_greedy'. The overlap of a
+    configuration with any fixed rectangle grows monotonically with w and h.
+    :return: Tuple (cx, cy) of (N,4) arrays, 4 configurations per placed rectangle
+    """
+    cx = np.stack((right, right, x, right - w), axis=-1)
+    cy = np.stack((y, bottom - h, bottom, bottom), axis=-1)
+    return cx, cy
+
+
+def arrange_greedy(widths, heights, aspect_ratio, margin=0.5):
+    """
+    Place rectangles one by one, next to or below one of the already placed rectangles, such that the aspect ratio of
+    the bounding box stays as close as possible to 'aspect_ratio'. Rectangles are not scaled.
+    :param widths: Widths of rectangles, in the order of placement
+    :param heights: Heights of rectangles
+    :param aspect_ratio: Target aspect ratio of layout
+    :param margin: Overlap, which is tolerated between rectangles
+    :return: RectSet of placed rectangles, the first one is at (0,0)
+    """
+    n = len(widths)
+    placed = RectSet(n)
+    if n == 0:
+        return placed
+    index = GridIndex(max(np.mean(widths), np.mean(heights)))
+
+    # A configuration, which overlaps a placed rectangle even for the smallest of all remaining sizes, overlaps for
+    # all remaining rectangles. It is closed for good, such that only open configurations have to be tested.
+    min_widths = np.minimum.accumulate(np.asarray(widths, dtype=float)[::-1])[::-1]
+    min_heights = np.minimum.accumulate(np.asarray(heights, dtype=float)[::-1])[::-1]
+    open_configs = np.zeros((n, 4), dtype=bool)
+    bb_left, bb_top, bb_right, bb_bottom = 0, 0, widths[0], heights[0]  # Updated with each placed rectangle
+    x, y = 0, 0
+
+    for i, (w, h) in enumerate(zip(widths, heights)):
+        last = i + 1 == n
+        mw, mh = (0, 0) if last else (min_widths[i + 1], min_heights[i + 1])
+
+        if i > 0:
+            cx, cy = get_greedy_configurations(placed.x, placed.y, placed.right, placed.bottom, w, h)
+            candidates = np.flatnonzero(open_configs[:i].ravel())
+            cx, cy = cx.ravel()[candidates], cy.ravel()[candidates]
+            left = np.minimum(cx, bb_left)
+            top = np.minimum(cy, bb_top)
+            aspect_diff = np.abs(aspect_ratio - get_aspects(np.maximum(cx + w, bb_right) - left,
+                                                            np.maximum(cy + h, bb_bottom) - top))
+
+            # Test configurations from best to worst (stable, so ties keep the order of placement) until one is
+            # valid, instead of testing all of them against all placed rectangles
+            best = None
+            for c in np.argsort(aspect_diff, kind='stable'):
+                if cx[c] < 0 or cy[c] < 0:
+                    continue
+                if not index.intersects_any(cx[c], cy[c], w, h, margin):
+                    best = c
+                    break
+                if last:
+                    continue
+                j, k = divmod(candidates[c], 4)
+                if w > mw or h > mh:
+                    px, py, pw, ph = placed.get(j)
+                    mx, my = get_greedy_configurations(px, py, px + pw, py + ph, mw, mh)
+                    if not index.intersects_any(mx[k], my[k], mw, mh, margin):
+                        continue  # Smaller remaining rectangles might fit
+                open_configs[j, k] = False
+            if best is None:
+                raise RuntimeError("Could not place rectangle.")
+            x, y = float(cx[best]), float(cy[best])
+
+        placed.append(x, y, w, h)
+        index.insert(i, x, y, w, h)
+        bb_left, bb_top = min(bb_left, x), min(bb_top, y)
+        bb_right, bb_bottom = max(bb_right, x + w), max(bb_bottom, y + h)
+        if last:
+            break
+
+        # Close configurations of other rectangles, which are blocked by the new one, and vice versa
+        cx, cy = get_greedy_configurations(placed.x[:i], placed.y[:i], placed.right[:i], placed.bottom[:i], mw, mh)
+        blocked = RectSet.from_arrays(x, y, w, h).intersects_any(cx.ravel(), cy.ravel(), mw, mh, margin)
+        open_configs[:i] &= ~blocked.reshape(i, 4)
+        cx, cy = get_greedy_configurations(x, y, x + w, y + h, mw, mh)
+        for k in range(4):
+            open_configs[i, k] = not index.intersects_any(cx[k], cy[k], mw, mh, margin)
+    return placed
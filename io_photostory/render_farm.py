@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Renders the unique frames of a photostory with multiple blender processes, in shards of about equal cost.
+
+Usage:
+    python3 -m io_photostory.render_farm plan story.blend
+    python3 -m io_photostory.render_farm render story.blend --workers 8
+    python3 -m io_photostory.render_farm render story.blend --workers 16 --nodes 4 --node 0   # On each node
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from . import frame_manifest
+from . import plates
+
+# Estimated render cost of a frame, relative to a frame of a still photo slide
+SEGMENT_COSTS = {
+    "photo": 1.0,
+    "video": 1.2,
+    "map": 3.0,         # Terrain mesh and route curves
+    "transition": 1.5,  # Two slides are visible
+}
+
+
+def get_frame_costs(manifest):
+    """
+    :return: Dict frame -> estimated cost, for all frames of the manifest
+    """
+    costs = {f: 1.0 for f in range(manifest["frame_start"], manifest["frame_end"] + 1)}
+    for segment in manifest.get("segments", []):
+        cost = SEGMENT_COSTS.get(segment["type"], 1.0)
+        for f in range(max(segment["start"], manifest["frame_start"]), min(segment["end"], manifest["frame_end"]) + 1):
+            costs[f] = cost
+    return costs
+
+
+def plan_shards(frames, costs, num_shards):
+    """
+    Split frames into contiguous shards of about equal cost (contiguous frames share data, which blender loads once
+    per process)
+    :param frames: Sorted list of frames to render
+    :param costs: Dict frame -> cost
+    :param num_shards: Maximal number of shards
+    :return: List of shards, each a list of inclusive frame ranges (first, last)
+    """
+    total = sum(costs[f] for f in frames)
+    shards = []
+    current = []
+    accumulated = 0
+    for f in frames:
+        current.append(f)
+        accumulated += costs[f]
+        # Cut, once this shard reaches its share of the total cost
+        if accumulated >= total * (len(shards) + 1) / num_shards and len(shards) < num_shards - 1:
+            shards.append(current)
+            current = []
+    if len(current) > 0:
+        shards.append(current)
+    return [frame_manifest.get_ranges(s) for s in shards]
+
+
+def get_shard_cost(shard, costs):
+    return sum(costs[f] for a, b in shard for f in range(a, b + 1))
+
+
+def find_manifest(blend_path):
+    """
+    Default location of the manifest of a .blend file, as written by 'python -m io_photostory build'
+    """
+    return os.path.splitext(blend_path)[0] + ".frames.json"
+
+
+def get_worker_command(blender, blend_path, shard, output=None, threads=None):
+    command = [blender, "--background", blend_path]
+    if output is not None:
+        command += ["--render-output", output]
+    if threads is not None:
+        command += ["--threads", str(threads)]
+    command += ["--render-frame", frame_manifest.format_frame_ranges(shard)]
+    return command
+
+
+def get_plate_command(blender, blend_path, manifest_path, slides, threads=None):
+    command = [blender, "--background", blend_path]
+    if threads is not None:
+        command += ["--threads", str(threads)]
+    command += ["--python", os.path.join(os.path.dirname(os.path.abspath(__file__)), "__main__.py"), "--",
+                "render-plates", "--manifest", manifest_path, "--slides", ",".join(str(s) for s in slides)]
+    return command
+
+
+def get_part_files(manifest, part, blend_path, manifest_path):
+    """
+    :return: Tuple (.blend file, manifest) of a part of the story, or of the whole story if 'part' is None
+    """
+    if part is None:
+        return blend_path, manifest_path
+    return manifest["parts"][part]["blend"], manifest["parts"][part]["manifest"]
+
+
+def split_by_part(manifest, shard):
+    """
+    :param shard: List of inclusive frame ranges (first, last)
+    :return: List of tuples (part, ranges), consecutive frame ranges of the same part are grouped
+    """
+    result = []
+    for a, b in shard:
+        f = a
+        while f <= b:
+            part = frame_manifest.get_part(manifest, f)
+            last = b if part is None else min(b, manifest["parts"][part]["frame_end"])
+            if len(result) > 0 and result[-1][0] == part:
+                result[-1][1].append((f, last))
+            else:
+                result.append((part, [(f, last)]))
+            f = last + 1
+    return result
+
+
+def get_jobs(manifest, blend_path, manifest_path, shards, plate_groups, blender="blender", output=None,
+             threads=None):
+    """
+    :param shards: Frame shards, see plan_shards
+    :param plate_groups: Lists of plates (from the manifest)
+    :return: List of jobs, each a list of commands, which run one after another
+    """
+    jobs = []
+    for shard in shards:
+        jobs.append([get_worker_command(blender, get_part_files(manifest, part, blend_path, manifest_path)[0],
+                                        ranges, output, threads)
+                     for part, ranges in split_by_part(manifest, shard)])
+    for group in plate_groups:
+        slides_by_part = {}
+        for plate in group:
+            slides_by_part.setdefault(plate.get("part"), []).append(plate["slide"])
+        jobs.append([get_plate_command(blender, *get_part_files(manifest, part, blend_path, manifest_path), slides,
+                                       threads)
+                     for part, slides in slides_by_part.items()])
+    return jobs
+
+
+def run_job(commands):
+    """
+    :return: Number of failed commands
+    """
+    failed = 0
+    for command in commands:
+        returncode = subprocess.call(command, stdout=subprocess.DEVNULL)
+        if returncode != 0:
+            print("ERROR: Worker failed ({}): {}".format(returncode, " ".join(command)), file=sys.stderr)
+            failed += 1
+    return failed
+
+
+def render(jobs, dry_run=False):
+    """
+    Run all jobs at the same time, each job is one blender process at a time
+    :return: Number of failed processes
+    """
+    if dry_run:
+        for commands in jobs:
+            for c in commands:
+                print(" ".join(c))
+        return 0
+    if len(jobs) == 0:
+        return 0
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        return sum(executor.map(run_job, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the unique frames of a photostory in parallel.")
+    parser.add_argument("command", choices=["plan", "render"])
+    parser.add_argument("blend", help="Path of .blend file")
+    parser.add_argument("--manifest", help="Frame manifest (default: <blend>.frames.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of blender processes per node")
+    parser.add_argument("--threads", type=int, help="Threads per blender process (default: cores / workers)")
+    parser.add_argument("--nodes", type=int, default=1, help="Number of machines sharing the work")
+    parser.add_argument("--node", type=int, default=0, help="Index of this machine")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument("--render-output", help="Output path (default: as stored in .blend file)")
+    parser.add_argument("--dry-run", action="store_true", help="Print commands instead of running them")
+    args = parser.parse_args(argv)
+
+    blend_path = os.path.abspath(args.blend)
+    manifest_path = os.path.abspath(args.manifest or find_manifest(blend_path))
+    manifest = frame_manifest.load_manifest(manifest_path)
+    costs = get_frame_costs(manifest)
+    frames = frame_manifest.get_unique_frames(manifest)
+    shards = plan_shards(frames, costs, args.workers * args.nodes)
+    node_shards = shards[args.node * args.workers:(args.node + 1) * args.workers]
+    # Plates of this node, distributed to its workers
+    node_plates = manifest.get("plates", [])[args.node::args.nodes]
+    plate_groups = [node_plates[i::args.workers] for i in range(min(args.workers, len(node_plates)))]
+
+    if args.command == "plan":
+        print(json.dumps({"frames": manifest["frame_end"] - manifest["frame_start"] + 1,
+                          "unique_frames": len(frames),
+                          "plates": len(manifest.get("plates", [])),
+                          "plate_frames": len(manifest.get("plate_frames", {})),
+                          "parts": len(manifest.get("parts", [])),
+                          "shards": [{"node": i // args.workers, "cost": get_shard_cost(s, costs),
+                                      "frames": frame_manifest.format_frame_ranges(s)}
+                                     for i, s in enumerate(shards)]}, indent=2))
+        return 0
+
+    threads = args.threads
+    num_processes = len(node_shards) + len(plate_groups)
+    if threads is None and num_processes > 0:
+        threads = max(1, (os.cpu_count() or 1) // num_processes)
+    print("Rendering {} of {} frames and {} plates with {} processes ...".format(
+        sum(b - a + 1 for s in node_shards for a, b in s), len(frames), len(node_plates), num_processes))
+    jobs = get_jobs(manifest, blend_path, manifest_path, node_shards, plate_groups, args.blender, args.render_output,
+                    threads)
+    failed = render(jobs, args.dry_run)
+    if failed > 0:
+        return 1
+
+    if len(manifest.get("plate_frames", {})) > 0 and not args.dry_run:
+        if args.nodes > 1:
+            print("Once all nodes finished, composite frames: python3 -m io_photostory.plates", args.blend)
+        else:
+            print("Composited {} frames from plates.".format(plates.composite(manifest, args.workers)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Bezier splines of GPS routes on the world map, sampled like blender does.
+"""
+
+import numpy as np
+
+# Handles point 30% of the way towards the neighbouring location
+HANDLE_FACTOR = 0.3
+
+# Samples per segment of route splines (resolution_u of the curve)
+RESOLUTION = 13
+
+
+def get_route_handles(points):
+    """
+    :param points: (N,3) array of locations (map coordinates)
+    :return: Tuple of (N,3) arrays (left handles, right handles). The handles of the first and last point, which have
+             no neighbour on one side, are located at the point.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    left = points.copy()
+    right = points.copy()
+    if len(points) < 2:
+        return left, right
+    v = HANDLE_FACTOR * (points[:-1] - points[1:])  # Towards the previous location, for points 1..N-1
+    left[1:] += v
+    left[1:, 2] += np.linalg.norm(v, axis=1)
+    right[:-1] -= v
+    right[:-1, 2] += np.linalg.norm(v, axis=1)
+    return left, right
+
+
+def sample_route(points, resolution=RESOLUTION):
+    """
+    Evaluate the route spline like blender does for a non-cyclic Bezier curve: 'resolution' samples per segment
+    (t = i / resolution) and the last point
+    :return: ((N-1)*resolution+1, 3) array of points
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return points.copy()
+    left, right = get_route_handles(points)
+    t = (np.arange(resolution) / resolution)[:, np.newaxis, np.newaxis]
+    p0, p1, p2, p3 = points[:-1], right[:-1], left[1:], points[1:]
+    samples = ((1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3 * p3)
+    return np.concatenate((samples.transpose(1, 0, 2).reshape(-1, 3), points[-1:]))
+
+
+def get_route_length(points, resolution=RESOLUTION):
+    """
+    :return: Length of the sampled route spline, which equals the length of the curve converted to a mesh
+    """
+    samples = sample_route(points, resolution)
+    return float(np.linalg.norm(np.diff(samples, axis=0), axis=1).sum())
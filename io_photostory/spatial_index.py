@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Uniform grid over axis-aligned rectangles, which finds overlaps without testing all rectangles.
+"""
+
+import math
+
+
+class GridIndex:
+    def __init__(self, cell_size):
+        """
+        :param cell_size: Width and height of grid cells, ideally about the size of the indexed rectangles
+        """
+        if cell_size <= 0:
+            raise RuntimeError("Invalid cell size of spatial index.")
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rectangles = {}
+
+    def get_cell_range(self, x, y, w, h):
+        """
+        :return: Tuple (col0, row0, col1, row1) of cells overlapped by a rectangle (inclusive)
+        """
+        s = self.cell_size
+        return math.floor(x / s), math.floor(y / s), math.floor((x + w) / s), math.floor((y + h) / s)
+
+    def insert(self, index, x, y, w, h):
+        """
+        :param index: Identifier of rectangle, returned by queries
+        """
+        self.rectangles[index] = (x, y, w, h)
+        col0, row0, col1, row1 = self.get_cell_range(x, y, w, h)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                self.cells.setdefault((col, row), []).append(index)
+
+    def query(self, x, y, w, h):
+        """
+        :return: Set of indices of rectangles, which share a cell with the query rectangle (possible overlaps)
+        """
+        result = set()
+        col0, row0, col1, row1 = self.get_cell_range(x, y, w, h)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                result.update(self.cells.get((col, row), ()))
+        return result
+
+    def intersects_any(self, x, y, w, h, margin=0):
+        """
+        Test whether a rectangle overlaps any indexed rectangle by more than 'margin' in both directions, see
+        layout.Rectangle.intersects
+        """
+        for index in self.query(x, y, w, h):
+            rx, ry, rw, rh = self.rectangles[index]
+            if min(x + w, rx + rw) - max(x, rx) > margin and min(y + h, ry + rh) - max(y, ry) > margin:
+                return True
+        return False
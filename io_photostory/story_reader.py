@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Incremental reading of story files (json), one slide at a time.
+"""
+
+import json
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = " \t\n\r"
+NUMBER_CHARACTERS = "0123456789.eE+-"
+
+
+class JsonStream:
+    """
+    Characters of a file, read chunk by chunk. Consumed characters are dropped from the buffer.
+    """
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read_more(self):
+        """
+        Append (at least) a chunk to the buffer, reads grow with the pending part, so that large values are not
+        decoded again and again
+        :return: False, if the end of the file was reached
+        """
+        if self.eof:
+            return False
+        pending = len(self.buffer) - self.pos
+        data = self.file.read(max(self.chunk_size, pending))
+        if len(data) == 0:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        :return: Next character, which is not whitespace, or None at the end of the file
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return None
+
+    def expect(self, characters):
+        c = self.peek()
+        if c is None or c not in characters:
+            raise RuntimeError("Invalid story file: expected one of '{}', got '{}'.".format(characters, c))
+        self.pos += 1
+        return c
+
+    def decode(self):
+        """
+        Decode the next value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer (or in front of '.', 'e', ...) might continue in the next chunk
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARACTERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise RuntimeError("Invalid story file: {}".format(e))
+            self.read_more()
+
+
+def iter_story(path, chunk_size=CHUNK_SIZE):
+    """
+    Parse a story file incrementally
+    :return: Generator of tuples (key, value) for top-level entries, except for 'slides', and ("slide", description)
+             for each slide, in the order of the file
+    """
+    with open(path) as f:
+        stream = JsonStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            if key == "slides":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield "slide", stream.decode()
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                yield key, stream.decode()
+            if stream.expect(",}") == "}":
+                return
+
+
+def iter_slides(path, chunk_size=CHUNK_SIZE):
+    """
+    :return: Generator of slide descriptions
+    """
+    for key, value in iter_story(path, chunk_size):
+        if key == "slide":
+            yield value
+
+
+def scan_story(path):
+    """
+    Pre-pass over a story, which keeps only what is required before building any slide
+    :return: Dict with the top-level entries of the story ('header'), the number of slides ('num_slides'), all
+             gps slides ('gps_slides', with the index of each slide) and the index of the first slide of each type
+             ('slide_types')
+    """
+    summary = {"header": {}, "num_slides": 0, "gps_slides": [], "slide_types": {}}
+    for key, value in iter_story(path):
+        if key != "slide":
+            summary["header"][key] = value
+            continue
+        summary["slide_types"].setdefault(value.get("type"), summary["num_slides"])
+        if value.get("type") == "gps_slide":
+            summary["gps_slides"].append({"type": "gps_slide", "gps_coordinates": value["gps_coordinates"],
+                                          "index": summary["num_slides"]})
+        summary["num_slides"] += 1
+    return summary
+
+
+def iter_batches(items, size):
+    """
+    :return: Generator of lists of up to 'size' consecutive items
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
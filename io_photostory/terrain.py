@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Static terrain meshes of the world map, fine around GPS routes and coarse elsewhere.
+"""
+
+import numpy as np
+
+
+def graded_axis(length, focus_min, focus_max, fine_step, coarse_step, growth=1.5, breakpoints=()):
+    """
+    Grid coordinates along one axis of [0,length]: spacing 'fine_step' within [focus_min,focus_max], growing by
+    'growth' per step outside, up to 'coarse_step'.
+    :param breakpoints: Coordinates, which have to be part of the axis (e.g. tile borders)
+    :return: Sorted 1D array of coordinates, including 0 and length
+    """
+    focus_min = min(max(focus_min, 0.0), length)
+    focus_max = min(max(focus_max, focus_min), length)
+    coords = [np.linspace(focus_min, focus_max, max(2, int(np.ceil((focus_max - focus_min) / fine_step)) + 1))]
+
+    for start, direction, end in ((focus_min, -1, 0.0), (focus_max, 1, length)):
+        step = fine_step
+        x = start
+        side = []
+        while (x - end) * direction < 0:
+            step = min(step * growth, coarse_step)
+            x += direction * step
+            side.append(min(max(x, 0.0), length))
+        coords.append(np.array(side))
+
+    grid = np.unique(np.concatenate(coords))
+    required = np.unique(np.clip(np.concatenate((np.asarray(breakpoints, dtype=float), [0.0, length])), 0.0, length))
+
+    # Drop grid coordinates, which are closer to a required one than a fraction of the fine step (required
+    # coordinates are always kept, a tile border within a quad would show a seam)
+    tolerance = 0.01 * fine_step
+    i = np.searchsorted(required, grid)
+    distance = np.minimum(np.abs(grid - required[np.maximum(i - 1, 0)]),
+                          np.abs(required[np.minimum(i, len(required) - 1)] - grid))
+    grid = grid[distance > tolerance]
+
+    # Merge the remaining grid coordinates, which are too close to each other
+    if len(grid) > 0:
+        grid = grid[np.concatenate(([True], np.diff(grid) > tolerance))]
+    return np.union1d(grid, required)
+
+
+def sample_bilinear(heights, u, v):
+    """
+    Sample a height-map bilinearly
+    :param heights: (H,W) array, row 0 is at v=0
+    :param u: Array of horizontal coordinates in [0,1]
+    :param v: Array of vertical coordinates in [0,1]
+    :return: Array of heights, same shape as u
+    """
+    h, w = heights.shape
+    x = np.clip(u * w - 0.5, 0, w - 1)
+    y = np.clip(v * h - 0.5, 0, h - 1)
+    x0 = np.minimum(np.floor(x).astype(int), w - 2 if w > 1 else 0)
+    y0 = np.minimum(np.floor(y).astype(int), h - 2 if h > 1 else 0)
+    x1 = np.minimum(x0 + 1, w - 1)
+    y1 = np.minimum(y0 + 1, h - 1)
+    fx = x - x0
+    fy = y - y0
+    top = heights[y0, x0] * (1 - fx) + heights[y0, x1] * fx
+    bottom = heights[y1, x0] * (1 - fx) + heights[y1, x1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+class HeightSampler:
+    """
+    Combines a coarse height-map of the whole world with detailed height-maps of some regions
+    """
+    def __init__(self, overview=None):
+        """
+        :param overview: (H,W) array of the whole map or None (flat)
+        """
+        self.overview = overview
+        self.details = []
+
+    def add_detail(self, heights, u0, v0, u1, v1):
+        self.details.append((heights, u0, v0, u1, v1))
+
+    def sample(self, u, v):
+        result = np.zeros_like(u) if self.overview is None else sample_bilinear(self.overview, u, v)
+        for heights, u0, v0, u1, v1 in self.details:
+            inside = (u >= u0) & (u <= u1) & (v >= v0) & (v <= v1)
+            if np.any(inside):
+                result[inside] = sample_bilinear(heights, (u[inside] - u0) / (u1 - u0), (v[inside] - v0) / (v1 - v0))
+        return result
+
+
+def build_terrain(width, height, xs, ys, sampler=None, strength=18, tiles=(), smooth=0.5):
+    """
+    Generate the terrain grid of a map
+    :param width: Width of map
+    :param height: Height of map
+    :param xs: Grid coordinates along x, see 'graded_axis'
+    :param ys: Grid coordinates along y
+    :param sampler: HeightSampler or None (flat)
+    :param strength: Height of terrain for a height-map value of 1
+    :param tiles: List of texture tiles (u0, v0, u1, v1). Faces within a tile get material index 1 + tile index and
+                  texture coordinates relative to the tile. All other faces get material index 0 and texture
+                  coordinates of the whole map.
+    :param smooth: Factor of Laplacian smoothing of heights (one iteration)
+    :return: Tuple (vertices (N,3), faces (F,4), material indices (F), loop texture coordinates (F*4,2))
+    """
+    nx, ny = len(xs), len(ys)
+    gx, gy = np.meshgrid(xs, ys)
+    u = gx / width
+    v = gy / height
+
+    z = np.zeros_like(gx) if sampler is None else strength * sampler.sample(u, v)
+    if smooth > 0 and nx > 2 and ny > 2:
+        neighbours = 0.25 * (z[:-2, 1:-1] + z[2:, 1:-1] + z[1:-1, :-2] + z[1:-1, 2:])
+        z[1:-1, 1:-1] += smooth * (neighbours - z[1:-1, 1:-1])
+    vertices = np.stack((gx.ravel(), gy.ravel(), z.ravel()), axis=1)
+
+    r, c = np.meshgrid(np.arange(ny - 1), np.arange(nx - 1), indexing='ij')
+    v0 = (r * nx + c).ravel()
+    faces = np.stack((v0, v0 + 1, v0 + nx + 1, v0 + nx), axis=1)
+
+    loop_u = u.ravel()[faces.ravel()]
+    loop_v = v.ravel()[faces.ravel()]
+    center_u = loop_u.reshape(-1, 4).mean(axis=1)
+    center_v = loop_v.reshape(-1, 4).mean(axis=1)
+    material_indices = np.zeros(len(faces), dtype=np.int32)
+    loop_uvs = np.stack((loop_u, loop_v), axis=1)
+    for i, (tu0, tv0, tu1, tv1) in enumerate(tiles):
+        inside = (center_u > tu0) & (center_u < tu1) & (center_v > tv0) & (center_v < tv1)
+        material_indices[inside] = i + 1
+        loops = np.repeat(inside, 4)
+        loop_uvs[loops, 0] = (loop_u[loops] - tu0) / (tu1 - tu0)
+        loop_uvs[loops, 1] = (loop_v[loops] - tv0) / (tv1 - tv0)
+    return vertices, faces, material_indices, loop_uvs
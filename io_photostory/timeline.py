@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+"""
+Frames of the slides, map animations and transitions of a story, planned from the json and the lengths of videos.
+"""
+
+from .render_farm import SEGMENT_COSTS
+
+# Durations in seconds
+TRANSITION_TIME = 0.8
+UNROLL_DURATION = 4
+ZOOM_MAP_DURATION = 3
+ROUTE_DURATION_PER_LOCATION = 1.1
+ZOOM_OUT_DURATION = 3
+
+
+class Timeline:
+    def __init__(self, fps, first_frame=1, default_slide_duration=4.5, unroll_slide=None,
+                 transition_time=TRANSITION_TIME):
+        """
+        :param fps: Frame rate of the scene
+        :param first_frame: First frame of the first slide
+        :param unroll_slide: Index of the slide, which shows the map for the first time with an unroll animation (or
+                             None)
+        """
+        self.fps = fps
+        self.first_frame = first_frame
+        self.default_slide_duration = default_slide_duration
+        self.unroll_slide = unroll_slide
+        self.frames_transition = int(transition_time * fps)
+        self.slides = []
+        self.segments = []
+        self.current_frame = first_frame
+
+    @property
+    def frame_end(self):
+        return int(self.current_frame)
+
+    def add_slide(self, index, slide_desc, video_frames=0, duration=None):
+        """
+        Append a slide to the timeline
+        :param index: Index of the slide in the story
+        :param video_frames: Length of the longest video of the slide in frames
+        :param duration: Duration in seconds (default duration if None), videos might be longer
+        :return: Slide of the timeline, a dict {"slide", "type", "start", "end", "video_frames"}. Map slides additionally
+                 have "unroll" and "route" ([start, end] of the animation or None). Each slide is followed by a
+                 transition of 'frames_transition' frames
+        """
+        start = self.current_frame
+        if slide_desc["type"] == "gps_slide":
+            slide = {"slide": index, "type": "map", "start": start, "unroll": None}
+            frame = start
+            if index == self.unroll_slide:
+                frame += int(self.fps * UNROLL_DURATION)
+                slide["unroll"] = [start, frame]
+            frame += int(self.fps * ZOOM_MAP_DURATION)
+            route_end = frame + int(self.fps * ROUTE_DURATION_PER_LOCATION * len(slide_desc["gps_coordinates"]))
+            slide["route"] = [frame, route_end]
+            slide["end"] = route_end + int(self.fps * ZOOM_OUT_DURATION)
+        else:
+            if duration is None:
+                duration = self.default_slide_duration
+            slide = {"slide": index, "type": "video" if video_frames > 0 else "photo", "start": start,
+                     "end": start + int(max(video_frames, duration * self.fps)), "video_frames": video_frames}
+        self.slides.append(slide)
+
+        self.segments.append({"type": slide["type"], "start": slide["start"], "end": slide["end"], "slide": index})
+        if self.frames_transition > 1:
+            self.segments.append({"type": "transition", "start": slide["end"] + 1,
+                                  "end": slide["end"] + self.frames_transition - 1, "slide": index})
+        self.current_frame = slide["end"] + self.frames_transition
+        return slide
+
+    def get_held_frames(self):
+        """
+        Frames, which are expected to be duplicates: the camera holds still on photo slides and after the videos of a
+        slide ended
+        :return: List of tuples (first, last)
+        """
+        return [r for r in (get_held_range(slide) for slide in self.slides) if r is not None]
+
+    def get_summary(self):
+        """
+        :return: Dict with the number of frames, the duration in seconds, the number of frames and of unique frames
+                 (estimate) per segment type, and the estimated render cost of all unique frames, relative to a frame
+                 of a photo slide (see render_farm.SEGMENT_COSTS)
+        """
+        num_frames = self.frame_end - self.first_frame + 1
+        frames_per_type = {}
+        for segment in self.segments:
+            n = segment["end"] - segment["start"] + 1
+            frames_per_type[segment["type"]] = frames_per_type.get(segment["type"], 0) + n
+        unique_per_type = dict(frames_per_type)
+        for slide in self.slides:
+            held = get_held_range(slide)
+            if held is not None:
+                unique_per_type[slide["type"]] -= held[1] - held[0] + 1
+        return {"frame_start": self.first_frame, "frame_end": self.frame_end, "num_frames": num_frames,
+                "duration": num_frames / self.fps, "num_slides": len(self.slides),
+                "frames_per_type": frames_per_type, "unique_frames_per_type": unique_per_type,
+                "unique_frames": sum(unique_per_type.values()),
+                "cost": sum(n * SEGMENT_COSTS.get(t, 1.0) for t, n in unique_per_type.items())}
+
+
+def get_held_range(slide):
+    """
+    :param slide: Slide of a timeline
+    :return: Tuple (first, last) of frames, which are identical to the previous frame, or None. Blender's image users
+             stop one frame before the end of a video (see importer).
+    """
+    if slide["type"] == "photo":
+        first = slide["start"] + 1
+    elif slide["type"] == "video":
+        first = slide["start"] + slide["video_frames"] - 1
+    else:
+        return None
+    return (first, slide["end"]) if first <= slide["end"] else None
+
+
+def plan_story(story, fps, video_frames=None, first_frame=1, default_slide_duration=4.5, unroll_map=True,
+               resolve_path=None):
+    """
+    Plan the timeline of a whole story
+    :param story: Story (parsed json) or iterable of slide descriptions
+    :param video_frames: Dict path -> length of the video in frames, paths of photos can be missing
+    :param resolve_path: Function, which maps paths of the story to keys of 'video_frames' (e.g. absolute paths)
+    :return: Timeline
+    """
+    if isinstance(story, dict):
+        default_slide_duration = float(story.get("default_slide_duration", default_slide_duration))
+        story = story["slides"]
+    story = list(story)
+    unroll_slide = next((i for i, d in enumerate(story) if d["type"] == "gps_slide"), None) if unroll_map else None
+    timeline = Timeline(fps, first_frame, default_slide_duration, unroll_slide)
+    video_frames = video_frames or {}
+    for i, slide_desc in enumerate(story):
+        paths = slide_desc.get("foreground_paths", []) + slide_desc.get("background_paths", [])
+        if resolve_path is not None:
+            paths = [resolve_path(p) for p in paths]
+        timeline.add_slide(i, slide_desc, max([video_frames.get(p, 0) for p in paths], default=0))
+    return timeline
+
+
+def format_summary(summary, seconds_per_frame=None):
+    """
+    :param seconds_per_frame: Render time of a frame of a photo slide, if given, the render time is estimated
+    :return: Text, one line per value
+    """
+    minutes, seconds = divmod(summary["duration"], 60)
+    lines = ["Slides: {}".format(summary["num_slides"]),
+             "Frames: {}-{} ({} frames, {:d}:{:05.2f} min)".format(summary["frame_start"], summary["frame_end"],
+                                                                  summary["num_frames"], int(minutes), seconds),
+             "Unique frames (estimate): {}".format(summary["unique_frames"])]
+    for segment_type, n in sorted(summary["frames_per_type"].items()):
+        lines.append("- {}: {} frames, {} unique".format(segment_type, n, summary["unique_frames_per_type"][segment_type]))
+    if seconds_per_frame is not None:
+        lines.append("Render time (estimate): {:.1f} h".format(summary["cost"] * seconds_per_frame / 3600))
+    return "\n".join(lines)
@@ -18,7 +18,9 @@
 
 import bpy
 import bmesh
+import logging
 import math
+import numpy as np
 from mathutils import Vector, Matrix
 from bpy_extras.image_utils import load_image
 
@@ -29,8 +31,16 @@ if "bpy" in locals():
     if "helpers_views" in locals():
         importlib.reload(helpers_views)
 
+from . import animation, map_tiles, route, terrain
 from .helpers_geometry import *
 from .helpers_views import *
+from .materials import create_photo_material
+from . import profiling
+
+log = logging.getLogger(__name__)
+
+DASH_MATERIAL_NAME = "animation_dash_material"
+
 
 def get_latlong(input):
     if type(input) is list:
@@ -49,138 +59,216 @@ def latlong_to_xy(lat, long, height, width):
     return x, y
 
 
+def get_route_region(locations, margin=4, min_margin=1):
+    """
+    Bounding box of GPS locations in normalized map coordinates (see WorldMap), including a margin which covers the
+    view of the camera when zooming out at the end of a route.
+    :param locations: List of (lat, long) tuples
+    :param margin: Margin relative to the size of the bounding box
+    :param min_margin: Minimal margin in degree
+    :return: Tuple (u0, v0, u1, v1)
+    """
+    lats = [l[0] for l in locations]
+    longs = [l[1] for l in locations]
+    extent = max(max(lats) - min(lats), max(longs) - min(longs))
+    m = max(margin * extent, min_margin)
+    return (max(0.0, (min(longs) - m + 180) / 360), max(0.0, (min(lats) - m + 90) / 180),
+            min(1.0, (max(longs) + m + 180) / 360), min(1.0, (max(lats) + m + 90) / 180))
+
+
+def load_height_map(path):
+    """
+    Load a height-map into an array, the image itself is not kept
+    :return: (H,W) array, row 0 is the bottom of the image
+    """
+    image = load_image(path, None, recursive=False)
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    try:
+        image.pixels.foreach_get(pixels)
+    except AttributeError:  # Blender < 2.83
+        pixels[:] = image.pixels[:]
+    heights = pixels.reshape(height, width, -1)[:, :, 0].copy()
+    bpy.data.images.remove(image)
+    return heights
+
+
 def get_path_length(path):
     mesh = path.to_mesh()
     return sum((mesh.vertices[e.vertices[0]].co - mesh.vertices[e.vertices[1]].co).length for e in mesh.edges)
 
 
-class WorldMap:
+def get_dash_material():
+    """
+    Material of route dashes and markers, shared by all maps of the current file
+    """
+    material = bpy.data.materials.get(DASH_MATERIAL_NAME)
+    if material is not None:
+        return material
 
-    animation_dash_material = None
+    material = bpy.data.materials.new(name=DASH_MATERIAL_NAME)
+    material.specular_intensity = 0.2
+    material.diffuse_color = (0.85, 0.01, 0.0, 1.0)
+    return material
 
-    def __init__(self, width, height, equirectangular_texture, displacement_texture=None):
+
+class WorldMap:
+
+    def __init__(self, width, height, equirectangular_texture, displacement_texture=None, region=None,
+                 required_texture_width=None, keyframes=None):
+        """
+        :param width: Width of map
+        :param height: Height of map
+        :param equirectangular_texture: Path of texture (world map)
+        :param displacement_texture: Optional path of height-map
+        :param region: Optional region (u0, v0, u1, v1) in normalized map coordinates, which is shown in detail. Only
+                       used, if tile pyramids of the textures exist (see map_tiles.py).
+        :param required_texture_width: Resolution required within 'region', as width of the whole map in pixels
+        :param keyframes: animation.KeyframeWriter, which collects the keyframes of the map (written by the caller)
+        """
+        self.keyframes = keyframes if keyframes is not None else animation.KeyframeWriter()
         self.width = width
         self.height = height
         self.unroll_spline = None
         self.routes = []
+        # Looked up by name, a material of a previous map might have been removed (e.g. by cli.clear_blend_data)
+        self.dash_material = get_dash_material()
 
-        # Static members
-        if WorldMap.animation_dash_material is None:
-            WorldMap.animation_dash_material = bpy.data.materials.new(name="animation_dash_material")
-            WorldMap.animation_dash_material.specular_intensity = 0.2
-            WorldMap.animation_dash_material.diffuse_color = (0.85, 0.01, 0.0, 1.0)
+        texture_tiles = map_tiles.TilePyramid.find(equirectangular_texture)
+        displacement_tiles = None
+        if displacement_texture is not None:
+            displacement_tiles = map_tiles.TilePyramid.find(displacement_texture)
 
-        # Create mesh and object
-        mesh_data = create_plane_meshdata(width, height)
-        self.object = bpy.data.objects.new("world_map", mesh_data)
+        if texture_tiles is not None or displacement_tiles is not None:
+            mesh_data = self.create_terrain_meshdata(equirectangular_texture, region, required_texture_width,
+                                                     texture_tiles, displacement_tiles)
+            self.object = bpy.data.objects.new("world_map", mesh_data)
+        else:
+            log.info("Loading full resolution world map, run map_tiles.py on the assets to speed this up.")
+            self.object = bpy.data.objects.new("world_map", create_plane_meshdata(width, height))
+            material, _ = create_photo_material(load_image(equirectangular_texture, None, recursive=False))
+            self.object.data.materials.append(material)
+            if displacement_texture is not None:
+                self.add_displacement(self.object, load_image(displacement_texture, None, recursive=False), 8, 9)
+
+        self.object["photostory_role"] = "map"
         self.object.location = Vector((0, 0, 1))
+        bpy.context.view_layer.active_layer_collection.collection.objects.link(self.object)
 
-        # Load texture
-        texture = bpy.data.textures.new(name="photo_texture", type='IMAGE')
-        texture.image = load_image(equirectangular_texture, None, recursive=False)
-
-        # Create material
-        material = bpy.data.materials.new(name="photo_material")
-        material.specular_intensity = 0
-        if hasattr(material, 'texture_slots'):
-            # Internal
-            mtex = material.texture_slots.add()
-            mtex.texture = texture
-            mtex.texture.extension = 'CLIP'
-            mtex.texture_coords = 'UV'
-            mtex.use_map_color_diffuse = True
-        self.object.data.materials.append(material)
-
-        # Add nodes setup as well:
-
-        # Cycles
-        material.use_nodes = True
-        mat_nodes = material.node_tree.nodes
-        mat_links = material.node_tree.links
-        mat_nodes.clear()
-        node_t = mat_nodes.new('ShaderNodeTexImage')
-        node_t.image = texture.image
-        node_t.extension = 'CLIP'
-        node_t.location = (0, 0)
-        node_bsdf_photo = mat_nodes.new('ShaderNodeBsdfDiffuse')
-        node_bsdf_photo.location = (300, 0)
-        node_bsdf_white = mat_nodes.new('ShaderNodeBsdfDiffuse')
-        node_bsdf_white.location = (300, -300)
-        node_mix = mat_nodes.new('ShaderNodeMixShader')
-        node_mix.location = (600, -150)
-        node_om = mat_nodes.new('ShaderNodeOutputMaterial')
-        node_om.location = (900, 0)
-        mat_links.new(node_t.outputs['Color'], node_bsdf_photo.inputs['Color'])
-        mat_links.new(node_bsdf_white.outputs['BSDF'], node_mix.inputs[1])
-        mat_links.new(node_bsdf_photo.outputs['BSDF'], node_mix.inputs[2])
-        mat_links.new(node_t.outputs['Alpha'], node_mix.inputs['Fac'])
-        mat_links.new(node_mix.outputs['Shader'], node_om.inputs['Surface'])
-
-        if hasattr(bpy.types, 'ShaderNodeMaterial'):
-            # Internal
-            node_m = mat_nodes.new('ShaderNodeMaterial')
-            node_m.location = (0, 500)
-            node_m.material = material
-            node_o = mat_nodes.new('ShaderNodeOutput')
-            node_o.location = (300, 500)
-            mat_links.new(node_m.outputs['Color'], node_o.inputs['Color'])
-
-        if displacement_texture is not None:
-            # Add subdivide
-            # bpy.ops.mesh.subdivide()
-            self.object.modifiers.new(name="worldmap_subdivide", type='SUBSURF')
-            subdivide = self.object.modifiers["worldmap_subdivide"]
-            subdivide.subdivision_type = 'SIMPLE'
-            subdivide.levels = 8
-            subdivide.render_levels = 9
-
-            # Add displacement
-            self.object.modifiers.new(name="worldmap_displace", type='DISPLACE')
-            displace = self.object.modifiers["worldmap_displace"]
-            displace.strength = 18
-            displace.mid_level = 0
-            displace.texture_coords = 'UV'
-            displ_texture = bpy.data.textures.new(name="worldmap_displace_texture", type='IMAGE')
-            displ_texture.image = load_image(displacement_texture, None, recursive=False)
-            displace.texture = displ_texture
-
-            # Add smoothing
-            self.object.modifiers.new(name="worldmap_smooth", type='SMOOTH')
-            smooth = self.object.modifiers["worldmap_smooth"]
-            smooth.factor = 1.5
+    def add_displacement(self, obj, height_map, levels, render_levels):
+        # Add subdivide
+        # bpy.ops.mesh.subdivide()
+        obj.modifiers.new(name="worldmap_subdivide", type='SUBSURF')
+        subdivide = obj.modifiers["worldmap_subdivide"]
+        subdivide.subdivision_type = 'SIMPLE'
+        subdivide.levels = levels
+        subdivide.render_levels = render_levels
+
+        # Add displacement
+        obj.modifiers.new(name="worldmap_displace", type='DISPLACE')
+        displace = obj.modifiers["worldmap_displace"]
+        displace.strength = 18
+        displace.mid_level = 0
+        displace.texture_coords = 'UV'
+        displ_texture = bpy.data.textures.new(name="worldmap_displace_texture", type='IMAGE')
+        displ_texture.image = height_map
+        displ_texture.extension = 'EXTEND'
+        displace.texture = displ_texture
+
+        # Add smoothing
+        obj.modifiers.new(name="worldmap_smooth", type='SMOOTH')
+        smooth = obj.modifiers["worldmap_smooth"]
+        smooth.factor = 1.5
+
+    def create_terrain_meshdata(self, equirectangular_texture, region, required_texture_width, texture_tiles,
+                                displacement_tiles=None, coarse_cells=256, fine_cells=256):
+        """
+        Create the mesh of the map as static terrain: vertices are dense within 'region' and sparse elsewhere, heights are
+        sampled once from the height-map tiles (see terrain.py). Replaces the modifier stack of 'add_displacement'.
+        :param coarse_cells: Number of faces along the width of the map outside of 'region'
+        :param fine_cells: Number of faces along the longer side of 'region'
+        :return: bpy.types.Mesh
+        """
+        coarse_step = self.width / coarse_cells
+        fine_step = coarse_step
+        if region is not None:
+            u0, v0, u1, v1 = region
+            fine_step = min(coarse_step, max((u1 - u0) * self.width, (v1 - v0) * self.height) / fine_cells)
+
+        # Textures
+        tiles = []
+        materials = []
+        if texture_tiles is not None:
+            materials.append(create_photo_material(load_image(texture_tiles.get_overview_path(), None,
+                                                              recursive=False))[0])
+            if region is not None:
+                if required_texture_width is None:
+                    required_texture_width = texture_tiles.levels[0]["width"]
+                level = texture_tiles.choose_level(required_texture_width)
+                tiles = texture_tiles.get_tiles(level, *region)
+                log.info("- Map: Using {} tiles of level {} ({} pixels wide)".format(
+                    len(tiles), level, texture_tiles.levels[level]["width"]))
+                for tile in tiles:
+                    material, texture_node = create_photo_material(load_image(tile.path, None, recursive=False))
+                    texture_node.extension = 'EXTEND'  # Avoid seams between tiles
+                    materials.append(material)
+        else:
+            materials.append(create_photo_material(load_image(equirectangular_texture, None, recursive=False))[0])
+
+        # Heights
+        sampler = None
+        if displacement_tiles is not None:
+            sampler = terrain.HeightSampler(load_height_map(displacement_tiles.get_overview_path()))
+            if region is not None:
+                # Height-maps are only required at the resolution of vertices
+                level = displacement_tiles.choose_level(self.width / fine_step)
+                for tile in displacement_tiles.get_tiles(level, *region):
+                    sampler.add_detail(load_height_map(tile.path), tile.u0, tile.v0, tile.u1, tile.v1)
+
+        # Geometry, faces must not overlap borders of texture tiles
+        if region is not None:
+            xs = terrain.graded_axis(self.width, u0 * self.width, u1 * self.width, fine_step, coarse_step,
+                                     breakpoints=[u * self.width for t in tiles for u in (t.u0, t.u1)])
+            ys = terrain.graded_axis(self.height, v0 * self.height, v1 * self.height, fine_step, coarse_step,
+                                     breakpoints=[v * self.height for t in tiles for v in (t.v0, t.v1)])
+        else:
+            xs = np.linspace(0, self.width, coarse_cells + 1)
+            ys = np.linspace(0, self.height, round(coarse_cells * self.height / self.width) + 1)
+        vertices, faces, material_indices, loop_uvs = terrain.build_terrain(
+            self.width, self.height, xs, ys, sampler, tiles=[(t.u0, t.v0, t.u1, t.v1) for t in tiles])
+        log.info("- Map: Terrain with {} vertices".format(len(vertices)))
 
-        bpy.context.view_layer.active_layer_collection.collection.objects.link(self.object)
+        mesh_data = create_meshdata("world_map", vertices, faces, loop_uvs, material_indices)
+        for material in materials:
+            mesh_data.materials.append(material)
+        return mesh_data
 
     def get_local_coord(self, lat, long):
         x, y = latlong_to_xy(lat, long, self.height, self.width)
         return Vector((x, y, 1))  # TODO correct z
 
 
-    def add_unroll_animation(self, current_frame, duration=4):
+    def add_unroll_animation(self, frame_start, frame_end):
         """
-        :param current_frame: Current frame
-        :param duration: Duration of animation in seconds
-        :return: New current frame after animation
+        :param frame_start: First frame of the animation
+        :param frame_end: Last frame of the animation (see timeline.py)
         """
-        execution_context = get_override('VIEW_3D')
-
         # Generate unroll spline
         rounds = 5
         offset = 0.05 * self.height
-        unroll_meshdata, vs, ve = create_spiral_meshdata(offset=offset, rounds=rounds, extend=0.1 * self.height, invert_direction=False)
-        self.unroll_spline = bpy.data.objects.new("unroll_spline", unroll_meshdata)
+        spiral = create_spiral_points(offset=offset, rounds=rounds, extend=0.1 * self.height, invert_direction=False)
+        ve = spiral[len(spiral) - 1]
+        self.unroll_spline = bpy.data.objects.new("unroll_spline", create_poly_curvedata("unroll_spline", spiral))
+        self.unroll_spline["photostory_role"] = "map"
         bpy.context.view_layer.active_layer_collection.collection.objects.link(self.unroll_spline)
-        self.unroll_spline.select_set(True)
-        bpy.context.view_layer.objects.active = self.unroll_spline
-        bpy.ops.object.convert(execution_context, target='CURVE')
-        bpy.ops.transform.rotate(execution_context, value=1.5*math.pi, orient_axis='X', constraint_axis=(True, False, False))
+        self.unroll_spline.rotation_euler = (-1.5 * math.pi, 0, 0)  # Equals transform.rotate(value=1.5*pi) around X
 
         self.unroll_spline.data.transform(Matrix.Translation(-ve))
         unroll_spline_length = get_path_length(self.unroll_spline)
         self.unroll_spline.location = self.object.location + Vector((self.width, 0.5 * self.height, 1))
 
         s = self.width / unroll_spline_length
-        bpy.ops.transform.resize(execution_context, value=(s, s, s))
+        self.unroll_spline.scale = (s, s, s)
 
         # Add modifier to map
         self.object.modifiers.new(name="unroll_curve", type='CURVE')
@@ -190,26 +278,23 @@ class WorldMap:
         # Create animation
         unroll_mod.show_render = True
         unroll_mod.show_viewport = True
-        unroll_mod.keyframe_insert("show_render", index=-1, frame=current_frame)
-        unroll_mod.keyframe_insert("show_viewport", index=-1, frame=current_frame)
+        self.keyframes.insert_property(unroll_mod, "show_render", frame_start, interpolation='CONSTANT')
+        self.keyframes.insert_property(unroll_mod, "show_viewport", frame_start, interpolation='CONSTANT')
 
         map_location_backup = self.object.location.copy()
         self.set_location(Vector((self.unroll_spline.location[0], self.object.location[1], self.object.location[2])),
-                          current_frame)
+                          frame_start)
 
-        self.unroll_spline.keyframe_insert("location", index=-1, frame=current_frame)
-        current_frame += int(bpy.context.scene.render.fps * duration)
+        self.keyframes.insert_property(self.unroll_spline, "location", frame_start)
         self.unroll_spline.location = self.unroll_spline.location - Vector((self.width, 0, 0))
-        self.unroll_spline.keyframe_insert("location", index=-1, frame=current_frame)
+        self.keyframes.insert_property(self.unroll_spline, "location", frame_end)
 
         # Cleanup
         unroll_mod.show_render = False
         unroll_mod.show_viewport = False
-        unroll_mod.keyframe_insert("show_render", index=-1, frame=current_frame)
-        unroll_mod.keyframe_insert("show_viewport", index=-1, frame=current_frame)
-        self.set_location(map_location_backup, current_frame)
-
-        return current_frame
+        self.keyframes.insert_property(unroll_mod, "show_render", frame_end, interpolation='CONSTANT')
+        self.keyframes.insert_property(unroll_mod, "show_viewport", frame_end, interpolation='CONSTANT')
+        self.set_location(map_location_backup, frame_end)
 
     def has_unroll_animation(self):
         return self.unroll_spline is not None
@@ -219,16 +304,8 @@ class WorldMap:
             self.object.location = Vector((location[0], location[1], 1))
         else:
             self.object.location = location.copy()
-        self.object.keyframe_insert("location", index=-1, frame=frame)
-
-        # Set interpolation-mode to constant => Jump between positions
-        for c in self.object.animation_data.action.fcurves:
-            if c.data_path == 'location':
-                last_kf = None
-                for kf in c.keyframe_points:
-                    if int(kf.co[0]) == int(frame) and last_kf is not None:
-                        last_kf.interpolation = 'CONSTANT'
-                    last_kf = kf
+        # Constant interpolation => Jump between positions
+        self.keyframes.insert_property(self.object, "location", frame, interpolation='CONSTANT')
 
     def add_marker(self, lat, long):
         mesh_data = bpy.data.meshes.new('worldmap_marker_sphere')
@@ -239,18 +316,15 @@ class WorldMap:
         sphere_marker = bpy.data.objects.new("worldmap_marker", mesh_data)
         sphere_marker.location = self.get_local_coord(lat, long)
         sphere_marker.parent = self.object
-        sphere_marker.data.materials.append(WorldMap.animation_dash_material)
+        sphere_marker.data.materials.append(self.dash_material)
         bpy.context.view_layer.active_layer_collection.collection.objects.link(sphere_marker)
 
 
-    def animate_route(self, locations, camera, current_frame, duration=-1):
+    def animate_route(self, locations, camera, frame_start, frame_route_end, frame_end):
         """
-
+        Draw the route between 'frame_start' and 'frame_route_end', then zoom out until 'frame_end' (see timeline.py)
         :param locations: list of lat,long tuples
         :param camera: camera object
-        :param current_frame: current_frame before
-        :param duration:
-        :return: new current_frame
         """
 
         # Get local coordinates
@@ -260,34 +334,22 @@ class WorldMap:
         # Create spline
         curve_data = bpy.data.curves.new('route_data', 'CURVE')
         curve_data.dimensions = '3D'
-        curve_data.resolution_u = 13
-        curve_data.render_resolution_u = 13
+        curve_data.resolution_u = route.RESOLUTION
+        curve_data.render_resolution_u = route.RESOLUTION
         spline = curve_data.splines.new(type='BEZIER')
         spline.bezier_points.add(len(locations)-1)
-        for i, loc in enumerate(locations):
-            spline.bezier_points[i].co = loc
-
-            # Set (tangent) handles for bezier points
-            if i > 0:
-                v = 0.3 * (locations[i-1]-loc)
-                h = v.length
-                spline.bezier_points[i].handle_left = loc + v + Vector((0, 0, h))
-            if i < len(locations)-1:
-                v = 0.3 * (locations[i+1]-loc)
-                h = v.length
-                spline.bezier_points[i].handle_right = loc + v + Vector((0, 0, h))
+        points = np.array(locations)
+        handles_left, handles_right = route.get_route_handles(points)
+        spline.bezier_points.foreach_set("co", points.ravel())
+        spline.bezier_points.foreach_set("handle_left", handles_left.ravel())
+        spline.bezier_points.foreach_set("handle_right", handles_right.ravel())
 
         curve = bpy.data.objects.new('route', curve_data)
         curve.parent = self.object
-        spline_length = get_path_length(curve)
+        spline_length = route.get_route_length(points)
         bpy.context.view_layer.active_layer_collection.collection.objects.link(curve)
 
 
-        # Create animation
-
-        if duration == -1:
-            duration = len(locations) * 1.1
-
         # Generate array of dashes
         dash_diameter = 0.0006 * self.width
         dash_offset = 0.3 * dash_diameter
@@ -301,7 +363,7 @@ class WorldMap:
         dash_object.modifiers.new(name="dash_curve", type='CURVE')
         curve_mod = dash_object.modifiers["dash_curve"]
         curve_mod.object = curve
-        dash_object.data.materials.append(WorldMap.animation_dash_material)
+        dash_object.data.materials.append(self.dash_material)
         dash_object.parent = self.object
         self.routes.append(dash_object)
         bpy.context.view_layer.active_layer_collection.collection.objects.link(dash_object)
@@ -309,21 +371,16 @@ class WorldMap:
 
         # Animate creation of dashes
         bpy.context.view_layer.update() # Make sure matrix_world is up-to-date
+        profiling.count("depsgraph_updates")
         array_mod.count = 0
-        array_mod.keyframe_insert("count", index=-1, frame=current_frame)
+        self.keyframes.insert_property(array_mod, "count", frame_start)
         camera.location = self.object.matrix_world @ (locations[0] + Vector((0, 0, spline_length)))
-        camera.keyframe_insert("location", index=-1, frame=current_frame)
-        current_frame += int(bpy.context.scene.render.fps * duration)
+        self.keyframes.insert_property(camera, "location", frame_start)
 
-        array_mod.count = num_dashes
-        array_mod.keyframe_insert("count", index=-1, frame=current_frame)
+        array_mod.count = int(num_dashes)
+        self.keyframes.insert_property(array_mod, "count", frame_route_end)
         camera.location = self.object.matrix_world @ (locations[len(locations)-1] + Vector((0, 0, spline_length)))
-        camera.keyframe_insert("location", index=-1, frame=current_frame)
-
-        if True:
-            current_frame += int(bpy.context.scene.render.fps * 3)
-            camera.location = self.object.matrix_world @ (locations[len(locations) - 1] + Vector((0, 0, 4 * spline_length)))
-            camera.keyframe_insert("location", index=-1, frame=current_frame)
-
+        self.keyframes.insert_property(camera, "location", frame_route_end)
 
-        return current_frame
\ No newline at end of file
+        camera.location = self.object.matrix_world @ (locations[len(locations) - 1] + Vector((0, 0, 4 * spline_length)))
+        self.keyframes.insert_property(camera, "location", frame_end)
\ No newline at end of file
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import argparse
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from io_photostory import frame_manifest
+
+parser = argparse.ArgumentParser(description='''A tool to encode the rendered frames of a photostory. Duplicate frames
+are not read from disk (they do not need to exist), instead each unique frame is shown as long as it is held.''')
+parser.add_argument('-m', required=True, help='Path to frame manifest (photostory_frames.json), written by the importer.')
+parser.add_argument('-o', required=False, help='Path of video (default: video.mp4 next to manifest).')
+parser.add_argument('--crf', type=int, default=32, help='Constant rate factor of encoder.')
+parser.add_argument('--codec', default='libx264', help='Video codec of ffmpeg.')
+parser.add_argument('--list-only', action='store_true', help='Only write the ffmpeg concat list, do not encode.')
+args = parser.parse_args()
+
+
+def is_rendered(path):
+    return os.path.isfile(path) and os.path.getsize(path) > 0
+
+
+def get_sequence(manifest):
+    """
+    Run-length encoded frames: list of [path, number of frames]. Duplicates and frames, which were not rendered,
+    extend the previous entry.
+    """
+    sources = frame_manifest.get_duplicate_sources(manifest)
+    sequence = []
+    for frame in range(manifest["frame_start"], manifest["frame_end"] + 1):
+        path = frame_manifest.get_manifest_frame_path(manifest, sources.get(frame, frame))
+        if len(sequence) > 0 and sequence[-1][0] == path:
+            sequence[-1][1] += 1
+        elif is_rendered(path):
+            sequence.append([path, 1])
+        elif len(sequence) > 0:
+            print("WARNING frame {} was not rendered, holding previous frame.".format(frame), file=sys.stderr)
+            sequence[-1][1] += 1
+        else:
+            print("WARNING frame {} was not rendered, skipping it.".format(frame), file=sys.stderr)
+    return sequence
+
+
+def write_concat_list(path, sequence, fps):
+    with open(path, 'w') as f:
+        f.write("ffconcat version 1.0\n")
+        for frame_path, count in sequence:
+            f.write("file '{}'\n".format(frame_path.replace("'", "'\\''")))
+            f.write("duration {:.6f}\n".format(count / fps))
+        # The duration of the last entry is only respected, if it is followed by another one
+        if len(sequence) > 0:
+            f.write("file '{}'\n".format(sequence[-1][0].replace("'", "'\\''")))
+
+
+manifest = frame_manifest.load_manifest(args.m)
+fps = manifest["fps"]
+sequence = get_sequence(manifest)
+if len(sequence) == 0:
+    print("ERROR. No rendered frames found.", file=sys.stderr)
+    exit(1)
+
+directory = os.path.dirname(os.path.abspath(args.m))
+list_path = os.path.join(directory, "frames.ffconcat")
+write_concat_list(list_path, sequence, fps)
+print("{} frames, {} of them unique: {}".format(sum(c for _, c in sequence), len(sequence), list_path))
+if args.list_only:
+    exit(0)
+
+output = args.o if args.o is not None else os.path.join(directory, "video.mp4")
+command = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_path, "-vsync", "cfr", "-r", str(fps),
+           "-c:v", args.codec, "-crf", str(args.crf), "-n", output]
+print(" ".join(command))
+exit(subprocess.call(command))
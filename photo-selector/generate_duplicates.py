@@ -20,16 +20,29 @@ import argparse
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copyfile
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from io_photostory import frame_manifest
+
 parser = argparse.ArgumentParser(description='''A tool to replace placeholder files with the preceding valid file.''')
-parser.add_argument('-i', required=True, help='Path to start file.')
+inputs = parser.add_mutually_exclusive_group(required=True)
+inputs.add_argument('-i', help='Path to start file.')
+inputs.add_argument('-m', help='Path to frame manifest (photostory_frames.json), written by the importer. Duplicates '
+                               'are taken from the manifest instead of searching placeholders.')
 parser.add_argument('-s', required=False, help='Proceed silently, without confirmation prompt.', action='store_true')
 parser.add_argument('-l', required=False, help='Create symbolic links instead of copies.', action='store_true')
+parser.add_argument('--method', choices=['auto', 'hardlink', 'reflink', 'copy'],
+                    help='How duplicates are created (default: copy, with -m: auto). '
+                         'auto: hardlink, if not possible reflink, if not possible copy.')
+parser.add_argument('-j', type=int, default=8, help='Number of parallel file operations (-m only).')
 args = parser.parse_args()
 
 index_re = re.compile('(\d+)(?!.*\d)')  # Gets last number in a string
 
+FICLONE = 0x40049409  # Linux ioctl, which shares the data of two files (copy-on-write)
+
 
 def get_index(path):
     m = index_re.search(path)
@@ -43,25 +56,76 @@ def increment_path(path):
     return index_re.sub(str(int(index)+1).zfill(len(index)), path)
 
 
+def reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+
+
+def create_duplicate(src, dst, method):
+    """
+    Replace 'dst' (placeholder or missing) with a duplicate of 'src'
+    :return: Method, which was used
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if method == 'symlink':
+        os.symlink(src, dst)
+        return method
+    if method in ('auto', 'hardlink'):
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            if method == 'hardlink':
+                raise
+    if method in ('auto', 'reflink'):
+        try:
+            reflink(src, dst)
+            return 'reflink'
+        except (OSError, ImportError):
+            if os.path.exists(dst):
+                os.remove(dst)
+            if method == 'reflink':
+                raise
+    copyfile(src, dst)
+    return 'copy'
+
+
 replacements = []
-current_path = args.i
-last_valid_file = None
 
-if not os.path.isfile(current_path):
-    print("ERROR. Could not find input file:", current_path, file=sys.stderr)
-    exit(1)
+if args.m is not None:
+    # Duplicates are listed in manifest, gaps (missing files) are fine
+    manifest = frame_manifest.load_manifest(args.m)
+    for frame, source in sorted(frame_manifest.get_duplicate_sources(manifest).items()):
+        src = frame_manifest.get_manifest_frame_path(manifest, source)
+        dst = frame_manifest.get_manifest_frame_path(manifest, frame)
+        if not os.path.isfile(src) or os.path.getsize(src) == 0:
+            print("WARNING can not replace file:", dst, "\n as source was not rendered:", src, file=sys.stderr)
+        elif not os.path.isfile(dst) or os.path.getsize(dst) == 0:
+            replacements.append((dst, src))
+    method = args.method or 'auto'
+else:
+    current_path = args.i
+    last_valid_file = None
 
+    if not os.path.isfile(current_path):
+        print("ERROR. Could not find input file:", current_path, file=sys.stderr)
+        exit(1)
 
-while os.path.isfile(current_path):
-    if os.path.getsize(current_path) == 0:
-        if last_valid_file is None:
-            print("WARNING can not replace file:", current_path,
-                  "\n as no valid preceding file was found.", file=sys.stderr)
+    while os.path.isfile(current_path):
+        if os.path.getsize(current_path) == 0:
+            if last_valid_file is None:
+                print("WARNING can not replace file:", current_path,
+                      "\n as no valid preceding file was found.", file=sys.stderr)
+            else:
+                replacements.append((current_path, last_valid_file))
         else:
-            replacements.append((current_path, last_valid_file))
-    else:
-        last_valid_file = current_path
-    current_path = increment_path(current_path)
+            last_valid_file = current_path
+        current_path = increment_path(current_path)
+    method = args.method or 'copy'
+if args.l:
+    method = 'symlink'
 
 if len(replacements) > 0:
     while not args.s:
@@ -77,18 +141,9 @@ else:
     exit(0)
 
 if args.s or response == 'p':
-    print("Removing placeholder...", end=' ')
-    for r in replacements:
-        os.remove(r[0])
-    print("done.")
-    if args.l:
-        print("Creating symlinks...", end=' ')
-        for r in replacements:
-            os.symlink(r[1], r[0])
-    else:
-        print("Copying files...", end=' ')
-        for r in replacements:
-            copyfile(r[1], r[0])
-    print("done.")
+    print("Replacing placeholders ({})...".format(method), end=' ')
+    with ThreadPoolExecutor(max_workers=max(1, args.j if args.m is not None else 1)) as executor:
+        used = list(executor.map(lambda r: create_duplicate(r[1], r[0], method), replacements))
+    print("done ({}).".format(", ".join("{} {}".format(used.count(m), m) for m in sorted(set(used)))))
 else:
     print("Cancelled.")
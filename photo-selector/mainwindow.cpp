@@ -234,20 +234,12 @@ void MainWindow::on_btnCompute_clicked(){
     if(!saveBlend(blend_path, dst_path, true, true)) return;
     if(!renderBlend(blend_path, dst_path)) return;
 
-    // Use script 'generate_duplicates.py' to replace placeholders
-    std::cout << "Replaceing placeholders in destination directory ... ";
-    QProcess duplicates_process(this);
-    QStringList duplicates_arguments;
-    duplicates_arguments << "generate_duplicates.py" << "-i" << dst.absoluteFilePath("0001.png") << "-s";
-    duplicates_process.start("python3", duplicates_arguments);
-    if(!waitProcessFinished(&duplicates_process)) return;
-
-    // Use ffmpeg to generate video
+    // Use script 'assemble_video.py' to encode the video. Duplicate frames are held by the encoder and never written.
     std::cout << "Executing ffmpeg to generate video ... ";
     QProcess ffmpeg_process(this);
     QStringList ffmpeg_arguments;
-    ffmpeg_arguments << "-i" << dst.absoluteFilePath("%04d.png") << "-c:v" << "libx264" << "-crf" << "32" << "-n" << dst.absoluteFilePath("video.mp4");
-    ffmpeg_process.start("ffmpeg", ffmpeg_arguments);
+    ffmpeg_arguments << "assemble_video.py" << "-m" << dst.absoluteFilePath("photostory_frames.json") << "-o" << dst.absoluteFilePath("video.mp4");
+    ffmpeg_process.start("python3", ffmpeg_arguments);
     if(!waitProcessFinished(&ffmpeg_process)) return;
 }
 
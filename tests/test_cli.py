@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import json
+import os
+
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from io_photostory import cli, frame_manifest, render_farm, world_map
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_photostory", "assets")
+
+
+@pytest.mark.skipif(not os.path.isfile(os.path.join(ASSETS_DIR, "world.topo.bathy.200409.3x21600x10800.jpg")),
+                    reason="requires the world map assets (download_assets.sh)")
+def test_build_parts_with_gps_slides(tmp_path):
+    # Each part clears the file, the map of the second part must not use data of the first one
+    story = {"slides": [{"type": "gps_slide", "gps_coordinates": [[48.1, 11.6], [52.5, 13.4]]},
+                        {"type": "gps_slide", "gps_coordinates": [[40.4, -3.7], [41.4, 2.2]]}]}
+    story_path = str(tmp_path / "story.json")
+    with open(story_path, 'w') as f:
+        json.dump(story, f)
+    out = str(tmp_path / "story.blend")
+    assert cli.main(["build", story_path, "--out", out, "--slides-per-part", "1", "--no-proxies"]) == 0
+
+    manifest = frame_manifest.load_manifest(render_farm.find_manifest(out))
+    assert len(manifest["parts"]) == 2
+    for part in manifest["parts"]:
+        assert os.path.isfile(part["blend"])
+    assert [segment["type"] for segment in manifest["segments"]].count("map") == 2
+    assert len([m for m in bpy.data.materials if m.name.startswith(world_map.DASH_MATERIAL_NAME)]) == 1
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import pytest
+
+from io_photostory import frame_manifest
+
+
+def get_manifest(frame_start, frame_end, duplicates):
+    return {"version": frame_manifest.VERSION, "frame_start": frame_start, "frame_end": frame_end, "fps": 25,
+            "render_filepath": "/tmp/render/frame_####", "file_extension": ".png",
+            "segments": [{"type": "photo", "start": frame_start, "end": frame_end, "slide": 0}],
+            "duplicate_frames": duplicates}
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / frame_manifest.MANIFEST_NAME)
+    manifest = get_manifest(1, 10, [2, 3])
+    frame_manifest.save_manifest(path, manifest)
+    assert frame_manifest.load_manifest(path) == manifest
+    frame_manifest.save_manifest(path, dict(manifest, version=frame_manifest.VERSION + 1))
+    with pytest.raises(RuntimeError):
+        frame_manifest.load_manifest(path)
+
+
+def test_ranges():
+    assert frame_manifest.get_ranges([5, 1, 2, 3, 7, 6, 10]) == [(1, 3), (5, 7), (10, 10)]
+    assert frame_manifest.format_frame_ranges([(1, 3), (10, 10)]) == "1..3,10"
+
+
+def test_unique_frames_and_sources():
+    manifest = get_manifest(1, 8, [2, 3, 6])
+    manifest["plate_frames"] = {"8": 100.0}
+    assert frame_manifest.get_unique_frames(manifest) == [1, 4, 5, 7]
+    assert frame_manifest.get_duplicate_sources(manifest) == {2: 1, 3: 1, 6: 5}
+    manifest["duplicate_sources"] = {"2": 1, "3": 1, "6": 4}
+    assert frame_manifest.get_duplicate_sources(manifest)[6] == 4
+
+
+def test_frame_path():
+    assert frame_manifest.get_frame_path("/out/frame_####", 12, ".png") == "/out/frame_0012.png"
+    assert frame_manifest.get_frame_path("/out/a##_b###", 7) == "/out/a##_b007"
+    assert frame_manifest.get_frame_path("/out/", 7, ".png") == "/out/0007.png"
+
+
+def test_concatenate_manifests():
+    first = get_manifest(1, 10, [2])
+    second = get_manifest(11, 20, [12])
+    combined = frame_manifest.concatenate_manifests([first, second], [{"blend": "a.blend"}, {"blend": "b.blend"}])
+    assert (combined["frame_start"], combined["frame_end"]) == (1, 20)
+    assert combined["duplicate_frames"] == [2, 12]
+    assert len(combined["segments"]) == 2
+    assert frame_manifest.get_part(combined, 15) == 1
+    assert frame_manifest.get_part(first, 5) is None
+    with pytest.raises(RuntimeError):
+        frame_manifest.concatenate_manifests([first, get_manifest(12, 20, [])], [{}, {}])
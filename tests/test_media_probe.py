@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import struct
+
+import pytest
+
+from io_photostory import media_probe
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def atom(atom_type, *payload):
+    data = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(data), atom_type) + data
+
+
+def tkhd(width, height):
+    return atom(b'tkhd', bytes(24 + 52), struct.pack(">II", width << 16, height << 16))
+
+
+def track(handler, width, height, timescale, duration, sample_counts):
+    stts = struct.pack(">4xI", len(sample_counts)) + b"".join(struct.pack(">II", n, 1) for n in sample_counts)
+    return atom(b'trak', tkhd(width, height),
+                atom(b'mdia',
+                     atom(b'mdhd', struct.pack(">4x8xII4x", timescale, duration)),
+                     atom(b'hdlr', struct.pack(">8x4s12x", handler)),
+                     atom(b'minf', atom(b'stbl', atom(b'stts', stts)))))
+
+
+def write_mp4(path, *tracks):
+    with open(path, 'wb') as f:
+        f.write(atom(b'ftyp', b'isom', bytes(4)) + atom(b'mdat', bytes(100)) + atom(b'moov', *tracks))
+
+
+def test_mp4_video(tmp_path):
+    path = str(tmp_path / "video.mp4")
+    # Audio first: the video track is found by its handler, not its position
+    write_mp4(path, track(b'soun', 0, 0, 48000, 48000 * 10, [1000]),
+              track(b'vide', 1920, 1080, 30000, 30000 * 10, [200, 100]))
+    info = media_probe.probe_video(path)
+    assert info == {"width": 1920, "height": 1080, "frames": 300, "duration": 10.0, "fps": 30.0}
+    assert media_probe.probe_size(path) == (1920, 1080)
+    assert media_probe.get_scene_frames(info) == 300
+    assert media_probe.get_scene_frames(info, fps=25) == 250
+
+
+def test_mp4_without_samples(tmp_path):
+    path = str(tmp_path / "fragmented.mp4")
+    write_mp4(path, track(b'vide', 640, 480, 1000, 0, []))
+    assert media_probe.probe_video(path) is None
+
+
+@pytest.mark.skipif(Image is None, reason="requires Pillow")
+@pytest.mark.parametrize("extension", [".jpg", ".png"])
+def test_image_size(tmp_path, extension):
+    path = str(tmp_path / ("image" + extension))
+    Image.new('RGB', (123, 45)).save(path)
+    assert media_probe.probe_size(path) == (123, 45)
+    assert media_probe.probe_video(path) is None
+
+
+def test_invalid_files(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b'\xff\xd8\xff\xe0\x00')
+    assert media_probe.probe_size(str(path)) is None
+    path.write_bytes(b'not an image')
+    assert media_probe.probe_size(str(path)) is None
+    assert media_probe.probe_size(str(tmp_path / "missing.png")) is None
+
+
+def test_cache(tmp_path):
+    path = str(tmp_path / "video.mp4")
+    write_mp4(path, track(b'vide', 320, 240, 25, 50, [50]))
+    cache_path = str(tmp_path / "cache.json")
+    probe = media_probe.MediaProbe(cache_path)
+    assert probe.get_size(path) == (320, 240)
+    assert probe.get_video_info(path)["frames"] == 50
+    probe.save()
+
+    # Cached results are returned without reading the file, until it changes
+    cached = media_probe.MediaProbe(cache_path)
+    entry = cached.cache.get(path)
+    cached.cache.set(path, dict(entry, dimensions=[1, 2]))
+    assert cached.get_size(path) == (1, 2)
+    write_mp4(path, track(b'vide', 640, 480, 25, 50, [50, 1]))
+    assert cached.get_size(path) == (640, 480)
+    assert cached.get_video_info(path)["frames"] == 51
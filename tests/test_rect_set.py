@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import numpy as np
+import pytest
+
+from io_photostory.rect_set import RectSet, arrange_greedy
+
+
+def test_append_grows_storage():
+    rects = RectSet(1)
+    for i in range(5):
+        assert rects.append(i, 2 * i, 10, 20) == i
+    assert len(rects) == 5
+    assert rects.get(3) == (3.0, 6.0, 10.0, 20.0)
+    assert rects.to_array().shape == (5, 4)
+
+
+def test_bounding_box_and_largest():
+    rects = RectSet.from_arrays([0, 10, -5], [0, 5, 2], [4, 2, 3], [4, 10, 1])
+    assert rects.bounding_box() == (-5.0, 0.0, 17.0, 15.0)
+    assert rects.get_largest() == 1
+    with pytest.raises(RuntimeError):
+        RectSet().bounding_box()
+
+
+def test_intersects_any():
+    rects = RectSet.from_arrays([0, 20], [0, 0], [10, 10], [10, 10])
+    assert rects.intersects_any(5, 5, 10, 10)
+    assert not rects.intersects_any(10, 0, 10, 10)  # Touching edges do not overlap
+    assert not rects.intersects_any(9.5, 0, 10, 10, margin=0.5)
+    np.testing.assert_array_equal(rects.intersects_any([5, 10, 25], [5, 0, 5], 10, 10), [True, False, True])
+
+
+def test_scale_translate_merge():
+    rects = RectSet.from_arrays([0, 10], [0, 10], [10, 10], [10, 10])
+    rects.scale(2)
+    rects.translate(1, -1)
+    assert rects.get(1) == (21.0, 19.0, 20.0, 20.0)
+    merged = rects.merge(0, 0, 5, 5)
+    assert merged.get(0) == (0.0, -1.0, 21.0, 20.0)
+
+
+def test_arrange_greedy_does_not_overlap():
+    rng = np.random.RandomState(0)
+    widths = rng.uniform(100, 400, 30)
+    heights = rng.uniform(100, 400, 30)
+    placed = arrange_greedy(widths, heights, 16 / 9)
+    assert len(placed) == 30
+    assert placed.get(0)[:2] == (0.0, 0.0)
+    np.testing.assert_allclose(placed.w, widths)
+    np.testing.assert_allclose(placed.h, heights)
+    for i in range(len(placed)):
+        others = RectSet.from_arrays(*np.delete(placed.to_array(), i, axis=0).T)
+        assert not others.intersects_any(*placed.get(i), margin=0.5)
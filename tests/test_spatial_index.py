@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import random
+
+import pytest
+
+from io_photostory.spatial_index import GridIndex
+
+
+def test_query_finds_rectangles_in_shared_cells():
+    index = GridIndex(10)
+    index.insert("a", 0, 0, 5, 5)
+    index.insert("b", 25, 25, 20, 5)
+    assert index.query(1, 1, 2, 2) == {"a"}
+    assert index.query(40, 28, 1, 1) == {"b"}
+    assert index.query(100, 100, 1, 1) == set()
+
+
+def test_intersects_any_matches_brute_force():
+    rng = random.Random(0)
+    rectangles = [(rng.uniform(-100, 100), rng.uniform(-100, 100), rng.uniform(1, 30), rng.uniform(1, 30))
+                  for _ in range(50)]
+    index = GridIndex(15)
+    for i, r in enumerate(rectangles):
+        index.insert(i, *r)
+    for _ in range(200):
+        x, y, w, h = rng.uniform(-100, 100), rng.uniform(-100, 100), rng.uniform(1, 30), rng.uniform(1, 30)
+        expected = any(min(x + w, rx + rw) - max(x, rx) > 0.5 and min(y + h, ry + rh) - max(y, ry) > 0.5
+                       for rx, ry, rw, rh in rectangles)
+        assert index.intersects_any(x, y, w, h, margin=0.5) == expected
+
+
+def test_invalid_cell_size():
+    with pytest.raises(RuntimeError):
+        GridIndex(0)
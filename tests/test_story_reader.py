@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import json
+
+import pytest
+
+from io_photostory import story_reader
+
+
+def write_story(tmp_path, story):
+    path = str(tmp_path / "story.json")
+    with open(path, 'w') as f:
+        json.dump(story, f, indent=1)
+    return path
+
+
+def get_story(num_slides):
+    slides = []
+    for i in range(num_slides):
+        if i % 3 == 2:
+            slides.append({"type": "gps_slide", "gps_coordinates": [[i, 1.5e-3], [-2.25, 1e10]]})
+        else:
+            slides.append({"type": "photo_slide", "foreground_paths": ["photo_{}.jpg".format(i)],
+                           "background_paths": [], "text": "caption \"{}\" ä".format(i)})
+    return {"default_slide_duration": 3.5, "slides": slides, "title": "Story"}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, story_reader.CHUNK_SIZE])
+def test_iter_story(tmp_path, chunk_size):
+    story = get_story(20)
+    path = write_story(tmp_path, story)
+    entries = list(story_reader.iter_story(path, chunk_size))
+    assert entries[0] == ("default_slide_duration", 3.5)
+    assert [value for key, value in entries if key == "slide"] == story["slides"]
+    assert entries[-1] == ("title", "Story")
+    assert list(story_reader.iter_slides(path, chunk_size)) == story["slides"]
+
+
+def test_scan_story(tmp_path):
+    path = write_story(tmp_path, get_story(7))
+    summary = story_reader.scan_story(path)
+    assert summary["num_slides"] == 7
+    assert summary["header"] == {"default_slide_duration": 3.5, "title": "Story"}
+    assert [s["index"] for s in summary["gps_slides"]] == [2, 5]
+    assert summary["slide_types"] == {"photo_slide": 0, "gps_slide": 2}
+
+
+def test_empty_and_invalid(tmp_path):
+    assert list(story_reader.iter_slides(write_story(tmp_path, {"slides": []}))) == []
+    assert list(story_reader.iter_story(write_story(tmp_path, {}))) == []
+    path = tmp_path / "broken.json"
+    path.write_text('{"slides": [{"type": "photo_slide"}, ')
+    with pytest.raises(RuntimeError):
+        list(story_reader.iter_slides(str(path)))
+
+
+def test_iter_batches():
+    assert list(story_reader.iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(story_reader.iter_batches([], 3)) == []
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+import numpy as np
+
+from io_photostory import terrain
+
+
+def test_graded_axis():
+    axis = terrain.graded_axis(100, 40, 60, 1.0, 10)
+    assert axis[0] == 0 and axis[-1] == 100
+    assert np.all(np.diff(axis) > 0)
+    steps = np.diff(axis)
+    assert np.all(steps[(axis[:-1] >= 40) & (axis[1:] <= 60)] <= 1.0 + 1e-9)
+    assert steps.max() <= 10 + 1e-9
+
+
+def test_graded_axis_keeps_breakpoints():
+    # Breakpoints close to grid coordinates replace them, instead of being merged away
+    breakpoints = [25.0, 50.004, 75.3]
+    axis = terrain.graded_axis(100, 40, 60, 1.0, 10, breakpoints=breakpoints)
+    for b in breakpoints:
+        assert b in axis
+    assert 50.0 not in axis
+    assert np.all(np.diff(axis) > 0.01)
+
+
+def test_sample_bilinear():
+    heights = np.array([[0.0, 1.0], [2.0, 3.0]])
+    np.testing.assert_allclose(terrain.sample_bilinear(heights, np.array([0.25, 0.75, 0.5]),
+                                                       np.array([0.25, 0.25, 0.5])), [0.0, 1.0, 1.5])
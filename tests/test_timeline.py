@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# ====================================================================
+# Copyright 2018 by Martin Rünz <contact@martinruenz.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+# ====================================================================
+
+from io_photostory import timeline
+
+FPS = 25
+
+
+def get_story():
+    return {"default_slide_duration": 4,
+            "slides": [{"type": "photo_slide", "foreground_paths": ["a.jpg"], "background_paths": []},
+                       {"type": "photo_slide", "foreground_paths": ["clip.mp4"], "background_paths": ["b.jpg"]},
+                       {"type": "gps_slide", "gps_coordinates": [[0, 0], [1, 1], [2, 2]]}]}
+
+
+def test_plan_story():
+    planned = timeline.plan_story(get_story(), FPS, video_frames={"/story/clip.mp4": 250},
+                                  resolve_path=lambda p: "/story/" + p)
+    transition = int(timeline.TRANSITION_TIME * FPS)
+    photo, video, gps = planned.slides
+    assert (photo["type"], photo["start"], photo["end"]) == ("photo", 1, 101)
+    assert (video["type"], video["start"], video["end"]) == ("video", 101 + transition, 101 + transition + 250)
+    assert gps["type"] == "map"
+    assert gps["start"] == video["end"] + transition
+    # The first map slide unrolls the map, then zooms in, follows the route and zooms out
+    assert gps["unroll"] == [gps["start"], gps["start"] + timeline.UNROLL_DURATION * FPS]
+    route_start = gps["unroll"][1] + timeline.ZOOM_MAP_DURATION * FPS
+    assert gps["route"] == [route_start, route_start + int(FPS * timeline.ROUTE_DURATION_PER_LOCATION * 3)]
+    assert gps["end"] == gps["route"][1] + timeline.ZOOM_OUT_DURATION * FPS
+    assert planned.frame_end == gps["end"] + transition
+
+
+def test_segments_are_consecutive():
+    planned = timeline.plan_story(get_story(), FPS, unroll_map=False)
+    segments = planned.segments
+    assert [s["type"] for s in segments] == ["photo", "transition", "photo", "transition", "map", "transition"]
+    for previous, segment in zip(segments, segments[1:]):
+        assert segment["start"] == previous["end"] + 1
+    assert planned.slides[2]["unroll"] is None
+
+
+def test_video_shorter_than_slide():
+    planned = timeline.Timeline(FPS)
+    slide = planned.add_slide(0, {"type": "photo_slide"}, video_frames=50, duration=4)
+    assert slide["end"] == slide["start"] + 4 * FPS
+    # The video holds its last frame (image users stop one frame before the end)
+    assert timeline.get_held_range(slide) == (slide["start"] + 49, slide["end"])
+
+
+def test_summary():
+    planned = timeline.plan_story(get_story(), FPS, video_frames={"clip.mp4": 250})
+    summary = planned.get_summary()
+    assert summary["num_frames"] == planned.frame_end
+    # Like blender's frame range of the original importer, the end frame is the first frame after the last transition
+    assert sum(summary["frames_per_type"].values()) == summary["num_frames"] - 1
+    assert summary["unique_frames_per_type"]["photo"] == 1  # Only the first frame of a held photo slide is unique
+    assert summary["unique_frames"] < summary["num_frames"]
+    assert "Slides: 3" in timeline.format_summary(summary, seconds_per_frame=10)